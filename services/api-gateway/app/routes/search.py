@@ -53,13 +53,14 @@ async def keyword_search(
 
 
 @router.get("/patients")
-async def get_patients():
+async def get_patients(page: int = 1, page_size: int = 50):
     """Get unique patients from indexed documents"""
     indexeur_url = service_discovery.get_indexeur_url()
     async with httpx.AsyncClient(timeout=10.0) as client:
         try:
             response = await client.get(
-                f"{indexeur_url}/api/v1/search/patients"
+                f"{indexeur_url}/api/v1/search/patients",
+                params={"page": page, "page_size": page_size}
             )
             response.raise_for_status()
             return response.json()
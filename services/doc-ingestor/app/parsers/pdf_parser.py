@@ -6,7 +6,7 @@ import PyPDF2
 import pdfplumber
 import pytesseract
 from PIL import Image
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Tuple, Iterator
 import os
 import structlog
 
@@ -49,6 +49,54 @@ class PDFParser:
             logger.error("Error parsing PDF", file=file_path, error=str(e))
             raise
     
+    def iter_pages(self, file_path: str) -> Iterator[str]:
+        """
+        Yield the text of a PDF one page at a time
+        
+        Uses the same extractors as parse() (PyPDF2, then OCR, then
+        pdfplumber) but never holds more than one page, so very large
+        documents can be streamed to the indexer's /index/stream endpoint.
+        
+        Args:
+            file_path: Path to PDF file
+            
+        Yields:
+            Page text followed by a paragraph break
+        """
+        found = False
+        
+        with open(file_path, 'rb') as file:
+            reader = PyPDF2.PdfReader(file)
+            num_pages = len(reader.pages)
+            for page in reader.pages:
+                page_text = page.extract_text()
+                if page_text and page_text.strip():
+                    found = True
+                    yield page_text + "\n\n"
+        
+        if not found and self.enable_ocr:
+            logger.info("No text found, attempting page-by-page OCR", file=file_path)
+            try:
+                from pdf2image import convert_from_path
+                
+                for page_number in range(1, num_pages + 1):
+                    images = convert_from_path(file_path, first_page=page_number, last_page=page_number)
+                    for image in images:
+                        page_text = pytesseract.image_to_string(image, lang='fra+eng')
+                        if page_text.strip():
+                            found = True
+                            yield page_text + "\n\n"
+            except Exception as e:
+                logger.error("OCR failed", error=str(e))
+        
+        if not found:
+            logger.info("Attempting pdfplumber extraction", file=file_path)
+            with pdfplumber.open(file_path) as pdf:
+                for page in pdf.pages:
+                    page_text = page.extract_text()
+                    if page_text:
+                        yield page_text + "\n\n"
+    
     def _extract_with_pypdf2(self, file_path: str) -> Tuple [str, Dict[str, Any]]:
         """Extract text and metadata using PyPDF2"""
         text = ""
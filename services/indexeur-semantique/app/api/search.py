@@ -2,24 +2,45 @@
 API endpoints for semantic search operations
 """
 
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
+from typing import Optional
+import codecs
+import json
 import time
 import structlog
 import uuid
 
 from ..database import get_db
-from ..models.document_chunk import DocumentChunk, SearchLog
+from ..models.document_chunk import DocumentChunk, ParentChunk, SearchLog
 from ..schemas.search import (
     IndexDocumentRequest,
     IndexDocumentResponse,
+    IndexBatchRequest,
+    IndexBatchResponse,
     SearchRequest,
     SearchResult,
     SearchResponse,
-    IndexStatsResponse
+    IndexStatsResponse,
+    PatientSummary,
+    PatientListResponse,
+    EmbeddingMigrationRequest,
+    EmbeddingMigrationStatus
 )
-from ..services import get_chunker, get_faiss_manager, get_bm25_manager, get_hybrid_search_service
-from ..embeddings import get_embedding_generator
+from ..services import (
+    get_chunker,
+    get_faiss_manager,
+    get_bm25_manager,
+    get_hybrid_search_service,
+    get_patient_index,
+    collapse_to_parents,
+    DocumentIndexer,
+    get_embedding_migration,
+    start_embedding_migration
+)
+from ..services.chunker import StreamingChunker
+from ..embeddings import get_micro_batcher
 from ..config import settings
 
 logger = structlog.get_logger()
@@ -36,99 +57,227 @@ async def index_document(
     
     - **document_id**: UUID of the document
     - **text**: Full document text
-    - **chunking_strategy**: paragraph, section, sliding_window, or semantic
+    - **chunking_strategy**: paragraph, section, sliding_window, token, or semantic
+    
+    Chunking, embedding and database writes run in a worker thread, off
+    the event loop.
     """
     
     start_time = time.time()
     
     try:
-        # Get services
-        chunker = get_chunker()
-        embedding_generator = get_embedding_generator()
-        faiss_manager = get_faiss_manager()
-        bm25_manager = get_bm25_manager()
+        hierarchical = settings.HIERARCHICAL_CHUNKING if request.hierarchical is None else request.hierarchical
         
-        # Chunk the text
-        chunks = chunker.chunk_text(request.text, request.chunking_strategy)
+        document_id = str(request.document_id)
         
-        if not chunks:
+        def index_all():
+            indexer = DocumentIndexer(db)
+            if hierarchical:
+                indexer.add_hierarchical(request.text, document_id, request.chunking_strategy, request.metadata)
+            else:
+                chunks = get_chunker().iter_chunks([request.text], request.chunking_strategy)
+                indexer.add(chunks, document_id, request.chunking_strategy, request.metadata)
+            return indexer.finish()
+        
+        document = (await run_in_threadpool(index_all))[document_id]
+        faiss_ids = document["faiss_ids"]
+        
+        if not faiss_ids:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="No chunks generated from text"
             )
         
-        # Generate embeddings
-        chunk_texts = [chunk["text"] for chunk in chunks]
-        embeddings = embedding_generator.generate_embeddings_batch(chunk_texts)
-        
-        # Prepare chunk metadata for FAISS
-        chunk_metadata = []
-        chunk_ids = []
-        
-        for chunk in chunks:
-            # Save chunk to database
-            db_chunk = DocumentChunk(
-                document_id=str(request.document_id),
-                chunk_index=chunk["index"],
-                chunk_text=chunk["text"],
-                chunking_strategy=request.chunking_strategy,
-                start_position=chunk.get("start"),
-                end_position=chunk.get("end"),
-                embedding_model=settings.EMBEDDING_MODEL
-            )
-            db.add(db_chunk)
-            db.flush()  # Get ID without committing
+        processing_time_ms = int((time.time() - start_time) * 1000)
+        
+        logger.info(
+            "Document indexed successfully",
+            document_id=str(request.document_id),
+            chunks=len(faiss_ids),
+            parents=document["parent_count"],
+            processing_time_ms=processing_time_ms
+        )
+        
+        return IndexDocumentResponse(
+            document_id=request.document_id,
+            chunks_created=len(faiss_ids),
+            parents_created=document["parent_count"],
+            embeddings_generated=len(faiss_ids),
+            faiss_ids=faiss_ids,
+            processing_time_ms=processing_time_ms
+        )
+    
+    except HTTPException:
+        db.rollback()
+        raise
+    except Exception as e:
+        db.rollback()
+        logger.error("Indexing failed", error=str(e))
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Indexing failed: {str(e)}"
+        )
+
+
+@router.post("/index/batch", response_model=IndexBatchResponse)
+async def index_documents_batch(
+    request: IndexBatchRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Index many documents in one request
+    
+    Chunks of all documents share embedding batches and bulk inserts; the
+    FAISS and BM25 indexes are updated and the database committed once.
+    Documents that yield no chunks are reported with chunks_created=0.
+    The indexing runs in a worker thread, off the event loop.
+    
+    - **documents**: list of /index requests
+    """
+    
+    start_time = time.time()
+    
+    if not request.documents:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No documents to index"
+        )
+    
+    try:
+        def index_all():
+            chunker = get_chunker()
+            indexer = DocumentIndexer(db)
             
-            chunk_meta = {
-                "chunk_id": str(db_chunk.id),
-                "document_id": str(request.document_id),
-                "chunk_index": chunk["index"],
-                "chunk_text": chunk["text"]
-            }
-            # Merge with request metadata (e.g. including patient_id)
-            if request.metadata:
-                chunk_meta.update(request.metadata)
-                
-            chunk_metadata.append(chunk_meta)
-            chunk_ids.append(db_chunk.id)
+            for document in request.documents:
+                document_id = str(document.document_id)
+                hierarchical = settings.HIERARCHICAL_CHUNKING if document.hierarchical is None else document.hierarchical
+                if hierarchical:
+                    indexer.add_hierarchical(document.text, document_id, document.chunking_strategy, document.metadata)
+                else:
+                    chunks = chunker.iter_chunks([document.text], document.chunking_strategy)
+                    indexer.add(chunks, document_id, document.chunking_strategy, document.metadata)
+            
+            return indexer.finish()
         
-        # Add to FAISS index
-        faiss_ids = faiss_manager.add_vectors(embeddings, chunk_metadata)
+        indexed = await run_in_threadpool(index_all)
+        processing_time_ms = int((time.time() - start_time) * 1000)
         
-        # Add to BM25 index (Lexical)
-        try:
-            bm25_manager.add_documents(chunk_texts, chunk_metadata)
-        except Exception as e:
-            logger.error("BM25 indexing failed (continuing with Semantic only)", error=str(e))
+        results = []
+        for document in request.documents:
+            state = indexed[str(document.document_id)]
+            results.append(IndexDocumentResponse(
+                document_id=document.document_id,
+                chunks_created=len(state["faiss_ids"]),
+                parents_created=state["parent_count"],
+                embeddings_generated=len(state["faiss_ids"]),
+                faiss_ids=state["faiss_ids"],
+                processing_time_ms=processing_time_ms
+            ))
         
-        # Update FAISS IDs in database
-        for chunk_id, faiss_id in zip(chunk_ids, faiss_ids):
-            db.query(DocumentChunk).filter(
-                DocumentChunk.id == chunk_id
-            ).update({"faiss_index_id": faiss_id})
+        chunks_created = sum(r.chunks_created for r in results)
         
-        db.commit()
+        logger.info(
+            "Document batch indexed successfully",
+            documents=len(results),
+            chunks=chunks_created,
+            processing_time_ms=processing_time_ms
+        )
+        
+        return IndexBatchResponse(
+            documents=results,
+            documents_indexed=sum(1 for r in results if r.chunks_created),
+            chunks_created=chunks_created,
+            processing_time_ms=processing_time_ms
+        )
+    
+    except Exception as e:
+        db.rollback()
+        logger.error("Batch indexing failed", documents=len(request.documents), error=str(e))
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Indexing failed: {str(e)}"
+        )
+
+
+@router.post("/index/stream", response_model=IndexDocumentResponse)
+async def index_document_stream(
+    request: Request,
+    document_id: uuid.UUID = Query(..., description="Document UUID"),
+    chunking_strategy: str = Query("paragraph", description="Chunking strategy"),
+    metadata: Optional[str] = Query(None, description="JSON object merged into each chunk's metadata"),
+    db: Session = Depends(get_db)
+):
+    """
+    Index a very large document streamed as a plain-text request body
+    
+    The body is decoded and chunked as it arrives (e.g. page by page from
+    the parser) and chunks are embedded and written in INDEX_BATCH_SIZE
+    batches, so the raw body is never buffered whole. Chunking, embedding
+    and database writes run in a worker thread, off the event loop.
+    
+    - **document_id**: UUID of the document (query parameter)
+    - **chunking_strategy**: paragraph, section, sliding_window, token, or semantic
+    - **metadata**: JSON-encoded metadata, e.g. {"patient_id": "..."}
+    """
+    
+    start_time = time.time()
+    
+    try:
+        request_metadata = json.loads(metadata) if metadata else {}
+    except json.JSONDecodeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid metadata JSON: {str(e)}"
+        )
+    
+    try:
+        stream = StreamingChunker(get_chunker(), chunking_strategy)
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        indexer = DocumentIndexer(db)
+        target = (str(document_id), chunking_strategy, request_metadata)
+        
+        def index_part(body_part: bytes, final: bool = False):
+            indexer.add(stream.feed(decoder.decode(body_part, final=final)), *target)
+            if final:
+                indexer.add(stream.finish(), *target)
+                return indexer.finish()
+        
+        async for body_part in request.stream():
+            await run_in_threadpool(index_part, body_part)
+        
+        documents = await run_in_threadpool(index_part, b"", True)
+        faiss_ids = documents[str(document_id)]["faiss_ids"]
+        
+        if not faiss_ids:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No chunks generated from text"
+            )
         
         processing_time_ms = int((time.time() - start_time) * 1000)
         
         logger.info(
-            "Document indexed successfully",
-            document_id=str(request.document_id),
-            chunks=len(chunks),
+            "Streamed document indexed successfully",
+            document_id=str(document_id),
+            chunks=len(faiss_ids),
+            characters=stream.base,
             processing_time_ms=processing_time_ms
         )
         
         return IndexDocumentResponse(
-            document_id=request.document_id,
-            chunks_created=len(chunks),
-            embeddings_generated=len(embeddings),
+            document_id=document_id,
+            chunks_created=len(faiss_ids),
+            embeddings_generated=len(faiss_ids),
             faiss_ids=faiss_ids,
             processing_time_ms=processing_time_ms
         )
-        
+    
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
-        logger.error("Indexing failed", error=str(e))
+        logger.error("Streamed indexing failed", document_id=str(document_id), error=str(e))
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Indexing failed: {str(e)}"
@@ -158,7 +307,7 @@ async def search(
     
     try:
         # Get services
-        embedding_generator = get_embedding_generator()
+        micro_batcher = get_micro_batcher()
         faiss_manager = get_faiss_manager()
         bm25_manager = get_bm25_manager()
         hybrid_service = get_hybrid_search_service()
@@ -167,16 +316,20 @@ async def search(
         embedding_time_ms = 0
         fusion_strategy = request.fusion_strategy
         
+        return_parents = settings.SEARCH_RETURN_PARENTS if request.return_parents is None else request.return_parents
+        
         # Adjust top_k if filters are present to account for filtering
         effective_top_k = request.top_k
         if request.filters:
             effective_top_k = request.top_k * 5  # Fetch more to allow for filtering
+        if return_parents:
+            effective_top_k *= settings.PARENT_SEARCH_EXPANSION  # Several children may share a parent
             
         # Perform search based on mode
         if search_mode == "semantic":
             # Pure semantic search
             embedding_start = time.time()
-            query_embedding = embedding_generator.generate_embedding(request.query)
+            query_embedding = await micro_batcher.embed(request.query)
             embedding_time_ms = int((time.time() - embedding_start) * 1000)
             
             faiss_results = faiss_manager.search(
@@ -199,7 +352,7 @@ async def search(
         elif search_mode == "hybrid":
             # Hybrid search
             embedding_start = time.time()
-            query_embedding = embedding_generator.generate_embedding(request.query)
+            query_embedding = await micro_batcher.embed(request.query)
             embedding_time_ms = int((time.time() - embedding_start) * 1000)
             
             # Get semantic results
@@ -255,11 +408,14 @@ async def search(
                 if match:
                     filtered_raw_results.append(result)
             
-            # Slice to requested top_k after filtering
-            raw_results = filtered_raw_results[:request.top_k]
+            raw_results = filtered_raw_results
+        
+        if return_parents:
+            # Small-to-big: deduplicated parent sections, then top_k
+            raw_results = collapse_to_parents(raw_results, db, request.top_k)
         else:
-             # Ensure we respect original top_k if we fetched more
-             raw_results = raw_results[:request.top_k]
+            # Ensure we respect original top_k if we fetched more
+            raw_results = raw_results[:request.top_k]
 
 
         # Format results
@@ -352,6 +508,75 @@ async def get_stats(db: Session = Depends(get_db)):
         )
 
 
+@router.get("/embeddings/stats")
+async def get_embedding_stats():
+    """Get query embedding micro-batching metrics"""
+    return get_micro_batcher().get_stats()
+
+
+@router.post("/migrations", response_model=EmbeddingMigrationStatus)
+async def start_migration(request: EmbeddingMigrationRequest, db: Session = Depends(get_db)):
+    """
+    Start or resume re-embedding the corpus with another model
+    
+    Chunks are re-embedded into a shadow index in the background while
+    search keeps being served from the current index.
+    """
+    try:
+        migration = start_embedding_migration(
+            request.target_model,
+            request.target_provider,
+            request.batch_size
+        )
+        return migration.get_status(db)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+
+@router.get("/migrations", response_model=EmbeddingMigrationStatus)
+async def get_migration_status(db: Session = Depends(get_db)):
+    """Get progress of the current embedding migration"""
+    migration = get_embedding_migration()
+    if migration is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No embedding migration started")
+    return migration.get_status(db)
+
+
+@router.post("/migrations/stop", response_model=EmbeddingMigrationStatus)
+async def stop_migration(db: Session = Depends(get_db)):
+    """Stop the migration after the current batch (progress is kept for resuming)"""
+    migration = get_embedding_migration()
+    if migration is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No embedding migration started")
+    migration.stop()
+    return migration.get_status(db)
+
+
+@router.post("/migrations/cutover", response_model=EmbeddingMigrationStatus)
+async def cutover_migration(db: Session = Depends(get_db)):
+    """
+    Switch search and indexing to the migrated index and model
+    
+    Catches up on chunks indexed since the background pass, then swaps
+    index files, model and in-memory index while indexing is held off.
+    Runs in a worker thread so searches are served meanwhile.
+    """
+    migration = get_embedding_migration()
+    if migration is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No embedding migration started")
+    
+    try:
+        return await run_in_threadpool(migration.cutover, db)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except Exception as e:
+        logger.error("Migration cutover failed", error=str(e))
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Migration cutover failed: {str(e)}"
+        )
+
+
 @router.delete("/document/{document_id}")
 async def delete_document(document_id: str, db: Session = Depends(get_db)):
     """Delete all chunks for a document"""
@@ -365,9 +590,15 @@ async def delete_document(document_id: str, db: Session = Depends(get_db)):
         deleted = db.query(DocumentChunk).filter(
             DocumentChunk.document_id == document_id
         ).delete()
+        db.query(ParentChunk).filter(
+            ParentChunk.document_id == document_id
+        ).delete()
         
         db.commit()
         
+        # Delete from patient aggregate once the rows are gone
+        get_patient_index().delete_by_document_id(document_id)
+        
         logger.info("Document deleted", document_id=document_id, chunks_deleted=deleted)
         
         return {"message": f"Deleted {deleted} chunks", "document_id": document_id}
@@ -381,146 +612,35 @@ async def delete_document(document_id: str, db: Session = Depends(get_db)):
         )
 
 
-@router.get("/patients")
-async def get_patients(db: Session = Depends(get_db)):
+@router.get("/patients", response_model=PatientListResponse)
+async def get_patients(
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=500)
+):
     """
     Get unique patients from indexed documents
     
-    Returns a list of patients with their metadata.
-    Currently returns mock data for demonstration.
+    Served from the in-memory patient aggregate, which is updated
+    incrementally on every index and delete event.
+    
+    - **page**: Page number (starts at 1)
+    - **page_size**: Number of patients per page (max 500)
     """
     
     try:
-        # Mock patient data that matches the medical app context
-        mock_patients = [
-            {
-                "id": "PAT001",
-                "name": "Ahmed Benali",
-                "age": 45,
-                "gender": "Male",
-                "document_count": 8,
-                "metadata": {
-                    "patient_condition": "Diabetes Type 2",
-                    "patient_department": "Endocrinology",
-                    "last_visit": "2024-12-15"
-                }
-            },
-            {
-                "id": "PAT002",
-                "name": "Fatima Zahra",
-                "age": 32,
-                "gender": "Female",
-                "document_count": 5,
-                "metadata": {
-                    "patient_condition": "Hypertension",
-                    "patient_department": "Cardiology",
-                    "last_visit": "2024-12-20"
-                }
-            },
-            {
-                "id": "PAT003",
-                "name": "Mohammed Alami",
-                "age": 67,
-                "gender": "Male",
-                "document_count": 12,
-                "metadata": {
-                    "patient_condition": "Chronic Heart Failure",
-                    "patient_department": "Cardiology",
-                    "last_visit": "2024-12-18"
-                }
-            },
-            {
-                "id": "PAT004",
-                "name": "Sara Idrissi",
-                "age": 28,
-                "gender": "Female",
-                "document_count": 4,
-                "metadata": {
-                    "patient_condition": "Asthma",
-                    "patient_department": "Pulmonology",
-                    "last_visit": "2024-12-22"
-                }
-            },
-            {
-                "id": "PAT005",
-                "name": "Youssef Tahiri",
-                "age": 51,
-                "gender": "Male",
-                "document_count": 9,
-                "metadata": {
-                    "patient_condition": "Rheumatoid Arthritis",
-                    "patient_department": "Rheumatology",
-                    "last_visit": "2024-12-10"
-                }
-            },
-            {
-                "id": "PAT006",
-                "name": "Amina El Fassi",
-                "age": 39,
-                "gender": "Female",
-                "document_count": 6,
-                "metadata": {
-                    "patient_condition": "Migraine",
-                    "patient_department": "Neurology",
-                    "last_visit": "2024-12-19"
-                }
-            },
-            {
-                "id": "PAT007",
-                "name": "Karim Benjelloun",
-                "age": 54,
-                "gender": "Male",
-                "document_count": 7,
-                "metadata": {
-                    "patient_condition": "COPD",
-                    "patient_department": "Pulmonology",
-                    "last_visit": "2024-12-14"
-                }
-            },
-            {
-                "id": "PAT008",
-                "name": "Laila Tazi",
-                "age": 41,
-                "gender": "Female",
-                "document_count": 5,
-                "metadata": {
-                    "patient_condition": "Hypothyroidism",
-                    "patient_department": "Endocrinology",
-                    "last_visit": "2024-12-21"
-                }
-            },
-            {
-                "id": "PAT009",
-                "name": "Omar Chraibi",
-                "age": 62,
-                "gender": "Male",
-                "document_count": 10,
-                "metadata": {
-                    "patient_condition": "Prostate Cancer",
-                    "patient_department": "Oncology",
-                    "last_visit": "2024-12-12"
-                }
-            },
-            {
-                "id": "PAT010",
-                "name": "Zineb Alaoui",
-                "age": 35,
-                "gender": "Female",
-                "document_count": 3,
-                "metadata": {
-                    "patient_condition": "Anxiety Disorder",
-                    "patient_department": "Psychiatry",
-                    "last_visit": "2024-12-23"
-                }
-            }
-        ]
+        total, patients = get_patient_index().get_patients(
+            offset=(page - 1) * page_size,
+            limit=page_size
+        )
         
-        logger.info("Patients retrieved (mock data)", count=len(mock_patients))
+        logger.info("Patients retrieved", count=len(patients), total=total)
         
-        return {
-            "patients": mock_patients,
-            "total": len(mock_patients)
-        }
+        return PatientListResponse(
+            patients=[PatientSummary(**p) for p in patients],
+            total=total,
+            page=page,
+            page_size=page_size
+        )
         
     except Exception as e:
         logger.error("Failed to retrieve patients", error=str(e))
@@ -29,9 +29,16 @@ class Settings(BaseSettings):
     RABBITMQ_PASS: str = "guest"
     RABBITMQ_CONSUME_QUEUE: str = "anonymized_documents"
     RABBITMQ_PUBLISH_QUEUE: str = "indexed_documents"
+    RABBITMQ_DEAD_LETTER_QUEUE: str = "anonymized_documents_failed"
+    CONSUMER_PREFETCH: int = 32  # Unacked messages in flight
+    CONSUMER_CHUNK_WORKERS: int = 2  # Threads chunking documents
+    CONSUMER_EMBED_BATCH_CHUNKS: int = 256  # Chunks gathered across messages per pipeline batch
+    CONSUMER_BATCH_WAIT_MS: int = 200  # Max wait to fill an embedding batch
+    CONSUMER_WRITE_QUEUE_DEPTH: int = 2  # Embedded batches waiting for the write stage
+    CONSUMER_MAX_ATTEMPTS: int = 3  # Deliveries of a failing message before it is dead-lettered
     
     # Embedding Model Configuration
-    EMBEDDING_PROVIDER: str = "sentence-transformers"  # sentence-transformers or ollama
+    EMBEDDING_PROVIDER: str = "sentence-transformers"  # sentence-transformers, onnx or ollama
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
     # Alternative medical models:
     # "dmis-lab/biobert-base-cased-v1.2" (768 dim)
@@ -45,6 +52,39 @@ class Settings(BaseSettings):
     EMBEDDING_MAX_LENGTH: int = 512
     EMBEDDING_BATCH_SIZE: int = 32
     EMBEDDING_CACHE_SIZE: int = 1000
+    EMBEDDING_LENGTH_BUCKETING: bool = True  # Sort batches by token length to cut padding
+    EMBEDDING_TOKEN_BUDGET: int = 8192  # Padded tokens (texts x longest) per encode batch
+    
+    # Query embedding micro-batching
+    EMBEDDING_MICROBATCH_ENABLED: bool = True
+    EMBEDDING_MICROBATCH_WAIT_MS: float = 5.0  # Max time to wait for more queries
+    EMBEDDING_MICROBATCH_MAX_SIZE: int = 32  # Dispatch immediately once this many are queued
+    
+    # Multi-process embedding workers for bulk ingestion (0 = in-process)
+    EMBEDDING_WORKERS: int = int(os.getenv("EMBEDDING_WORKERS", "0"))
+    EMBEDDING_WORKER_SLOT_SIZE: int = 256  # Texts per worker call (sizes the shared buffers)
+    EMBEDDING_WORKER_MIN_BATCH: int = 64  # Smaller batches stay in-process (keep below INDEX_BATCH_SIZE)
+    
+    # Ollama backend (EMBEDDING_PROVIDER=ollama)
+    OLLAMA_BASE_URL: str = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+    OLLAMA_REQUEST_TIMEOUT: float = 60.0
+    OLLAMA_POOL_MAX_CONNECTIONS: int = 8  # Keep-alive connection pool size
+    OLLAMA_EMBED_CONCURRENCY: int = 4  # Batches in flight at once
+    
+    # ONNX Runtime backend (EMBEDDING_PROVIDER=onnx)
+    ONNX_MODEL_PATH: str = os.getenv("ONNX_MODEL_PATH", "./data/onnx_models")
+    ONNX_QUANTIZE: bool = True  # Dynamic int8 quantization of weights
+    ONNX_INTRA_OP_THREADS: int = 0  # 0 = ONNX Runtime default (one per physical core)
+    ONNX_PARITY_MIN_COSINE: float = 0.98  # Warn if exported vectors drift below this
+    
+    # Dimension-reducing PCA projection (fitted with scripts/fit_projection.py)
+    EMBEDDING_PROJECTION_DIM: int = 128  # Default target dimension when fitting
+    EMBEDDING_PROJECTION_WHITEN: bool = False
+    EMBEDDING_PROJECTION_SAMPLE: int = 50000  # Vectors sampled to fit the projection
+    
+    # Embedding model migration (re-embedding into a shadow index)
+    MIGRATION_BATCH_SIZE: int = 256  # Chunks read and embedded per batch
+    MIGRATION_CHECKPOINT_BATCHES: int = 20  # Persist shadow index and cursor every N batches
     
     # FAISS Configuration
     FAISS_INDEX_TYPE: str = "IndexFlatL2"  # or IndexIVFFlat for large datasets
@@ -54,15 +94,23 @@ class Settings(BaseSettings):
     FAISS_NPROBE: int = 10  # Search parameter
     
     # Chunking Strategy
-    CHUNKING_STRATEGY: str = "paragraph"  # paragraph, section, sliding_window, semantic
-    CHUNK_SIZE: int = 512  # tokens
+    CHUNKING_STRATEGY: str = "paragraph"  # paragraph, section, sliding_window, token, semantic
+    CHUNK_SIZE: int = 512  # tokens (capped at the model's max sequence length)
     CHUNK_OVERLAP: int = 50  # tokens
+    CHUNK_TOKEN_AWARE: bool = True  # Size chunks with the embedding tokenizer when it has offset mapping
+    CHUNK_STREAM_BUFFER_CHARS: int = 20000  # Text buffered by the streaming chunker before it cuts
     MIN_CHUNK_SIZE: int = 50
     MAX_CHUNK_SIZE: int = 1000
+    SEMANTIC_BREAKPOINT_PERCENTILE: float = 90.0  # Adjacent-sentence distance percentile that starts a new chunk
+    SEMANTIC_MIN_CHUNK_TOKENS: int = 64  # Semantic chunks are not split below this size (tokenizer available)
+    HIERARCHICAL_CHUNKING: bool = False  # Index small child chunks linked to parent sections
+    PARENT_CHUNK_MAX_SIZE: int = 4000  # characters per parent section
     
     # Search Configuration
     SEARCH_TOP_K: int = 10
     SIMILARITY_THRESHOLD: float = 0.7
+    SEARCH_RETURN_PARENTS: bool = False  # Collapse child chunk hits into their deduplicated parent sections
+    PARENT_SEARCH_EXPANSION: int = 3  # Child hits fetched per requested parent
     ENABLE_HYBRID_SEARCH: bool = True
     
     # BM25 (Keyword Search) Configuration
@@ -76,8 +124,11 @@ class Settings(BaseSettings):
     HYBRID_LEXICAL_WEIGHT: float = 0.5  # 0-1
     RRF_K: int = 60  # RRF constant parameter
     
+    # Patient Aggregate Configuration
+    PATIENT_INDEX_PATH: str = os.getenv("PATIENT_INDEX_PATH", "./data/patient_index")
+    
     # Indexing
-    INDEX_BATCH_SIZE: int = 100
+    INDEX_BATCH_SIZE: int = 100  # Chunks embedded and indexed per batch
     WORKERS: int = 4
     
     # CORS
@@ -4,28 +4,82 @@ RabbitMQ consumer for automatic document indexing
 
 import pika
 import json
+import time
+import queue
+import threading
+import numpy as np
 import structlog
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
 from sqlalchemy.orm import Session
 
 from .config import settings
 from .database import SessionLocal
-from .models.document_chunk import DocumentChunk
-from .services import get_chunker, get_faiss_manager
-from .embeddings import get_embedding_generator
+from .services import get_chunker, DocumentIndexer
+from .embeddings import get_embedding_generator, close_embedding_worker_pool
 
 logger = structlog.get_logger()
 
+ATTEMPTS_HEADER = "x-index-attempts"
+
+
+class _Message:
+    """A delivered document moving through the pipeline"""
+    
+    __slots__ = ("delivery_tag", "body", "attempts", "document_data", "chunks")
+    
+    def __init__(
+        self,
+        delivery_tag: int,
+        body: bytes,
+        attempts: int,
+        document_data: Dict[str, Any],
+        chunks: List[Dict[str, Any]]
+    ):
+        self.delivery_tag = delivery_tag
+        self.body = body
+        self.attempts = attempts
+        self.document_data = document_data
+        self.chunks = chunks
+    
+    @property
+    def document_id(self) -> str:
+        return self.document_data.get("document_id")
+
 
 class RabbitMQConsumer:
-    """RabbitMQ consumer for document indexing"""
+    """
+    Pipelined RabbitMQ consumer for document indexing
+    
+    Up to CONSUMER_PREFETCH messages are in flight. The connection thread
+    only decodes messages; the stages run concurrently behind it:
+    
+    - chunk: CONSUMER_CHUNK_WORKERS threads split each document into chunks
+    - embed: one thread groups the chunks of several messages (up to
+      CONSUMER_EMBED_BATCH_CHUNKS, waiting at most CONSUMER_BATCH_WAIT_MS)
+      and embeds them in slices of INDEX_BATCH_SIZE
+    - write: one thread stores the batch through DocumentIndexer (bulk
+      inserts of INDEX_BATCH_SIZE rows, FAISS, commit, BM25)
+    
+    Messages are published downstream and acked only after their batch is
+    committed. A failed batch is retried message by message, so one bad
+    document does not hold back the others; a failing message is
+    republished with its attempt count and dead-lettered after
+    CONSUMER_MAX_ATTEMPTS. pika is not thread-safe, so every channel
+    operation from a stage is handed back to the connection thread with
+    add_callback_threadsafe.
+    """
     
     def __init__(self):
         self.connection = None
         self.channel = None
-        self.chunker = get_chunker()
         self.embedding_generator = get_embedding_generator()
-        self.faiss_manager = get_faiss_manager()
+        
+        self.chunk_pool = None
+        self.chunked = queue.Queue(maxsize=settings.CONSUMER_PREFETCH)
+        self.embedded = queue.Queue(maxsize=settings.CONSUMER_WRITE_QUEUE_DEPTH)
+        self.stopping = threading.Event()
+        self.threads = []
     
     def connect(self):
         """Establish connection to RabbitMQ"""
@@ -57,6 +111,11 @@ class RabbitMQConsumer:
                 durable=True
             )
             
+            self.channel.queue_declare(
+                queue=settings.RABBITMQ_DEAD_LETTER_QUEUE,
+                durable=True
+            )
+            
             logger.info(
                 "Connected to RabbitMQ",
                 host=settings.RABBITMQ_HOST,
@@ -67,83 +126,260 @@ class RabbitMQConsumer:
             logger.error("Failed to connect to RabbitMQ", error=str(e))
             raise
     
-    def index_document(self, document_data: Dict[str, Any], db: Session):
-        """Index a document for semantic search"""
+    # --- Channel operations (always run on the connection thread) ---
+    
+    def _on_connection_thread(self, callback):
+        """Schedule a channel operation from a stage thread"""
+        try:
+            self.connection.add_callback_threadsafe(callback)
+        except Exception as e:
+            # Connection gone: unacked messages are redelivered by the broker
+            logger.warning("Could not schedule channel operation", error=str(e))
+    
+    def _ack(self, delivery_tag: int):
+        self._on_connection_thread(lambda: self.channel.basic_ack(delivery_tag=delivery_tag))
+    
+    def _fail(self, message: _Message, error: Exception):
+        """Requeue a failed message with its attempt count, or dead-letter it"""
+        def retry_or_dead_letter():
+            attempts = message.attempts + 1
+            dead = attempts >= settings.CONSUMER_MAX_ATTEMPTS
+            try:
+                self.channel.basic_publish(
+                    exchange='',
+                    routing_key=settings.RABBITMQ_DEAD_LETTER_QUEUE if dead else settings.RABBITMQ_CONSUME_QUEUE,
+                    body=message.body,
+                    properties=pika.BasicProperties(
+                        delivery_mode=2,
+                        content_type='application/json',
+                        headers={ATTEMPTS_HEADER: attempts, "x-index-error": str(error)[:500]}
+                    )
+                )
+            except Exception as e:
+                # Could not republish: fall back to a plain broker redelivery
+                logger.warning("Failed message not republished", document_id=message.document_id, error=str(e))
+                self.channel.basic_nack(delivery_tag=message.delivery_tag, requeue=True)
+                return
+            
+            if dead:
+                logger.error("Message dead-lettered", document_id=message.document_id, attempts=attempts)
+            self.channel.basic_ack(delivery_tag=message.delivery_tag)
+        self._on_connection_thread(retry_or_dead_letter)
+    
+    def _complete(self, messages: List[_Message], results: List[Dict[str, Any]]):
+        """Publish results, then ack their messages"""
+        def publish_and_ack():
+            for message, result in zip(messages, results):
+                try:
+                    self.publish_indexed_document(result)
+                except Exception:
+                    # Already committed: ack anyway, redelivery would duplicate the chunks
+                    logger.warning("Indexed document not published", document_id=result["document_id"])
+                self.channel.basic_ack(delivery_tag=message.delivery_tag)
+        self._on_connection_thread(publish_and_ack)
+    
+    # --- Stages ---
+    
+    def callback(self, ch, method, properties, body):
+        """Decode a delivered message and hand it to the chunk stage"""
+        try:
+            message = json.loads(body)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            logger.error("Undecodable message rejected", error=str(e))
+            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+            return
+        
+        event = message.get("event")
+        if event != "document_anonymized":
+            logger.warning("Unknown event type", event_type=event)
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+            return
+        
+        headers = (properties.headers if properties else None) or {}
+        self.chunk_pool.submit(
+            self._chunk_message,
+            _Message(method.delivery_tag, body, headers.get(ATTEMPTS_HEADER, 0), message.get("data", {}), [])
+        )
+    
+    def _chunk_message(self, message: _Message):
+        """Chunk stage: split one document and queue it for embedding"""
+        document_data = message.document_data
+        document_id = message.document_id
         
         try:
-            document_id = document_data.get("document_id")
             # Use anonymized text if available
             text = document_data.get("anonymized_text") or document_data.get("original_text", "")
-            
-            if not text:
-                logger.warning("No text to index", document_id=document_id)
-                return None
-            
-            logger.info("Indexing document", document_id=document_id)
-            
-            # Chunk text
-            chunks = self.chunker.chunk_text(text, settings.CHUNKING_STRATEGY)
+            # Resolved per message: a migration cutover resets the chunker with the model
+            chunks = get_chunker().chunk_text(text, settings.CHUNKING_STRATEGY) if text else []
             
             if not chunks:
                 logger.warning("No chunks generated", document_id=document_id)
-                return None
-            
-            # Generate embeddings
-            chunk_texts = [chunk["text"] for chunk in chunks]
-            embeddings = self.embedding_generator.generate_embeddings_batch(chunk_texts)
-            
-            # Save to database and FAISS
-            chunk_metadata = []
-            chunk_ids = []
-            
-            for chunk in chunks:
-                db_chunk = DocumentChunk(
-                    document_id=document_id,
-                    chunk_index=chunk["index"],
-                    chunk_text=chunk["text"],
-                    chunking_strategy=settings.CHUNKING_STRATEGY,
-                    start_position=chunk.get("start"),
-                    end_position=chunk.get("end"),
-                    embedding_model=settings.EMBEDDING_MODEL
-                )
-                db.add(db_chunk)
-                db.flush()
-                
-                chunk_metadata.append({
-                    "chunk_id": str(db_chunk.id),
-                    "document_id": str(document_id),
-                    "chunk_index": chunk["index"],
-                    "chunk_text": chunk["text"]
-                })
-                chunk_ids.append(db_chunk.id)
-            
-            # Add to FAISS
-            faiss_ids = self.faiss_manager.add_vectors(embeddings, chunk_metadata)
-            
-            # Update FAISS IDs
-            for chunk_id, faiss_id in zip(chunk_ids, faiss_ids):
-                db.query(DocumentChunk).filter(
-                    DocumentChunk.id == chunk_id
-                ).update({"faiss_index_id": faiss_id})
-            
-            db.commit()
+                self._ack(message.delivery_tag)
+                return
             
-            logger.info(
-                "Document indexed successfully",
-                document_id=document_id,
-                chunks=len(chunks)
-            )
+            message.chunks = chunks
+            self.chunked.put(message)
             
-            return {
-                "document_id": document_id,
-                "chunks_created": len(chunks),
-                "faiss_ids": faiss_ids,
-                "metadata": document_data.get("metadata", {})
-            }
+        except Exception as e:
+            logger.error("Chunking failed", document_id=document_id, error=str(e))
+            self._fail(message, e)
+    
+    def _collect_batch(self) -> List[_Message]:
+        """Gather chunked messages up to the embedding batch size or wait time"""
+        try:
+            batch = [self.chunked.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        
+        chunk_count = len(batch[0].chunks)
+        deadline = time.monotonic() + settings.CONSUMER_BATCH_WAIT_MS / 1000
+        
+        while chunk_count < settings.CONSUMER_EMBED_BATCH_CHUNKS:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                message = self.chunked.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(message)
+            chunk_count += len(message.chunks)
+        
+        return batch
+    
+    def embed_batch(self, batch: List[_Message]) -> Tuple[np.ndarray, int]:
+        """
+        Embed the chunks of a batch of messages, INDEX_BATCH_SIZE at a time
+        
+        Returns:
+            (embeddings, model generation of the generator that produced them)
+        """
+        # Re-resolved per batch: a migration cutover replaces the generator
+        self.embedding_generator = get_embedding_generator()
+        texts = [chunk["text"] for message in batch for chunk in message.chunks]
+        embeddings = np.vstack([
+            self.embedding_generator.generate_embeddings_batch(texts[start:start + settings.INDEX_BATCH_SIZE])
+            for start in range(0, len(texts), settings.INDEX_BATCH_SIZE)
+        ])
+        return embeddings, self.embedding_generator.generation
+    
+    def _embed_loop(self):
+        """Embed stage: embed the chunks of several messages together"""
+        while not self.stopping.is_set():
+            batch = self._collect_batch()
+            if not batch:
+                continue
+            
+            try:
+                embeddings, generation = self.embed_batch(batch)
+            except Exception as e:
+                logger.error("Batch embedding failed", messages=len(batch), error=str(e))
+                if len(batch) == 1:
+                    self._fail(batch[0], e)
+                else:
+                    self._embed_each(batch)
+                continue
             
+            self.embedded.put((batch, embeddings, generation))
+    
+    def _embed_each(self, batch: List[_Message]):
+        """Embed the messages of a failed batch one by one to isolate the failure"""
+        for message in batch:
+            try:
+                embeddings, generation = self.embed_batch([message])
+            except Exception as e:
+                logger.error("Embedding failed", document_id=message.document_id, error=str(e))
+                self._fail(message, e)
+                continue
+            self.embedded.put(([message], embeddings, generation))
+    
+    def _write(self, batch: List[_Message], embeddings: np.ndarray, generation: int) -> Optional[Exception]:
+        """Store and complete one batch in its own transaction; returns the failure"""
+        db = SessionLocal()
+        try:
+            results = self.write_batch(batch, embeddings, db, generation)
         except Exception as e:
-            logger.error("Indexing failed", document_id=document_id, error=str(e))
-            raise
+            db.rollback()
+            logger.error("Batch write failed", messages=len(batch), error=str(e))
+            return e
+        finally:
+            db.close()
+        
+        self._complete(batch, results)
+        return None
+    
+    def _write_loop(self):
+        """Write stage: bulk insert, FAISS add and commit, then publish and ack"""
+        while not self.stopping.is_set():
+            try:
+                batch, embeddings, generation = self.embedded.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            
+            error = self._write(batch, embeddings, generation)
+            if error is None:
+                continue
+            if len(batch) == 1:
+                self._fail(batch[0], error)
+                continue
+            
+            # Retry message by message so only the failing one is requeued
+            offset = 0
+            for message in batch:
+                count = len(message.chunks)
+                error = self._write([message], embeddings[offset:offset + count], generation)
+                offset += count
+                if error is not None:
+                    self._fail(message, error)
+    
+    def write_batch(
+        self,
+        batch: List[_Message],
+        embeddings: np.ndarray,
+        db: Session,
+        model_generation: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Durably store an embedded batch of messages
+        
+        Goes through the same DocumentIndexer as the /index endpoints, so
+        queued documents reach SQL, FAISS and BM25 with the same metadata,
+        and are re-embedded if the API cut the index over to another model
+        since they were embedded.
+        
+        Args:
+            batch: Messages with their chunks
+            embeddings: One vector per chunk, in batch order
+            db: Database session
+            model_generation: Generation of the generator that produced the embeddings
+            
+        Returns:
+            One indexed-document result per message
+        """
+        indexer = DocumentIndexer(db)
+        entries = []
+        for message in batch:
+            document = indexer.track_document(
+                message.document_id,
+                settings.CHUNKING_STRATEGY,
+                message.document_data.get("metadata", {})
+            )
+            entries.extend((document, chunk) for chunk in message.chunks)
+        
+        for start in range(0, len(entries), settings.INDEX_BATCH_SIZE):
+            end = start + settings.INDEX_BATCH_SIZE
+            indexer.write_batch(entries[start:end], embeddings[start:end], model_generation)
+        documents = indexer.finish()
+        
+        return [
+            {
+                "document_id": message.document_id,
+                "chunks_created": len(documents[str(message.document_id)]["faiss_ids"]),
+                "faiss_ids": documents[str(message.document_id)]["faiss_ids"],
+                "metadata": message.document_data.get("metadata", {})
+            }
+            for message in batch
+        ]
     
     def publish_indexed_document(self, data: Dict[str, Any]):
         """Publish indexed document to next queue"""
@@ -169,47 +405,44 @@ class RabbitMQConsumer:
             logger.error("Failed to publish message", error=str(e))
             raise
     
-    def callback(self, ch, method, properties, body):
-        """Callback for processing messages"""
-        db = SessionLocal()
-        
-        try:
-            message = json.loads(body)
-            event = message.get("event")
-            
-            if event == "document_anonymized":
-                document_data = message.get("data", {})
-                
-                # Index document
-                result = self.index_document(document_data, db)
-                
-                if result:
-                    # Publish to next service
-                    self.publish_indexed_document(result)
-                
-                ch.basic_ack(delivery_tag=method.delivery_tag)
-                
-            else:
-                logger.warning("Unknown event type", event=event)
-                ch.basic_ack(delivery_tag=method.delivery_tag)
-                
-        except Exception as e:
-            logger.error("Message processing failed", error=str(e))
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
-            
-        finally:
-            db.close()
+    def start_stages(self):
+        """Start the chunk, embed and write stages"""
+        self.chunk_pool = ThreadPoolExecutor(
+            max_workers=settings.CONSUMER_CHUNK_WORKERS,
+            thread_name_prefix="consumer-chunk"
+        )
+        self.threads = [
+            threading.Thread(target=self._embed_loop, name="consumer-embed", daemon=True),
+            threading.Thread(target=self._write_loop, name="consumer-write", daemon=True)
+        ]
+        for thread in self.threads:
+            thread.start()
+    
+    def stop_stages(self):
+        """Stop the stages; their unacked messages are redelivered by the broker"""
+        self.stopping.set()
+        if self.chunk_pool:
+            self.chunk_pool.shutdown(wait=False, cancel_futures=True)
+        for thread in self.threads:
+            thread.join(timeout=10)
     
     def start_consuming(self):
-        """Start consuming messages"""
+        """Start the pipeline stages and consume messages"""
         try:
-            self.channel.basic_qos(prefetch_count=1)
+            self.start_stages()
+            
+            self.channel.basic_qos(prefetch_count=settings.CONSUMER_PREFETCH)
             self.channel.basic_consume(
                 queue=settings.RABBITMQ_CONSUME_QUEUE,
                 on_message_callback=self.callback
             )
             
-            logger.info("Started consuming messages")
+            logger.info(
+                "Started consuming messages",
+                prefetch=settings.CONSUMER_PREFETCH,
+                chunk_workers=settings.CONSUMER_CHUNK_WORKERS,
+                embed_batch_chunks=settings.CONSUMER_EMBED_BATCH_CHUNKS
+            )
             self.channel.start_consuming()
             
         except KeyboardInterrupt:
@@ -220,11 +453,13 @@ class RabbitMQConsumer:
             raise
     
     def stop(self):
-        """Stop consuming and close connection"""
+        """Stop the stages and close the connection"""
+        self.stop_stages()
         if self.channel:
             self.channel.stop_consuming()
         if self.connection and not self.connection.is_closed:
             self.connection.close()
+        close_embedding_worker_pool()
         logger.info("Consumer stopped")
 
 
@@ -1,4 +1,11 @@
 """Embeddings package"""
+from .providers import register_provider, available_providers, get_embedding_model, close_embedding_model
 from .embedding_generator import EmbeddingGenerator, get_embedding_generator
+from .micro_batcher import EmbeddingMicroBatcher, get_micro_batcher
+from .projection import EmbeddingProjection, get_projection, reset_projection
+from .worker_pool import EmbeddingWorkerPool, get_embedding_worker_pool, close_embedding_worker_pool
 
-__all__ = ["EmbeddingGenerator", "get_embedding_generator"]
+__all__ = ["register_provider", "available_providers", "get_embedding_model", "close_embedding_model",
+           "EmbeddingGenerator", "get_embedding_generator", "EmbeddingMicroBatcher", "get_micro_batcher",
+           "EmbeddingProjection", "get_projection", "reset_projection",
+           "EmbeddingWorkerPool", "get_embedding_worker_pool", "close_embedding_worker_pool"]
@@ -1,34 +1,44 @@
 """
-Embedding generator using SentenceTransformers
+Embedding generator on top of the shared, provider-selected embedding model
 """
 
-from sentence_transformers import SentenceTransformer
 from typing import List, Union
 import numpy as np
-import torch
 import structlog
 
 from ..config import settings
+from .providers import get_embedding_model, encode_lock
+from .worker_pool import get_embedding_worker_pool
+from .length_batching import encode_length_bucketed
+from .projection import get_projection
 
 logger = structlog.get_logger()
 
 
 class EmbeddingGenerator:
-    """Generate embeddings for text using SentenceTransformers"""
+    """Generate L2-normalized embeddings using the configured provider"""
     
     def __init__(self):
         self.model = None
         self.model_name = settings.EMBEDDING_MODEL
         self.device = settings.EMBEDDING_DEVICE
+        self.provider = settings.EMBEDDING_PROVIDER
         self.dimension = settings.EMBEDDING_DIMENSION
+        self.projection = get_projection()
+        self.generation = _generation  # Which model swap produced this generator
         self._load_model()
     
     def _load_model(self):
-        """Load the sentence transformer model"""
+        """Attach to the shared embedding model"""
         try:
-            logger.info("Loading embedding model", model=self.model_name, device=self.device)
+            logger.info(
+                "Loading embedding model",
+                model=self.model_name,
+                device=self.device,
+                provider=self.provider
+            )
             
-            self.model = SentenceTransformer(self.model_name, device=self.device)
+            self.model = get_embedding_model()
             
             # Verify dimension
             test_embedding = self.model.encode("test")
@@ -42,6 +52,14 @@ class EmbeddingGenerator:
                 )
                 self.dimension = actual_dim
             
+            if self.projection is not None:
+                if self.projection.input_dim != self.dimension:
+                    raise ValueError(
+                        f"Projection expects {self.projection.input_dim}-dim vectors, "
+                        f"model produces {self.dimension}"
+                    )
+                self.dimension = self.projection.output_dim
+            
             logger.info(
                 "Embedding model loaded successfully",
                 model=self.model_name,
@@ -52,6 +70,13 @@ class EmbeddingGenerator:
             logger.error("Failed to load embedding model", error=str(e))
             raise
     
+    def truncate(self, text: str) -> str:
+        """Truncate text that is far beyond the model's max sequence length"""
+        if len(text) > settings.EMBEDDING_MAX_LENGTH * 4:  # Rough character estimate
+            logger.warning("Text too long, truncating", length=len(text))
+            text = text[:settings.EMBEDDING_MAX_LENGTH * 4]
+        return text
+    
     def generate_embedding(self, text: str) -> np.ndarray:
         """
         Generate embedding for single text
@@ -63,10 +88,7 @@ class EmbeddingGenerator:
             Embedding vector as numpy array
         """
         try:
-            # Truncate if too long
-            if len(text) > settings.EMBEDDING_MAX_LENGTH * 4:  # Rough character estimate
-                logger.warning("Text too long, truncating", length=len(text))
-                text = text[:settings.EMBEDDING_MAX_LENGTH * 4]
+            text = self.truncate(text)
             
             embedding = self.model.encode(
                 text,
@@ -74,7 +96,7 @@ class EmbeddingGenerator:
                 normalize_embeddings=True  # L2 normalization for cosine similarity
             )
             
-            return embedding
+            return self.project(embedding)
             
         except Exception as e:
             logger.error("Embedding generation failed", error=str(e))
@@ -93,22 +115,43 @@ class EmbeddingGenerator:
         try:
             logger.info("Generating batch embeddings", batch_size=len(texts))
             
-            embeddings = self.model.encode(
-                texts,
-                batch_size=settings.EMBEDDING_BATCH_SIZE,
-                convert_to_numpy=True,
-                normalize_embeddings=True,
-                show_progress_bar=len(texts) > 100
-            )
+            # Bulk ingestion fans out to the multi-process worker pool
+            pool = get_embedding_worker_pool()
+            if pool is not None and len(texts) >= settings.EMBEDDING_WORKER_MIN_BATCH:
+                try:
+                    embeddings = self.project(pool.encode([self.truncate(text) for text in texts]))
+                    logger.info("Batch embeddings generated", count=len(embeddings), workers=len(pool.workers))
+                    return embeddings
+                except Exception as e:
+                    # The in-process model is already loaded: keep ingesting without the pool
+                    logger.warning("Embedding worker pool failed, encoding in-process", error=str(e))
+            
+            with encode_lock:
+                if settings.EMBEDDING_LENGTH_BUCKETING:
+                    embeddings = encode_length_bucketed(self.model, texts)
+                else:
+                    embeddings = self.model.encode(
+                        texts,
+                        batch_size=settings.EMBEDDING_BATCH_SIZE,
+                        convert_to_numpy=True,
+                        normalize_embeddings=True,
+                        show_progress_bar=len(texts) > 100
+                    )
             
             logger.info("Batch embeddings generated", count=len(embeddings))
             
-            return embeddings
+            return self.project(embeddings)
             
         except Exception as e:
             logger.error("Batch embedding failed", error=str(e))
             raise
     
+    def project(self, embeddings: np.ndarray) -> np.ndarray:
+        """Apply the dimension-reducing projection, if one is fitted"""
+        if self.projection is None:
+            return embeddings
+        return self.projection.apply(embeddings)
+    
     def compute_similarity(self, embedding1: np.ndarray, embedding2: np.ndarray) -> float:
         """
         Compute cosine similarity between two embeddings
@@ -146,6 +189,8 @@ class EmbeddingGenerator:
 
 # Global embedding generator instance
 _generator = None
+# Bumped every time the singleton is replaced for a swapped model
+_generation = 0
 
 
 def get_embedding_generator() -> EmbeddingGenerator:
@@ -154,3 +199,23 @@ def get_embedding_generator() -> EmbeddingGenerator:
     if _generator is None:
         _generator = EmbeddingGenerator()
     return _generator
+
+
+def reload_embedding_generator() -> EmbeddingGenerator:
+    """Replace the singleton so it picks up a swapped model and projection"""
+    global _generator, _generation
+    generator = EmbeddingGenerator()
+    generator.generation = _generation + 1
+    _generator = generator
+    _generation = generator.generation
+    return _generator
+
+
+def get_model_generation() -> int:
+    """
+    Generation of the embedding model currently served
+
+    Vectors embedded by a generator of an older generation come from a
+    model that has since been swapped out.
+    """
+    return _generation
@@ -0,0 +1,128 @@
+"""
+Length-bucketed, token-budget batching for embedding encodes
+"""
+
+from typing import List, Any, Optional
+import numpy as np
+
+from ..config import settings
+
+
+def token_lengths(model: Any, texts: List[str]) -> List[int]:
+    """
+    Token count of each text as the model will see it
+
+    Uses the model's tokenizer when it exposes one (SentenceTransformers,
+    ONNX backend) and a characters/4 estimate otherwise (Ollama).
+
+    Args:
+        model: Embedding model
+        texts: Texts to measure
+
+    Returns:
+        Token lengths, capped at the model's max sequence length
+    """
+    max_length = getattr(model, "max_seq_length", None) or settings.EMBEDDING_MAX_LENGTH
+    tokenizer = getattr(model, "tokenizer", None)
+
+    if tokenizer is not None:
+        encoded = tokenizer(
+            texts,
+            add_special_tokens=True,
+            truncation=True,
+            max_length=max_length
+        )
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    return [min(len(text) // 4 + 2, max_length) for text in texts]
+
+
+def plan_batches(
+    lengths: List[int],
+    token_budget: int,
+    max_batch_size: Optional[int] = None
+) -> List[List[int]]:
+    """
+    Group text indices into batches of similar length under a padded-token budget
+
+    Indices are sorted by length (longest first) and packed greedily while
+    batch_size * longest_length stays within token_budget, so each batch
+    pads only to neighbours of similar length and short texts share large
+    batches.
+
+    Args:
+        lengths: Token length per text
+        token_budget: Max padded tokens (batch size x longest text) per batch
+        max_batch_size: Optional hard cap on texts per batch
+
+    Returns:
+        List of batches, each a list of indices into lengths
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+
+    batches = []
+    current = []
+    longest = 0
+
+    for idx in order:
+        length = max(lengths[idx], 1)
+        batch_longest = max(longest, length)
+        full = max_batch_size is not None and len(current) >= max_batch_size
+
+        if current and (full or (len(current) + 1) * batch_longest > token_budget):
+            batches.append(current)
+            current, batch_longest = [], length
+
+        current.append(idx)
+        longest = batch_longest
+
+    if current:
+        batches.append(current)
+
+    return batches
+
+
+def padding_efficiency(lengths: List[int], batches: List[List[int]]) -> float:
+    """Fraction of computed token positions that are real tokens (1.0 = no padding)"""
+    real = sum(lengths)
+    padded = sum(len(batch) * max(lengths[i] for i in batch) for batch in batches)
+    return real / padded if padded else 1.0
+
+
+def encode_length_bucketed(
+    model: Any,
+    texts: List[str],
+    token_budget: Optional[int] = None,
+    normalize_embeddings: bool = True
+) -> np.ndarray:
+    """
+    Encode texts in length-bucketed, token-budget batches
+
+    Args:
+        model: Model with a SentenceTransformers-style encode
+        texts: Texts to embed
+        token_budget: Padded tokens per batch (defaults to EMBEDDING_TOKEN_BUDGET)
+        normalize_embeddings: L2-normalize the output vectors
+
+    Returns:
+        Array of shape (len(texts), dimension), in input order
+    """
+    if not texts:
+        return np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+    token_budget = token_budget or settings.EMBEDDING_TOKEN_BUDGET
+    lengths = token_lengths(model, texts)
+
+    result = None
+    for batch in plan_batches(lengths, token_budget):
+        embeddings = model.encode(
+            [texts[i] for i in batch],
+            batch_size=len(batch),
+            convert_to_numpy=True,
+            normalize_embeddings=normalize_embeddings
+        )
+        if result is None:
+            result = np.empty((len(texts), embeddings.shape[1]), dtype=np.float32)
+        result[batch] = embeddings
+
+    return result
@@ -0,0 +1,194 @@
+"""
+Dynamic micro-batching of concurrent query embeddings
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+import structlog
+
+from ..config import settings
+
+logger = structlog.get_logger()
+
+
+class EmbeddingMicroBatcher:
+    """
+    Collect concurrent single-text embedding requests into batched encodes
+
+    Callers await embed(text). A background task waits for the first pending
+    request, keeps collecting for up to EMBEDDING_MICROBATCH_WAIT_MS or until
+    EMBEDDING_MICROBATCH_MAX_SIZE requests are queued, runs one batched encode
+    in a worker thread and resolves every caller's future.
+    """
+
+    def __init__(self, generator=None):
+        self._generator = generator
+        self.enabled = settings.EMBEDDING_MICROBATCH_ENABLED
+        self.max_wait_s = settings.EMBEDDING_MICROBATCH_WAIT_MS / 1000
+        self.max_batch_size = settings.EMBEDDING_MICROBATCH_MAX_SIZE
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        # Queueing metrics
+        self.requests_total = 0
+        self.batches_total = 0
+        self.max_batch_observed = 0
+        self.batch_size_counts: Dict[int, int] = {}
+        self._queue_waits = deque(maxlen=1000)
+        self._encode_times = deque(maxlen=1000)
+
+    @property
+    def generator(self):
+        """Embedding generator, resolved per batch so a model cutover takes effect immediately"""
+        if self._generator is not None:
+            return self._generator
+        from .embedding_generator import get_embedding_generator
+        return get_embedding_generator()
+
+    def _ensure_started(self):
+        """Start the batching task on the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done():
+            # Requests already queued on this loop are served by the new task
+            if self._queue is None or self._loop is not loop:
+                self._queue = asyncio.Queue()
+                self._loop = loop
+            self._worker = loop.create_task(self._run())
+
+    async def embed(self, text: str) -> np.ndarray:
+        """
+        Embed a single text, sharing a forward pass with concurrent callers
+
+        Args:
+            text: Text to embed
+
+        Returns:
+            Embedding vector as numpy array
+        """
+        if not self.enabled:
+            return self.generator.generate_embedding(text)
+
+        self._ensure_started()
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future, time.perf_counter()))
+        return await future
+
+    async def _collect_batch(self) -> List[Tuple[str, asyncio.Future, float]]:
+        """Wait for one request, then gather more until the window or size limit"""
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait_s
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        """Batching loop; a failing batch fails its callers, never the loop"""
+        while True:
+            batch = await self._collect_batch()
+
+            # Drop callers that went away while queued
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                continue
+
+            try:
+                await self._dispatch(batch)
+            except Exception as e:
+                logger.error("Micro-batch embedding failed", error=str(e), batch_size=len(batch))
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future, float]]):
+        """Embed one batch in a worker thread and resolve its callers"""
+        generator = self.generator
+        texts = [generator.truncate(text) for text, _, _ in batch]
+        dispatched_at = time.perf_counter()
+
+        embeddings = await asyncio.get_running_loop().run_in_executor(
+            None,
+            generator.generate_embeddings_batch,
+            texts
+        )
+
+        self._record_batch(batch, dispatched_at, time.perf_counter() - dispatched_at)
+
+        for (_, future, _), embedding in zip(batch, embeddings):
+            if not future.done():
+                future.set_result(embedding)
+
+    def _record_batch(self, batch, dispatched_at: float, encode_time: float):
+        """Update queueing metrics for one dispatched batch"""
+        size = len(batch)
+        self.requests_total += size
+        self.batches_total += 1
+        self.max_batch_observed = max(self.max_batch_observed, size)
+        self.batch_size_counts[size] = self.batch_size_counts.get(size, 0) + 1
+        self._encode_times.append(encode_time)
+        for _, _, enqueued_at in batch:
+            self._queue_waits.append(dispatched_at - enqueued_at)
+
+    async def stop(self):
+        """Cancel the batching task and the requests still queued"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        while self._queue is not None and not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            future.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queueing metrics"""
+
+        def percentile_ms(samples, pct):
+            return round(float(np.percentile(samples, pct)) * 1000, 3) if samples else None
+
+        waits = list(self._queue_waits)
+        encodes = list(self._encode_times)
+
+        return {
+            "enabled": self.enabled,
+            "max_wait_ms": self.max_wait_s * 1000,
+            "max_batch_size": self.max_batch_size,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "requests_total": self.requests_total,
+            "batches_total": self.batches_total,
+            "avg_batch_size": round(self.requests_total / self.batches_total, 2) if self.batches_total else 0,
+            "max_batch_observed": self.max_batch_observed,
+            "batch_size_counts": dict(sorted(self.batch_size_counts.items())),
+            "queue_wait_p50_ms": percentile_ms(waits, 50),
+            "queue_wait_p95_ms": percentile_ms(waits, 95),
+            "encode_p50_ms": percentile_ms(encodes, 50),
+            "encode_p95_ms": percentile_ms(encodes, 95)
+        }
+
+
+# Global micro-batcher instance
+_micro_batcher = None
+
+
+def get_micro_batcher() -> EmbeddingMicroBatcher:
+    """Get embedding micro-batcher singleton"""
+    global _micro_batcher
+    if _micro_batcher is None:
+        _micro_batcher = EmbeddingMicroBatcher()
+    return _micro_batcher
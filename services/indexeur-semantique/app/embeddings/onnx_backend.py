@@ -0,0 +1,320 @@
+"""
+ONNX Runtime embedding backend with dynamic int8 quantization for CPU inference
+"""
+
+import os
+import re
+import json
+import time
+from typing import List, Union, Dict, Any, Optional
+import numpy as np
+import structlog
+
+from ..config import settings
+from .providers import _normalize
+
+logger = structlog.get_logger()
+
+# Sentences used to validate exported models against the PyTorch reference
+PARITY_SAMPLE_TEXTS = [
+    "Patient presents with shortness of breath and bilateral lower extremity edema.",
+    "History of type 2 diabetes mellitus managed with metformin 500 mg twice daily.",
+    "Blood pressure 150/95 mmHg, heart rate 88 bpm, SpO2 94% on room air.",
+    "Assessment: chronic heart failure with reduced ejection fraction, stable.",
+    "Plan: repeat creatinine and potassium in two weeks, continue lisinopril.",
+    "No known drug allergies.",
+    "Chest X-ray shows mild cardiomegaly without pleural effusion or consolidation.",
+    "Discharged home in stable condition with follow-up in cardiology clinic.",
+]
+
+
+def _model_dir(model_name: str) -> str:
+    """Directory holding the exported artifacts for a model"""
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "__", model_name)
+    return os.path.join(settings.ONNX_MODEL_PATH, safe_name)
+
+
+def _pool(hidden_states: np.ndarray, attention_mask: np.ndarray, mode: str) -> np.ndarray:
+    """Apply SentenceTransformers pooling to token embeddings"""
+    if mode == "cls":
+        return hidden_states[:, 0]
+
+    mask = attention_mask[..., None].astype(hidden_states.dtype)
+
+    if mode == "max":
+        return np.where(mask > 0, hidden_states, -1e9).max(axis=1)
+
+    summed = (hidden_states * mask).sum(axis=1)
+    counts = np.clip(mask.sum(axis=1), 1e-9, None)
+    return summed / counts
+
+
+def check_parity(
+    model: Any,
+    reference_model: Any,
+    texts: Optional[List[str]] = None
+) -> Dict[str, float]:
+    """
+    Compare embeddings of two models on the same texts
+
+    Args:
+        model: Model under test (anything with a SentenceTransformers-style encode)
+        reference_model: Reference model, typically the PyTorch SentenceTransformer
+        texts: Texts to compare on (defaults to clinical sample sentences)
+
+    Returns:
+        Dict with min and mean cosine similarity between paired vectors
+    """
+    texts = texts or PARITY_SAMPLE_TEXTS
+
+    actual = model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    expected = reference_model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+
+    cosines = np.sum(actual * expected, axis=1)
+
+    return {
+        "min_cosine": float(cosines.min()),
+        "mean_cosine": float(cosines.mean()),
+        "texts": len(texts)
+    }
+
+
+def export_onnx_model(model_name: str, quantize: bool = True) -> str:
+    """
+    Export a SentenceTransformers model to ONNX, optionally int8-quantized
+
+    The exported graph covers the transformer only; pooling and normalization
+    are applied in NumPy so any SentenceTransformers pooling mode is supported.
+
+    Args:
+        model_name: SentenceTransformers model name or path
+        quantize: Also write a dynamically int8-quantized copy
+
+    Returns:
+        Directory containing the exported model
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    output_dir = _model_dir(model_name)
+    os.makedirs(output_dir, exist_ok=True)
+    fp32_path = os.path.join(output_dir, "model.onnx")
+
+    logger.info("Exporting embedding model to ONNX", model=model_name, path=output_dir)
+
+    reference = SentenceTransformer(model_name, device="cpu")
+    transformer = reference[0].auto_model
+    tokenizer = reference.tokenizer
+    pooling_mode = reference[1].get_pooling_mode_str() if len(reference) > 1 else "mean"
+
+    tokenizer.save_pretrained(output_dir)
+
+    dummy = tokenizer(["onnx export"], return_tensors="pt")
+    input_names = list(dummy.keys())
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    transformer.eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            (dict(dummy),),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+            do_constant_folding=True
+        )
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        quantize_dynamic(
+            model_input=fp32_path,
+            model_output=os.path.join(output_dir, "model.int8.onnx"),
+            weight_type=QuantType.QInt8
+        )
+
+    config = {
+        "model_name": model_name,
+        "pooling_mode": pooling_mode,
+        "max_seq_length": reference.max_seq_length,
+        "dimension": reference.get_sentence_embedding_dimension(),
+        "parity": {}
+    }
+
+    # Validate every exported variant against the fp32 PyTorch vectors
+    for variant in (["fp32", "int8"] if quantize else ["fp32"]):
+        onnx_model = ONNXEmbeddingModel(model_name, quantized=(variant == "int8"), config=config)
+        config["parity"][variant] = check_parity(onnx_model, reference)
+        logger.info("ONNX parity check", variant=variant, **config["parity"][variant])
+
+    with open(os.path.join(output_dir, "config.json"), "w") as f:
+        json.dump(config, f, indent=2)
+
+    logger.info("ONNX export completed", model=model_name, quantized=quantize)
+
+    return output_dir
+
+
+class ONNXEmbeddingModel:
+    """
+    SentenceTransformers-compatible encoder running on ONNX Runtime
+
+    Exposes the subset of the SentenceTransformer API the indexer uses
+    (encode, get_sentence_embedding_dimension) so it can replace the
+    PyTorch model transparently.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        quantized: bool = None,
+        config: Optional[Dict[str, Any]] = None
+    ):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.quantized = settings.ONNX_QUANTIZE if quantized is None else quantized
+        self.model_dir = _model_dir(model_name)
+
+        if config is None:
+            config_path = os.path.join(self.model_dir, "config.json")
+            if not os.path.exists(config_path):
+                export_onnx_model(model_name, quantize=self.quantized)
+            with open(config_path, "r") as f:
+                config = json.load(f)
+
+        self.pooling_mode = config.get("pooling_mode", "mean")
+        self.max_seq_length = min(
+            config.get("max_seq_length") or settings.EMBEDDING_MAX_LENGTH,
+            settings.EMBEDDING_MAX_LENGTH
+        )
+        self.dimension = config.get("dimension")
+        self.parity = config.get("parity", {}).get("int8" if self.quantized else "fp32")
+
+        model_file = "model.int8.onnx" if self.quantized else "model.onnx"
+        model_path = os.path.join(self.model_dir, model_file)
+        if not os.path.exists(model_path):
+            export_onnx_model(model_name, quantize=self.quantized)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = settings.ONNX_INTRA_OP_THREADS
+        options.inter_op_num_threads = 1
+
+        self.session = ort.InferenceSession(
+            model_path,
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+
+        if self.parity and self.parity["min_cosine"] < settings.ONNX_PARITY_MIN_COSINE:
+            logger.warning(
+                "ONNX model parity below threshold",
+                model=model_name,
+                quantized=self.quantized,
+                min_cosine=self.parity["min_cosine"],
+                threshold=settings.ONNX_PARITY_MIN_COSINE
+            )
+
+        logger.info(
+            "ONNX embedding model loaded",
+            model=model_name,
+            quantized=self.quantized,
+            intra_op_threads=settings.ONNX_INTRA_OP_THREADS
+        )
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        """Run one padded batch through the ONNX session"""
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np"
+        )
+        feeds = {
+            name: encoded[name].astype(np.int64)
+            for name in self.input_names
+            if name in encoded
+        }
+
+        hidden_states = self.session.run(None, feeds)[0]
+        return _pool(hidden_states, encoded["attention_mask"], self.pooling_mode)
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        convert_to_numpy: bool = True,
+        normalize_embeddings: bool = False,
+        show_progress_bar: bool = False
+    ) -> np.ndarray:
+        """
+        Encode texts into embeddings
+
+        Args:
+            sentences: Text or list of texts
+            batch_size: Texts per ONNX Runtime call
+            convert_to_numpy: Accepted for API compatibility (always NumPy)
+            normalize_embeddings: L2-normalize the output vectors
+            show_progress_bar: Accepted for API compatibility
+
+        Returns:
+            1D vector for a single text, otherwise (n, dimension) array
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        if not texts:
+            return np.zeros((0, self.dimension or 0), dtype=np.float32)
+
+        batches = [
+            self._encode_batch(texts[i:i + batch_size])
+            for i in range(0, len(texts), batch_size)
+        ]
+        embeddings = np.vstack(batches).astype(np.float32)
+
+        if normalize_embeddings:
+            embeddings = _normalize(embeddings)
+
+        return embeddings[0] if single else embeddings
+
+    def get_sentence_embedding_dimension(self) -> int:
+        """Get embedding dimension"""
+        if self.dimension is None:
+            self.dimension = int(self.encode("dimension probe").shape[0])
+        return self.dimension
+
+
+def benchmark_throughput(model: Any, texts: List[str], batch_size: int, repeats: int = 3) -> Dict[str, float]:
+    """
+    Measure encoding throughput of a model
+
+    Args:
+        model: Anything with a SentenceTransformers-style encode
+        texts: Texts to encode
+        batch_size: Encode batch size
+        repeats: Timed passes (best one is reported)
+
+    Returns:
+        Dict with best wall time and texts per second
+    """
+    model.encode(texts[:batch_size], batch_size=batch_size)  # Warm up
+
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.encode(texts, batch_size=batch_size, normalize_embeddings=True)
+        best = min(best, time.perf_counter() - start)
+
+    return {
+        "seconds": round(best, 4),
+        "texts_per_second": round(len(texts) / best, 1)
+    }
@@ -0,0 +1,162 @@
+"""
+PCA projection stage for dimension-reduced embeddings
+"""
+
+import os
+import pickle
+from typing import Optional, Dict, Any
+import numpy as np
+import structlog
+
+from ..config import settings
+
+logger = structlog.get_logger()
+
+PROJECTION_FILENAME = "projection.pkl"
+
+
+class EmbeddingProjection:
+    """
+    Linear PCA (optionally whitened) projection of embedding vectors
+
+    Projected vectors are re-normalized, so L2 distance on the reduced
+    vectors keeps ranking like cosine similarity, exactly as the
+    full-size normalized vectors do.
+    """
+
+    def __init__(
+        self,
+        mean: np.ndarray,
+        components: np.ndarray,
+        explained_variance_ratio: np.ndarray,
+        whiten: bool = False
+    ):
+        self.mean = mean.astype(np.float32)
+        self.components = components.astype(np.float32)  # (input_dim, output_dim)
+        self.explained_variance_ratio = explained_variance_ratio
+        self.whiten = whiten
+
+    @property
+    def input_dim(self) -> int:
+        return self.components.shape[0]
+
+    @property
+    def output_dim(self) -> int:
+        return self.components.shape[1]
+
+    @classmethod
+    def fit(cls, embeddings: np.ndarray, output_dim: int, whiten: bool = False) -> "EmbeddingProjection":
+        """
+        Fit a PCA projection on a sample of embeddings
+
+        Args:
+            embeddings: Sample of full-size vectors, shape (n, input_dim)
+            output_dim: Target dimension
+            whiten: Scale components to unit variance
+
+        Returns:
+            Fitted projection
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float64)
+        n, input_dim = embeddings.shape
+
+        if output_dim >= input_dim:
+            raise ValueError(f"Projection dimension {output_dim} must be below input dimension {input_dim}")
+        if n < output_dim:
+            raise ValueError(f"Need at least {output_dim} sample vectors, got {n}")
+
+        mean = embeddings.mean(axis=0)
+        _, singular_values, vt = np.linalg.svd(embeddings - mean, full_matrices=False)
+
+        variance = singular_values ** 2 / max(n - 1, 1)
+        components = vt[:output_dim].T
+
+        if whiten:
+            components = components / np.sqrt(np.clip(variance[:output_dim], 1e-12, None))
+
+        ratio = variance[:output_dim] / variance.sum()
+
+        logger.info(
+            "Projection fitted",
+            input_dim=input_dim,
+            output_dim=output_dim,
+            whiten=whiten,
+            samples=n,
+            explained_variance=round(float(ratio.sum()), 4)
+        )
+
+        return cls(mean, components, ratio, whiten)
+
+    def apply(self, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Project and L2-normalize vectors
+
+        Args:
+            embeddings: Single vector or array of shape (n, input_dim)
+
+        Returns:
+            Projected vector(s) with output_dim columns
+        """
+        single = embeddings.ndim == 1
+        matrix = embeddings.reshape(1, -1) if single else embeddings
+
+        projected = (matrix.astype(np.float32) - self.mean) @ self.components
+        norms = np.linalg.norm(projected, axis=1, keepdims=True)
+        projected = projected / np.clip(norms, 1e-12, None)
+
+        return projected[0] if single else projected
+
+    def save(self, directory: str):
+        """Save next to the FAISS index"""
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, PROJECTION_FILENAME), 'wb') as f:
+            pickle.dump({
+                'mean': self.mean,
+                'components': self.components,
+                'explained_variance_ratio': self.explained_variance_ratio,
+                'whiten': self.whiten
+            }, f)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["EmbeddingProjection"]:
+        """Load a saved projection, or None if the directory has none"""
+        path = os.path.join(directory, PROJECTION_FILENAME)
+        if not os.path.exists(path):
+            return None
+
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+
+        return cls(**data)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get projection statistics"""
+        return {
+            "input_dim": self.input_dim,
+            "output_dim": self.output_dim,
+            "whiten": self.whiten,
+            "explained_variance": round(float(self.explained_variance_ratio.sum()), 4)
+        }
+
+
+# Global projection (None when the index stores full-size vectors)
+_projection = None
+_projection_loaded = False
+
+
+def get_projection() -> Optional[EmbeddingProjection]:
+    """Get the projection stored next to the FAISS index, if any"""
+    global _projection, _projection_loaded
+    if not _projection_loaded:
+        _projection = EmbeddingProjection.load(settings.FAISS_INDEX_PATH)
+        _projection_loaded = True
+        if _projection is not None:
+            logger.info("Embedding projection loaded", **_projection.get_stats())
+    return _projection
+
+
+def reset_projection():
+    """Forget the cached projection so the next get_projection() reloads it"""
+    global _projection, _projection_loaded
+    _projection = None
+    _projection_loaded = False
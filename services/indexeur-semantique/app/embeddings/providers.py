@@ -0,0 +1,277 @@
+"""
+Embedding provider registry with one shared model instance per process
+"""
+
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Union
+import numpy as np
+import structlog
+
+from ..config import settings
+
+logger = structlog.get_logger()
+
+# Provider name -> factory(model_name) returning a SentenceTransformers-style model
+_PROVIDERS: Dict[str, Callable[[str], Any]] = {}
+
+
+def register_provider(name: str):
+    """Register an embedding provider factory under a name usable in EMBEDDING_PROVIDER"""
+
+    def decorator(factory: Callable[[str], Any]):
+        _PROVIDERS[name] = factory
+        return factory
+
+    return decorator
+
+
+def available_providers() -> List[str]:
+    """Names of registered providers"""
+    return sorted(_PROVIDERS)
+
+
+def _normalize(embeddings: np.ndarray) -> np.ndarray:
+    """L2-normalize embedding rows"""
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.clip(norms, 1e-12, None)
+
+
+class OllamaEmbeddingModel:
+    """
+    Ollama embeddings over a pooled HTTP client
+
+    Texts are sent in batches to /api/embed, and batches are dispatched
+    concurrently over a keep-alive connection pool. Servers without
+    /api/embed fall back to concurrent single-prompt /api/embeddings calls.
+    """
+
+    def __init__(self, model_name: str):
+        import httpx
+
+        self.model_name = model_name
+        self.base_url = settings.OLLAMA_BASE_URL.rstrip("/")
+        self.dimension = None
+        self._legacy_api = False
+
+        self.client = httpx.Client(
+            base_url=self.base_url,
+            timeout=settings.OLLAMA_REQUEST_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.OLLAMA_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.OLLAMA_POOL_MAX_CONNECTIONS
+            )
+        )
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.OLLAMA_EMBED_CONCURRENCY,
+            thread_name_prefix="ollama-embed"
+        )
+
+        logger.info(
+            "Using Ollama embeddings",
+            model=model_name,
+            base_url=self.base_url,
+            concurrency=settings.OLLAMA_EMBED_CONCURRENCY
+        )
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed one batch with a single request"""
+        if not self._legacy_api:
+            response = self.client.post("/api/embed", json={"model": self.model_name, "input": texts})
+            if response.status_code != 404:
+                response.raise_for_status()
+                return response.json()["embeddings"]
+
+            logger.warning("Ollama /api/embed not available, using /api/embeddings")
+            self._legacy_api = True
+
+        return list(self.executor.map(self._embed_legacy, texts))
+
+    def _embed_legacy(self, text: str) -> List[float]:
+        """Embed one text with the legacy single-prompt endpoint"""
+        response = self.client.post("/api/embeddings", json={"model": self.model_name, "prompt": text})
+        response.raise_for_status()
+        return response.json()["embedding"]
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        convert_to_numpy: bool = True,
+        normalize_embeddings: bool = False,
+        show_progress_bar: bool = False
+    ) -> np.ndarray:
+        """
+        Encode texts into embeddings
+
+        Args:
+            sentences: Text or list of texts
+            batch_size: Texts per Ollama request
+            convert_to_numpy: Accepted for API compatibility (always NumPy)
+            normalize_embeddings: L2-normalize the output vectors
+            show_progress_bar: Accepted for API compatibility
+
+        Returns:
+            1D vector for a single text, otherwise (n, dimension) array
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        if not texts:
+            return np.zeros((0, self.dimension or 0), dtype=np.float32)
+
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+
+        if len(batches) == 1 or self._legacy_api:
+            results = [self._embed_batch(batch) for batch in batches]
+        else:
+            results = list(self.executor.map(self._embed_batch, batches))
+
+        embeddings = np.array([vec for batch in results for vec in batch], dtype=np.float32)
+
+        if normalize_embeddings:
+            embeddings = _normalize(embeddings)
+
+        return embeddings[0] if single else embeddings
+
+    def get_sentence_embedding_dimension(self) -> int:
+        """Get embedding dimension"""
+        if self.dimension is None:
+            self.dimension = int(self.encode("dimension probe").shape[0])
+        return self.dimension
+
+    def close(self):
+        """Close the connection pool and worker threads"""
+        self.executor.shutdown(wait=False)
+        self.client.close()
+
+
+@register_provider("sentence-transformers")
+def _load_sentence_transformers(model_name: str):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name, device=settings.EMBEDDING_DEVICE)
+
+
+@register_provider("onnx")
+def _load_onnx(model_name: str):
+    from .onnx_backend import ONNXEmbeddingModel
+    return ONNXEmbeddingModel(model_name)
+
+
+@register_provider("ollama")
+def _load_ollama(model_name: str):
+    return OllamaEmbeddingModel(model_name)
+
+
+# File next to the FAISS index recording which model produced its vectors
+ACTIVE_MODEL_FILENAME = "embedding_model.json"
+
+
+def load_embedding_model(provider: str, model_name: str):
+    """
+    Instantiate a model with a registered provider
+
+    Args:
+        provider: Registered provider name
+        model_name: Model name passed to the provider factory
+
+    Returns:
+        SentenceTransformers-style model
+    """
+    if provider not in _PROVIDERS:
+        raise ValueError(
+            f"Unsupported embedding provider: {provider} "
+            f"(available: {', '.join(available_providers())})"
+        )
+
+    logger.info("Loading embedding model", provider=provider, model=model_name)
+    return _PROVIDERS[provider](model_name)
+
+
+def get_active_model_config() -> Dict[str, str]:
+    """
+    Provider and model that produced the vectors in the FAISS index
+
+    A completed model migration records its target next to the index, which
+    takes precedence over EMBEDDING_PROVIDER/EMBEDDING_MODEL so queries are
+    always embedded with the model the index was built with.
+    """
+    path = os.path.join(settings.FAISS_INDEX_PATH, ACTIVE_MODEL_FILENAME)
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return json.load(f)
+
+    return {"provider": settings.EMBEDDING_PROVIDER, "model": settings.EMBEDDING_MODEL}
+
+
+def write_active_model_config(directory: str, provider: str, model_name: str):
+    """Record the model that produced the vectors of an index directory"""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, ACTIVE_MODEL_FILENAME), "w") as f:
+        json.dump({"provider": provider, "model": model_name}, f)
+
+
+# Shared model instance
+_model = None
+_model_lock = threading.Lock()
+
+# Serializes bulk encodes of the shared model across threads (ingestion
+# embedding and semantic chunking): its fast tokenizer is reconfigured per
+# call and fails with "Already borrowed" when used concurrently
+encode_lock = threading.Lock()
+
+
+def get_embedding_model():
+    """
+    Get the process-wide embedding model for the active provider
+
+    Every embedding consumer in the process (API, micro-batcher, consumer,
+    scripts) shares this instance, so the model is loaded exactly once.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                active = get_active_model_config()
+                if (active["provider"], active["model"]) != (settings.EMBEDDING_PROVIDER, settings.EMBEDDING_MODEL):
+                    logger.warning(
+                        "Index was built with a different embedding model than configured, using the index's model",
+                        configured=settings.EMBEDDING_MODEL,
+                        active=active["model"]
+                    )
+                    settings.EMBEDDING_PROVIDER = active["provider"]
+                    settings.EMBEDDING_MODEL = active["model"]
+
+                _model = load_embedding_model(settings.EMBEDDING_PROVIDER, settings.EMBEDDING_MODEL)
+    return _model
+
+
+def swap_embedding_model(model, provider: str, model_name: str):
+    """
+    Replace the shared model (used at migration cutover)
+
+    Args:
+        model: Already loaded replacement model
+        provider: Its provider name
+        model_name: Its model name
+    """
+    global _model
+    with _model_lock:
+        previous = _model
+        _model = model
+        settings.EMBEDDING_PROVIDER = provider
+        settings.EMBEDDING_MODEL = model_name
+
+    if previous is not None and previous is not model and hasattr(previous, "close"):
+        previous.close()
+
+
+def close_embedding_model():
+    """Release resources held by the shared model (connection pools, threads)"""
+    global _model
+    with _model_lock:
+        if _model is not None and hasattr(_model, "close"):
+            _model.close()
+        _model = None
@@ -0,0 +1,409 @@
+"""
+Multi-process embedding worker pool for bulk ingestion
+"""
+
+import os
+import queue
+import threading
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from typing import List, Dict, Any, Optional, Callable
+import numpy as np
+import structlog
+
+from ..config import settings
+from .length_batching import encode_length_bucketed
+
+logger = structlog.get_logger()
+
+# Bytes per character reserved in the input buffer (UTF-8 worst case)
+_BYTES_PER_CHAR = 4
+
+
+def _split_cores(n_workers: int) -> List[List[int]]:
+    """Split the cores available to this process into contiguous per-worker sets"""
+    if hasattr(os, "sched_getaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = list(range(os.cpu_count() or 1))
+
+    n_workers = max(1, min(n_workers, len(cores)))
+    return [[int(core) for core in chunk] for chunk in np.array_split(cores, n_workers)]
+
+
+def _pin_to_cores(cores: List[int]):
+    """Pin the current process and its compute threads to a core set"""
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+    # Size every intra-op thread pool to the pinned cores before the model loads
+    n_threads = str(len(cores))
+    os.environ["OMP_NUM_THREADS"] = n_threads
+    os.environ["MKL_NUM_THREADS"] = n_threads
+    if settings.ONNX_INTRA_OP_THREADS == 0:
+        settings.ONNX_INTRA_OP_THREADS = len(cores)
+
+    try:
+        import torch
+        torch.set_num_threads(len(cores))
+    except ImportError:
+        pass
+
+
+def _write_texts(buffer: memoryview, texts: List[str]) -> None:
+    """Write texts into an input buffer as [n+1 int64 offsets][utf-8 bytes]"""
+    encoded = [text.encode("utf-8") for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+
+    header = offsets.nbytes
+    buffer[:header] = offsets.tobytes()
+    buffer[header:header + offsets[-1]] = b"".join(encoded)
+
+
+def _read_texts(buffer: memoryview, count: int) -> List[str]:
+    """Read texts written by _write_texts"""
+    offsets = np.frombuffer(buffer, dtype=np.int64, count=count + 1)
+    header = offsets.nbytes
+    data = bytes(buffer[header:header + offsets[-1]])
+    return [data[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(count)]
+
+
+def _worker_main(
+    conn,
+    cores: List[int],
+    input_name: str,
+    model_factory: Optional[Callable[[], Any]]
+):
+    """
+    Embedding worker process loop
+
+    Protocol over conn (control messages only, no arrays):
+        worker -> ("ready", dimension) once the model is loaded
+        parent -> ("attach", output_name) with the output buffer name
+        parent -> ("encode", count)      texts are in the input buffer
+        worker -> ("done", count) / ("error", message)
+        parent -> ("stop",)
+    """
+    if model_factory is None:
+        from .providers import get_embedding_model
+        model_factory = get_embedding_model
+
+    input_shm = shared_memory.SharedMemory(name=input_name)
+    output_shm = None
+
+    try:
+        try:
+            _pin_to_cores(cores)
+            model = model_factory()
+            dimension = int(model.get_sentence_embedding_dimension())
+        except Exception as e:
+            conn.send(("error", str(e)))
+            return
+
+        conn.send(("ready", dimension))
+
+        while True:
+            message = conn.recv()
+            command = message[0]
+
+            if command == "stop":
+                break
+
+            if command == "attach":
+                output_shm = shared_memory.SharedMemory(name=message[1])
+                continue
+
+            count = message[1]
+            try:
+                texts = _read_texts(input_shm.buf, count)
+                if settings.EMBEDDING_LENGTH_BUCKETING:
+                    embeddings = encode_length_bucketed(model, texts)
+                else:
+                    embeddings = model.encode(
+                        texts,
+                        batch_size=settings.EMBEDDING_BATCH_SIZE,
+                        convert_to_numpy=True,
+                        normalize_embeddings=True
+                    )
+                output = np.ndarray((count, dimension), dtype=np.float32, buffer=output_shm.buf)
+                output[:] = embeddings
+                conn.send(("done", count))
+            except Exception as e:
+                conn.send(("error", str(e)))
+    finally:
+        input_shm.close()
+        if output_shm is not None:
+            output_shm.close()
+
+
+class _WorkerDied(RuntimeError):
+    """The worker process exited (crash, OOM kill) while encoding"""
+
+
+class _Worker:
+    """Parent-side handle of one worker process and its shared buffers"""
+
+    def __init__(self, ctx, cores: List[int], slot_size: int, model_factory):
+        self.cores = cores
+        self.slot_size = slot_size
+        self.max_chars = settings.EMBEDDING_MAX_LENGTH * 4
+
+        input_bytes = (slot_size + 1) * 8 + slot_size * self.max_chars * _BYTES_PER_CHAR
+        self.input_shm = shared_memory.SharedMemory(create=True, size=input_bytes)
+        self.output_shm = None
+        self.output = None
+
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, cores, self.input_shm.name, model_factory),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def wait_ready(self, timeout: float) -> int:
+        """Wait for the model to load, then attach the output buffer"""
+        if not self.conn.poll(timeout):
+            raise RuntimeError(f"Embedding worker on cores {self.cores} did not start")
+
+        status, payload = self.conn.recv()
+        if status != "ready":
+            raise RuntimeError(f"Embedding worker failed to start: {payload}")
+
+        dimension = payload
+        self.output_shm = shared_memory.SharedMemory(
+            create=True,
+            size=self.slot_size * dimension * np.dtype(np.float32).itemsize
+        )
+        self.output = np.ndarray((self.slot_size, dimension), dtype=np.float32, buffer=self.output_shm.buf)
+        self.conn.send(("attach", self.output_shm.name))
+        return dimension
+
+    def encode(self, texts: List[str], out: np.ndarray):
+        """Encode one slot of texts into out (rows copied from shared memory)"""
+        texts = [text[:self.max_chars] for text in texts]
+        _write_texts(self.input_shm.buf, texts)
+        try:
+            self.conn.send(("encode", len(texts)))
+            status, payload = self.conn.recv()
+        except (EOFError, OSError) as e:
+            raise _WorkerDied(f"Embedding worker on cores {self.cores} exited") from e
+        if status != "done":
+            raise RuntimeError(f"Embedding worker failed: {payload}")
+
+        out[:] = self.output[:len(texts)]
+
+    def stop(self):
+        """Stop the process and release shared memory"""
+        try:
+            if self.process.is_alive():
+                try:
+                    self.conn.send(("stop",))
+                except (BrokenPipeError, OSError):
+                    pass
+                self.process.join(timeout=10)
+            if self.process.is_alive():
+                self.process.terminate()
+        finally:
+            self.conn.close()
+            for shm in (self.input_shm, self.output_shm):
+                if shm is not None:
+                    shm.close()
+                    shm.unlink()
+            self.output = None
+
+
+class EmbeddingWorkerPool:
+    """
+    Embed large text batches across model replicas in separate processes
+
+    Each worker is pinned to a disjoint set of cores and owns one input and
+    one output shared-memory buffer. Texts are written to the input buffer
+    as UTF-8 with an offset table, embeddings are written back as float32
+    rows, and only small control tuples travel over the pipes. A worker
+    whose process dies is respawned on the same cores and its slot is
+    encoded again.
+    """
+
+    def __init__(
+        self,
+        n_workers: Optional[int] = None,
+        slot_size: Optional[int] = None,
+        model_factory: Optional[Callable[[], Any]] = None
+    ):
+        """
+        Args:
+            n_workers: Worker processes (defaults to EMBEDDING_WORKERS)
+            slot_size: Texts per worker call (defaults to EMBEDDING_WORKER_SLOT_SIZE)
+            model_factory: Picklable callable returning a model in the worker
+                (defaults to the configured provider)
+        """
+        self.n_workers = n_workers or settings.EMBEDDING_WORKERS
+        self.slot_size = slot_size or settings.EMBEDDING_WORKER_SLOT_SIZE
+        self.model_factory = model_factory
+        self.dimension = None
+        self.workers: List[_Worker] = []
+        self._lock = threading.Lock()
+        self._ctx = mp.get_context("spawn")
+        self.start_timeout = 300.0
+        self.texts_total = 0
+        self.respawns = 0
+
+    def start(self, timeout: float = 300.0):
+        """Spawn workers and wait until every model is loaded"""
+        if self.workers:
+            return
+
+        self.start_timeout = timeout
+        core_sets = _split_cores(self.n_workers)
+
+        logger.info("Starting embedding worker pool", workers=len(core_sets), cores=core_sets)
+
+        self.workers = [_Worker(self._ctx, cores, self.slot_size, self.model_factory) for cores in core_sets]
+        try:
+            dimensions = {worker.wait_ready(timeout) for worker in self.workers}
+        except Exception:
+            self.close()
+            raise
+
+        if len(dimensions) != 1:
+            self.close()
+            raise RuntimeError(f"Embedding workers disagree on dimension: {sorted(dimensions)}")
+
+        self.dimension = dimensions.pop()
+        logger.info("Embedding worker pool ready", workers=len(self.workers), dimension=self.dimension)
+
+    def _respawn(self, worker: _Worker):
+        """Replace a dead worker with a new process on the same cores"""
+        logger.warning(
+            "Embedding worker died, respawning",
+            cores=worker.cores,
+            exitcode=worker.process.exitcode
+        )
+        self.workers.remove(worker)
+        try:
+            worker.stop()
+        except Exception as e:
+            logger.warning("Failed to clean up dead embedding worker", cores=worker.cores, error=str(e))
+
+        replacement = _Worker(self._ctx, worker.cores, self.slot_size, self.model_factory)
+        try:
+            dimension = replacement.wait_ready(self.start_timeout)
+            if dimension != self.dimension:
+                raise RuntimeError(f"Respawned embedding worker has dimension {dimension}, expected {self.dimension}")
+        except Exception:
+            replacement.stop()
+            raise
+
+        self.workers.append(replacement)
+        self.respawns += 1
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Generate L2-normalized embeddings for texts using all workers
+
+        Args:
+            texts: List of texts to embed
+
+        Returns:
+            Array of shape (len(texts), dimension), in input order
+
+        Raises:
+            RuntimeError: If a worker fails, or dies again after a respawn
+        """
+        with self._lock:
+            self.start()
+
+            result = np.empty((len(texts), self.dimension), dtype=np.float32)
+            # Split smaller batches evenly so every worker gets a share
+            step = max(1, min(self.slot_size, -(-len(texts) // len(self.workers))))
+            slots = queue.Queue()
+            for start in range(0, len(texts), step):
+                slots.put(start)
+
+            # Each round drives the live workers; slots of workers that died go back in the queue
+            for attempt in range(2):
+                errors = []
+                dead = []
+
+                def drive(worker: _Worker):
+                    while not errors:
+                        try:
+                            start = slots.get_nowait()
+                        except queue.Empty:
+                            return
+                        end = min(start + step, len(texts))
+                        try:
+                            worker.encode(texts[start:end], result[start:end])
+                        except _WorkerDied:
+                            slots.put(start)
+                            dead.append(worker)
+                            return
+                        except Exception as e:
+                            errors.append(e)
+
+                drivers = [threading.Thread(target=drive, args=(worker,)) for worker in self.workers]
+                for driver in drivers:
+                    driver.start()
+                for driver in drivers:
+                    driver.join()
+
+                try:
+                    for worker in dead:
+                        self._respawn(worker)
+                except Exception:
+                    # Leave the pool to be restarted from scratch on the next call
+                    self.close()
+                    raise
+
+                if errors:
+                    raise errors[0]
+                if slots.empty():
+                    break
+            else:
+                raise RuntimeError("Embedding workers died again after being respawned")
+
+            self.texts_total += len(texts)
+            return result
+
+    def close(self):
+        """Stop all workers and release shared memory"""
+        for worker in self.workers:
+            try:
+                worker.stop()
+            except Exception as e:
+                logger.warning("Failed to stop embedding worker", cores=worker.cores, error=str(e))
+        self.workers = []
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pool statistics"""
+        return {
+            "workers": len(self.workers),
+            "core_sets": [worker.cores for worker in self.workers],
+            "slot_size": self.slot_size,
+            "dimension": self.dimension,
+            "texts_total": self.texts_total,
+            "respawns": self.respawns
+        }
+
+
+# Global worker pool instance
+_worker_pool = None
+
+
+def get_embedding_worker_pool() -> Optional[EmbeddingWorkerPool]:
+    """Get embedding worker pool singleton (None when EMBEDDING_WORKERS is 0)"""
+    global _worker_pool
+    if _worker_pool is None and settings.EMBEDDING_WORKERS > 0:
+        _worker_pool = EmbeddingWorkerPool()
+    return _worker_pool
+
+
+def close_embedding_worker_pool():
+    """Stop the worker pool if it was started"""
+    global _worker_pool
+    if _worker_pool is not None:
+        _worker_pool.close()
+        _worker_pool = None
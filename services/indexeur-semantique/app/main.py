@@ -12,6 +12,8 @@ import os
 
 from .database import engine, Base
 from .api import search
+from .embeddings import get_micro_batcher, close_embedding_model, close_embedding_worker_pool
+from .services import get_embedding_migration
 from .config import settings
 
 # Add shared module to path
@@ -54,6 +56,16 @@ async def lifespan(app: FastAPI):
     logger.info("IndexeurSémantique service started successfully")
     yield
     
+    # Checkpoint a running embedding migration so it can resume
+    migration = get_embedding_migration()
+    if migration is not None:
+        migration.stop()
+    
+    # Stop query embedding micro-batcher
+    await get_micro_batcher().stop()
+    close_embedding_model()
+    close_embedding_worker_pool()
+    
     # Deregister from Eureka
     if eureka_registry:
         try:
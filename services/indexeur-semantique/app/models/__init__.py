@@ -1,4 +1,4 @@
 """Models package"""
-from .document_chunk import DocumentChunk, SearchLog
+from .document_chunk import DocumentChunk, ParentChunk, SearchLog
 
-__all__ = ["DocumentChunk", "SearchLog"]
+__all__ = ["DocumentChunk", "ParentChunk", "SearchLog"]
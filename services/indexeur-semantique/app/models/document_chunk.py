@@ -40,6 +40,31 @@ class DocumentChunk(Base):
         return f"<DocumentChunk {self.document_id}:{self.chunk_index}>"
 
 
+class ParentChunk(Base):
+    """Parent section of small child chunks (small-to-big retrieval)"""
+    
+    __tablename__ = "parent_chunks"
+    
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    
+    # Document reference
+    document_id = Column(String(36), nullable=False, index=True)
+    parent_index = Column(Integer, nullable=False)
+    
+    # Content
+    parent_text = Column(Text, nullable=False)
+    header = Column(String(500))
+    
+    # Children are the document's DocumentChunk rows with chunk_index in [child_start, child_end)
+    child_start = Column(Integer, nullable=False)
+    child_end = Column(Integer, nullable=False)
+    
+    created_at = Column(TIMESTAMP, nullable=False, server_default=func.now())
+    
+    def __repr__(self):
+        return f"<ParentChunk {self.document_id}:{self.parent_index}>"
+
+
 class SearchLog(Base):
     """Search query log for analytics"""
     
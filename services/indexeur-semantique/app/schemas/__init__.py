@@ -5,7 +5,9 @@ from .search import (
     SearchRequest,
     SearchResult,
     SearchResponse,
-    IndexStatsResponse
+    IndexStatsResponse,
+    PatientSummary,
+    PatientListResponse
 )
 
 __all__ = [
@@ -14,5 +16,7 @@ __all__ = [
     "SearchRequest",
     "SearchResult",
     "SearchResponse",
-    "IndexStatsResponse"
+    "IndexStatsResponse",
+    "PatientSummary",
+    "PatientListResponse"
 ]
@@ -13,17 +13,32 @@ class IndexDocumentRequest(BaseModel):
     text: str = Field(..., description="Document text to index")
     chunking_strategy: Optional[str] = Field("paragraph", description="Chunking strategy")
     metadata: Optional[Dict[str, Any]] = Field(default_factory=dict, description="Additional metadata")
+    hierarchical: Optional[bool] = Field(None, description="Index child chunks linked to parent sections (default: HIERARCHICAL_CHUNKING)")
 
 
 class IndexDocumentResponse(BaseModel):
     """Response after indexing"""
     document_id: UUID
     chunks_created: int
+    parents_created: int = 0
     embeddings_generated: int
     faiss_ids: List[int]
     processing_time_ms: int
 
 
+class IndexBatchRequest(BaseModel):
+    """Request to index many documents at once"""
+    documents: List[IndexDocumentRequest] = Field(..., description="Documents to index")
+
+
+class IndexBatchResponse(BaseModel):
+    """Response after batch indexing"""
+    documents: List[IndexDocumentResponse]
+    documents_indexed: int
+    chunks_created: int
+    processing_time_ms: int
+
+
 class SearchRequest(BaseModel):
     """Request to search for similar documents"""
     query: str = Field(..., description="Search query")
@@ -34,6 +49,7 @@ class SearchRequest(BaseModel):
     semantic_weight: Optional[float] = Field(None, description="Weight for semantic search (0-1)")
     lexical_weight: Optional[float] = Field(None, description="Weight for lexical search (0-1)")
     filters: Optional[Dict[str, Any]] = Field(None, description="Metadata filters (patient_id, date_range, doc_type)")
+    return_parents: Optional[bool] = Field(None, description="Return deduplicated parent sections instead of child chunks (default: SEARCH_RETURN_PARENTS)")
 
 
 class SearchResult(BaseModel):
@@ -65,3 +81,45 @@ class IndexStatsResponse(BaseModel):
     dimension: int
     index_type: str
     is_trained: bool
+
+
+class PatientSummary(BaseModel):
+    """Aggregated view of one patient's indexed documents"""
+    id: str
+    name: Optional[str] = None
+    age: Optional[int] = None
+    gender: Optional[str] = None
+    document_count: int
+    chunk_count: int
+    last_indexed_at: Optional[str] = None
+    document_types: List[str]
+
+
+class PatientListResponse(BaseModel):
+    """Paginated list of patients"""
+    patients: List[PatientSummary]
+    total: int
+    page: int
+    page_size: int
+
+
+class EmbeddingMigrationRequest(BaseModel):
+    """Request to re-embed the corpus with another model"""
+    target_model: str = Field(..., description="Embedding model to migrate to")
+    target_provider: Optional[str] = Field(None, description="Provider of the target model (defaults to current)")
+    batch_size: Optional[int] = Field(None, description="Chunks per batch")
+
+
+class EmbeddingMigrationStatus(BaseModel):
+    """Progress of an embedding model migration"""
+    target_model: str
+    target_provider: str
+    status: str  # pending, running, stopped, failed, ready, cut_over
+    running: bool
+    processed: int
+    remaining: Optional[int] = None
+    vectors: int
+    started_at: Optional[str] = None
+    updated_at: Optional[str] = None
+    cutover_at: Optional[str] = None
+    error: Optional[str] = None
@@ -1,8 +1,14 @@
 """Services package"""
-from .chunker import TextChunker, get_chunker
+from .chunker import TextChunker, get_chunker, reset_chunker
 from .faiss_manager import FAISSManager, get_faiss_manager
 from .bm25_manager import BM25Manager, get_bm25_manager
 from .hybrid_search import HybridSearchService, get_hybrid_search_service
+from .patient_index import PatientIndex, get_patient_index
+from .parent_chunks import collapse_to_parents
+from .indexing import DocumentIndexer
+from .embedding_migration import EmbeddingMigration, get_embedding_migration, start_embedding_migration
 
-__all__ = ["TextChunker", "get_chunker", "FAISSManager", "get_faiss_manager", 
-           "BM25Manager", "get_bm25_manager", "HybridSearchService", "get_hybrid_search_service"]
+__all__ = ["TextChunker", "get_chunker", "reset_chunker", "FAISSManager", "get_faiss_manager", 
+           "BM25Manager", "get_bm25_manager", "HybridSearchService", "get_hybrid_search_service",
+           "PatientIndex", "get_patient_index", "collapse_to_parents", "DocumentIndexer",
+           "EmbeddingMigration", "get_embedding_migration", "start_embedding_migration"]
@@ -4,6 +4,8 @@ BM25 index manager for lexical search
 
 import os
 import pickle
+import threading
+from contextlib import contextmanager
 from typing import List, Dict, Any, Optional
 import structlog
 from rank_bm25 import BM25Okapi
@@ -12,6 +14,7 @@ from nltk.tokenize import word_tokenize
 from nltk.corpus import stopwords
 
 from ..config import settings
+from .index_files import file_version, file_lock, atomic_pickle_dump, BackgroundReloader
 
 logger = structlog.get_logger()
 
@@ -27,15 +30,69 @@ except LookupError:
     nltk.download('stopwords', quiet=True)
 
 
+_stop_words = None
+
+
+def tokenize_text(text: str) -> List[str]:
+    """
+    Tokenize and preprocess text for BM25
+    
+    Module-level so offline index builds can tokenize in worker processes.
+    
+    Args:
+        text: Input text
+        
+    Returns:
+        Lowercased alphanumeric tokens without English stopwords
+    """
+    global _stop_words
+    if _stop_words is None:
+        _stop_words = set(stopwords.words('english'))
+    
+    try:
+        # Tokenize
+        tokens = word_tokenize(text.lower())
+        
+        # Remove stopwords and non-alphabetic tokens
+        return [
+            token for token in tokens
+            if token.isalnum() and token not in _stop_words
+        ]
+        
+    except Exception as e:
+        logger.error("Tokenization failed", error=str(e))
+        return []
+
+
+def tokenize_texts(texts: List[str]) -> List[List[str]]:
+    """Tokenize a batch of texts (picklable unit of work for process pools)"""
+    return [tokenize_text(text) for text in texts]
+
+
 class BM25Manager:
-    """BM25 index management for lexical search"""
+    """
+    BM25 index management for lexical search
+    
+    The API and the RabbitMQ consumer share the index file: updates run
+    under a cross-process file lock on the latest saved corpus, and
+    searches reload the corpus when the saved version changes.
+    """
     
-    def __init__(self):
+    def __init__(self, index_dir: str = None):
+        """
+        Args:
+            index_dir: Directory of the index (defaults to BM25_INDEX_PATH)
+        """
         self.bm25 = None
         self.corpus = []  # List of tokenized documents
         self.metadata = []  # Metadata for each document
-        self.index_path = os.path.join(settings.BM25_INDEX_PATH, "bm25_index.pkl")
-        self.stop_words = set(stopwords.words('english'))
+        self.index_dir = index_dir or settings.BM25_INDEX_PATH
+        self.index_path = os.path.join(self.index_dir, "bm25_index.pkl")
+        self.lock = threading.RLock()
+        self.loaded_version = None  # file_version of the corpus last loaded or saved
+        self._write_depth = 0
+        self.reloader = BackgroundReloader(self._reload, "bm25-reload")
+        self.swap_lock = threading.Lock()  # A search sees BM25 and metadata from the same load
         
         # BM25 parameters
         self.k1 = settings.BM25_K1
@@ -47,7 +104,7 @@ class BM25Manager:
         """Initialize or load BM25 index"""
         try:
             # Create directory if needed
-            os.makedirs(settings.BM25_INDEX_PATH, exist_ok=True)
+            os.makedirs(self.index_dir, exist_ok=True)
             
             # Try to load existing index
             if os.path.exists(self.index_path):
@@ -60,30 +117,8 @@ class BM25Manager:
             raise
     
     def _tokenize(self, text: str) -> List[str]:
-        """
-        Tokenize and preprocess text
-        
-        Args:
-            text: Input text
-            
-        Returns:
-            List of tokens
-        """
-        try:
-            # Tokenize
-            tokens = word_tokenize(text.lower())
-            
-            # Remove stopwords and non-alphabetic tokens
-            tokens = [
-                token for token in tokens
-                if token.isalnum() and token not in self.stop_words
-            ]
-            
-            return tokens
-            
-        except Exception as e:
-            logger.error("Tokenization failed", error=str(e))
-            return []
+        """Tokenize and preprocess text"""
+        return tokenize_text(text)
     
     def add_documents(
         self,
@@ -104,25 +139,26 @@ class BM25Manager:
             # Tokenize all documents
             tokenized_docs = [self._tokenize(text) for text in texts]
             
-            # Add to corpus
-            self.corpus.extend(tokenized_docs)
-            self.metadata.extend(chunk_metadata)
-            
-            # Rebuild BM25 index
-            self.bm25 = BM25Okapi(
-                self.corpus,
-                k1=self.k1,
-                b=self.b
-            )
-            
-            logger.info(
-                "Documents added to BM25 index",
-                count=len(texts),
-                total_documents=len(self.corpus)
-            )
-            
-            # Save index
-            self.save_index()
+            with self.writing():
+                # Add to corpus
+                self.corpus.extend(tokenized_docs)
+                self.metadata.extend(chunk_metadata)
+                
+                # Rebuild BM25 index
+                self.bm25 = BM25Okapi(
+                    self.corpus,
+                    k1=self.k1,
+                    b=self.b
+                )
+                
+                logger.info(
+                    "Documents added to BM25 index",
+                    count=len(texts),
+                    total_documents=len(self.corpus)
+                )
+                
+                # Save index
+                self.save_index()
             
         except Exception as e:
             logger.error("Adding documents to BM25 failed", error=str(e))
@@ -144,7 +180,10 @@ class BM25Manager:
             List of results with scores and metadata
         """
         try:
-            if self.bm25 is None or len(self.corpus) == 0:
+            self.refresh()
+            with self.swap_lock:
+                bm25, metadata = self.bm25, self.metadata
+            if bm25 is None or len(metadata) == 0:
                 logger.warning("BM25 index is empty")
                 return []
             
@@ -156,7 +195,7 @@ class BM25Manager:
                 return []
             
             # Get BM25 scores
-            scores = self.bm25.get_scores(tokenized_query)
+            scores = bm25.get_scores(tokenized_query)
             
             # Get top-k indices
             top_indices = scores.argsort()[-top_k:][::-1]
@@ -170,12 +209,10 @@ class BM25Manager:
                 if score <= 0:
                     continue
                 
-                metadata = self.metadata[idx]
-                
                 results.append({
                     "bm25_score": score,
                     "rank": len(results) + 1,
-                    **metadata
+                    **metadata[idx]
                 })
             
             logger.info(
@@ -203,8 +240,8 @@ class BM25Manager:
                 'b': self.b
             }
             
-            with open(self.index_path, 'wb') as f:
-                pickle.dump(index_data, f)
+            atomic_pickle_dump(index_data, self.index_path)
+            self.loaded_version = file_version(self.index_path)
             
             logger.info("BM25 index saved successfully")
             
@@ -212,26 +249,29 @@ class BM25Manager:
             logger.error("BM25 index saving failed", error=str(e))
             raise
     
+    def _read_index(self):
+        """Read the corpus from disk and rebuild BM25 (raises on failure)"""
+        version = file_version(self.index_path)
+        with open(self.index_path, 'rb') as f:
+            index_data = pickle.load(f)
+        
+        corpus = index_data['corpus']
+        k1 = index_data.get('k1', self.k1)
+        b = index_data.get('b', self.b)
+        
+        # Rebuild BM25 object
+        bm25 = BM25Okapi(corpus, k1=k1, b=b) if corpus else None
+        with self.swap_lock:
+            self.corpus, self.metadata, self.bm25 = corpus, index_data['metadata'], bm25
+            self.k1, self.b = k1, b
+        self.loaded_version = version
+    
     def _load_index(self):
         """Load BM25 index from disk"""
         try:
             logger.info("Loading existing BM25 index", path=self.index_path)
             
-            with open(self.index_path, 'rb') as f:
-                index_data = pickle.load(f)
-            
-            self.corpus = index_data['corpus']
-            self.metadata = index_data['metadata']
-            self.k1 = index_data.get('k1', self.k1)
-            self.b = index_data.get('b', self.b)
-            
-            # Rebuild BM25 object
-            if self.corpus:
-                self.bm25 = BM25Okapi(
-                    self.corpus,
-                    k1=self.k1,
-                    b=self.b
-                )
+            self._read_index()
             
             logger.info(
                 "BM25 index loaded successfully",
@@ -245,6 +285,65 @@ class BM25Manager:
             self.metadata = []
             self.bm25 = None
     
+    def refresh(self, wait: bool = False):
+        """
+        Reload the corpus if another process saved a newer one
+        
+        Searches call this without waiting: the reload runs in a background
+        thread (behind in-process writers and the file lock) while they keep
+        using the corpus already loaded.
+        
+        Args:
+            wait: Reload in the calling thread instead
+        """
+        if file_version(self.index_path) == self.loaded_version:
+            return
+        
+        if wait:
+            self._reload()
+        else:
+            self.reloader.start()
+    
+    def _reload(self):
+        """Reload the saved corpus unless it is already loaded"""
+        with self.lock:
+            if self._write_depth:
+                return  # This thread is writing and already holds the latest corpus
+            with file_lock(self.index_path):
+                if file_version(self.index_path) == self.loaded_version:
+                    return
+                try:
+                    self._read_index()
+                    logger.info("BM25 index reloaded", total_documents=len(self.corpus))
+                except Exception as e:
+                    logger.error("BM25 index reload failed, keeping loaded index", error=str(e))
+    
+    @contextmanager
+    def writing(self):
+        """
+        Exclusive write access to the corpus across threads and processes
+        
+        On entry the corpus is reloaded if another process saved a newer
+        one, so the save inside the block never drops its documents.
+        """
+        with self.lock:
+            if self._write_depth:
+                self._write_depth += 1
+                try:
+                    yield self
+                finally:
+                    self._write_depth -= 1
+                return
+            
+            with file_lock(self.index_path):
+                self._write_depth += 1
+                try:
+                    if file_version(self.index_path) != self.loaded_version:
+                        self._read_index()
+                    yield self
+                finally:
+                    self._write_depth -= 1
+    
     def delete_by_document_id(self, document_id: str):
         """
         Delete all chunks for a document
@@ -253,39 +352,40 @@ class BM25Manager:
             document_id: Document UUID to delete
         """
         try:
-            # Find indices to remove
-            indices_to_remove = [
-                i for i, meta in enumerate(self.metadata)
-                if meta.get('document_id') == document_id
-            ]
-            
-            if not indices_to_remove:
-                logger.warning("No documents found to delete", document_id=document_id)
-                return
-            
-            # Remove in reverse order to maintain indices
-            for idx in sorted(indices_to_remove, reverse=True):
-                del self.corpus[idx]
-                del self.metadata[idx]
-            
-            # Rebuild BM25 index
-            if self.corpus:
-                self.bm25 = BM25Okapi(
-                    self.corpus,
-                    k1=self.k1,
-                    b=self.b
+            with self.writing():
+                # Find indices to remove
+                indices_to_remove = [
+                    i for i, meta in enumerate(self.metadata)
+                    if meta.get('document_id') == document_id
+                ]
+                
+                if not indices_to_remove:
+                    logger.warning("No documents found to delete", document_id=document_id)
+                    return
+                
+                # Remove in reverse order to maintain indices
+                for idx in sorted(indices_to_remove, reverse=True):
+                    del self.corpus[idx]
+                    del self.metadata[idx]
+                
+                # Rebuild BM25 index
+                if self.corpus:
+                    self.bm25 = BM25Okapi(
+                        self.corpus,
+                        k1=self.k1,
+                        b=self.b
+                    )
+                else:
+                    self.bm25 = None
+                
+                logger.info(
+                    "Documents deleted from BM25 index",
+                    document_id=document_id,
+                    chunks_deleted=len(indices_to_remove)
                 )
-            else:
-                self.bm25 = None
-            
-            logger.info(
-                "Documents deleted from BM25 index",
-                document_id=document_id,
-                chunks_deleted=len(indices_to_remove)
-            )
-            
-            # Save updated index
-            self.save_index()
+                
+                # Save updated index
+                self.save_index()
             
         except Exception as e:
             logger.error("BM25 deletion failed", error=str(e))
@@ -293,6 +393,7 @@ class BM25Manager:
     
     def get_stats(self) -> Dict[str, Any]:
         """Get BM25 index statistics"""
+        self.refresh()
         return {
             "total_documents": len(self.corpus),
             "k1": self.k1,
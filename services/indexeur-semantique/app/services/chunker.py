@@ -2,14 +2,21 @@
 Text chunking strategies for semantic indexing
 """
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple, Optional, Iterable, Iterator
+import copy
 import re
+import threading
+import numpy as np
 import structlog
 
 from ..config import settings
+from ..embeddings.providers import get_embedding_model, encode_lock
 
 logger = structlog.get_logger()
 
+# A sentence runs to terminal punctuation followed by whitespace, a paragraph break, or the end
+SENTENCE_PATTERN = r'\S.*?(?:[.!?]+(?=\s|$)|(?=\n\s*\n)|$)'
+
 
 class TextChunker:
     """Text chunking with multiple strategies"""
@@ -18,6 +25,199 @@ class TextChunker:
         self.strategy = settings.CHUNKING_STRATEGY
         self.chunk_size = settings.CHUNK_SIZE
         self.chunk_overlap = settings.CHUNK_OVERLAP
+        self.max_tokens = None
+        self._tokenizer = None
+        self._tokenizer_checked = not settings.CHUNK_TOKEN_AWARE
+        self._tokenizer_lock = threading.Lock()
+        self._local = threading.local()  # Per-thread copies of _tokenizer, which stays unused
+    
+    def _get_tokenizer(self):
+        """
+        Fast tokenizer of the embedding model, or None when unavailable
+        
+        Token-aware chunking needs offset mappings, which only fast
+        (Rust) tokenizers provide. Providers without a local tokenizer
+        (Ollama) fall back to word and character based sizing. Each thread
+        gets its own copy, since the Rust tokenizer rejects concurrent use.
+        """
+        if not self._tokenizer_checked:
+            with self._tokenizer_lock:
+                if not self._tokenizer_checked:
+                    self._load_tokenizer()
+                    self._tokenizer_checked = True
+        
+        if self._tokenizer is None:
+            return None
+        tokenizer = getattr(self._local, "tokenizer", None)
+        if tokenizer is None:
+            tokenizer = self._local.tokenizer = copy.deepcopy(self._tokenizer)
+        return tokenizer
+    
+    def _load_tokenizer(self):
+        """Keep a copy of the model's fast tokenizer and size max_tokens from it"""
+        try:
+            model = get_embedding_model()
+            tokenizer = getattr(model, "tokenizer", None)
+            
+            if tokenizer is not None and getattr(tokenizer, "is_fast", False):
+                window = getattr(model, "max_seq_length", None) or settings.EMBEDDING_MAX_LENGTH
+                # Own copy: concurrent encode calls reconfigure the model's tokenizer
+                # (truncation), which the Rust tokenizer rejects while another
+                # thread is using it
+                with encode_lock:
+                    self._tokenizer = copy.deepcopy(tokenizer)
+                self.max_tokens = min(self.chunk_size, window) - tokenizer.num_special_tokens_to_add(pair=False)
+                logger.info("Token-aware chunking enabled", max_tokens=self.max_tokens)
+            else:
+                logger.warning("No fast tokenizer available, chunking by words and characters")
+        except Exception as e:
+            logger.warning("Tokenizer unavailable, chunking by words and characters", error=str(e))
+
+    def _offsets(self, texts: List[str]) -> List[List[Tuple[int, int]]]:
+        """Character offsets of every token, for all texts in one tokenizer call"""
+        encoded = self._get_tokenizer()(
+            texts,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            return_attention_mask=False,
+            verbose=False
+        )
+        return [[tuple(span) for span in offsets] for offsets in encoded["offset_mapping"]]
+    
+    def _token_windows(
+        self,
+        text: str,
+        offsets: List[Tuple[int, int]],
+        overlap: int
+    ) -> List[Tuple[int, int, int, int]]:
+        """
+        Split token offsets into windows of at most max_tokens tokens
+        
+        Window ends are moved back to a word boundary when one lies in the
+        last eighth of the window, so subword pieces stay together.
+        
+        Returns:
+            List of (token_start, token_end, char_start, char_end)
+        """
+        windows = []
+        n_tokens = len(offsets)
+        start = 0
+        
+        while start < n_tokens:
+            end = min(start + self.max_tokens, n_tokens)
+            
+            if end < n_tokens:
+                floor = max(start + 1, end - self.max_tokens // 8)
+                for boundary in range(end, floor - 1, -1):
+                    char = offsets[boundary][0]
+                    if char > 0 and text[char - 1].isspace():
+                        end = boundary
+                        break
+            
+            windows.append((start, end, offsets[start][0], offsets[end - 1][1]))
+            
+            if end == n_tokens:
+                break
+            start = max(end - overlap, start + 1)
+        
+        return windows
+    
+    def chunk_texts(self, texts: List[str], strategy: str = None) -> List[List[Dict[str, Any]]]:
+        """
+        Chunk several texts, tokenizing them in one batch when token-aware
+        
+        Args:
+            texts: Texts to chunk
+            strategy: Chunking strategy
+            
+        Returns:
+            List of chunk lists, one per text
+        """
+        strategy = strategy or self.strategy
+        
+        if strategy in ("token", "sliding_window") and self._get_tokenizer() is not None:
+            return [
+                self._chunk_by_tokens(text, offsets, strategy)
+                for text, offsets in zip(texts, self._offsets(texts))
+            ]
+        
+        return [self.chunk_text(text, strategy) for text in texts]
+    
+    def iter_chunks(self, segments: Iterable[str], strategy: str = None) -> Iterator[Dict[str, Any]]:
+        """
+        Chunk text that arrives incrementally, yielding chunks as soon as they are complete
+        
+        Args:
+            segments: Pieces of one document in order (e.g. pages from the parser)
+            strategy: Chunking strategy
+            
+        Yields:
+            Chunks with the same shape as chunk_text(), indexed across the whole document
+        """
+        stream = StreamingChunker(self, strategy)
+        for segment in segments:
+            yield from stream.feed(segment)
+        yield from stream.finish()
+    
+    def chunk_parents(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Split text into parent sections for small-to-big retrieval
+        
+        Parents are the sections from _chunk_by_section (the whole text when
+        it has no headers). Sections longer than PARENT_CHUNK_MAX_SIZE
+        characters are cut at paragraph breaks so a parent stays a
+        reasonable prompt unit.
+        
+        Args:
+            text: Document text
+            
+        Returns:
+            List of parents with index, text and header
+        """
+        sections = self._chunk_by_section(text)
+        if not sections and text.strip():
+            sections = [{"text": text.strip(), "metadata": {"header": ""}}]
+        
+        parents = []
+        for section in sections:
+            for piece in self._split_parent(section["text"]):
+                parents.append({
+                    "index": len(parents),
+                    "text": piece,
+                    "header": section["metadata"]["header"]
+                })
+        
+        return parents
+    
+    def _split_parent(self, text: str) -> List[str]:
+        """Cut an oversized section into pieces of at most PARENT_CHUNK_MAX_SIZE characters"""
+        max_size = settings.PARENT_CHUNK_MAX_SIZE
+        if len(text) <= max_size:
+            return [text]
+        
+        pieces = []
+        current = ""
+        for paragraph in re.split(r'\n\s*\n', text):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            
+            if current and len(current) + len(paragraph) + 2 > max_size:
+                pieces.append(current)
+                current = ""
+            
+            while len(paragraph) > max_size:
+                cut = paragraph.rfind(" ", 0, max_size)
+                cut = cut if cut > 0 else max_size
+                pieces.append(paragraph[:cut].strip())
+                paragraph = paragraph[cut:].strip()
+            
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+        
+        if current:
+            pieces.append(current)
+        
+        return [piece for piece in pieces if piece]
     
     def chunk_text(self, text: str, strategy: str = None) -> List[Dict[str, Any]]:
         """
@@ -25,7 +225,7 @@ class TextChunker:
         
         Args:
             text: Text to chunk
-            strategy: Chunking strategy (paragraph, section, sliding_window, semantic)
+            strategy: Chunking strategy (paragraph, section, sliding_window, token, semantic)
             
         Returns:
             List of chunks with metadata
@@ -37,7 +237,9 @@ class TextChunker:
                 return self._chunk_by_paragraph(text)
             elif strategy == "section":
                 return self._chunk_by_section(text)
-            elif strategy == "sliding_window":
+            elif strategy in ("sliding_window", "token"):
+                if self._get_tokenizer() is not None:
+                    return self._chunk_by_tokens(text, self._offsets([text])[0], strategy)
                 return self._chunk_by_sliding_window(text)
             elif strategy == "semantic":
                 return self._chunk_by_semantic(text)
@@ -48,20 +250,55 @@ class TextChunker:
             logger.error("Chunking failed", error=str(e), strategy=strategy)
             raise
     
+    def _chunk_by_tokens(
+        self,
+        text: str,
+        offsets: List[Tuple[int, int]],
+        strategy: str
+    ) -> List[Dict[str, Any]]:
+        """Split text into windows that fit the model exactly, with token overlap"""
+        
+        chunks = []
+        
+        for token_start, token_end, char_start, char_end in self._token_windows(text, offsets, self.chunk_overlap):
+            chunk_text = text[char_start:char_end]
+            if len(chunk_text) < settings.MIN_CHUNK_SIZE and chunks:
+                continue
+            
+            chunks.append({
+                "index": len(chunks),
+                "text": chunk_text,
+                "start": char_start,
+                "end": char_end,
+                "strategy": strategy,
+                "metadata": {
+                    "token_start": token_start,
+                    "token_end": token_end,
+                    "token_count": token_end - token_start
+                }
+            })
+        
+        logger.info("Chunked by tokens", chunks_count=len(chunks), max_tokens=self.max_tokens)
+        return chunks
+    
     def _chunk_by_paragraph(self, text: str) -> List[Dict[str, Any]]:
         """Split text by paragraphs"""
         
-        # Split by double newlines
-        paragraphs = re.split(r'\n\s*\n', text)
+        # Split by double newlines, keeping each paragraph's character span
+        paragraphs = []
+        for idx, match in enumerate(re.finditer(r'(?:(?!\n\s*\n).)+', text, flags=re.DOTALL)):
+            para = match.group().strip()
+            if len(para) >= settings.MIN_CHUNK_SIZE:
+                start = match.start() + match.group().index(para)
+                paragraphs.append((idx, para, start))
+        
+        if self._get_tokenizer() is not None:
+            return self._chunk_paragraphs_by_tokens(paragraphs)
         
         chunks = []
         position = 0
         
-        for idx, para in enumerate(paragraphs):
-            para = para.strip()
-            if len(para) < settings.MIN_CHUNK_SIZE:
-                continue
-            
+        for idx, para, _ in paragraphs:
             # If paragraph too long, split further
             if len(para) > settings.MAX_CHUNK_SIZE:
                 sub_chunks = self._split_long_text(para)
@@ -89,6 +326,43 @@ class TextChunker:
         logger.info("Chunked by paragraph", chunks_count=len(chunks))
         return chunks
     
+    def _chunk_paragraphs_by_tokens(self, paragraphs: List[Tuple[int, str, int]]) -> List[Dict[str, Any]]:
+        """Paragraph chunks sized in model tokens, with exact character offsets"""
+        
+        chunks = []
+        all_offsets = self._offsets([para for _, para, _ in paragraphs]) if paragraphs else []
+        
+        for (idx, para, para_start), offsets in zip(paragraphs, all_offsets):
+            if len(offsets) <= self.max_tokens:
+                chunks.append({
+                    "index": len(chunks),
+                    "text": para,
+                    "start": para_start,
+                    "end": para_start + len(para),
+                    "strategy": "paragraph",
+                    "metadata": {"paragraph_index": idx, "token_count": len(offsets)}
+                })
+                continue
+            
+            # Paragraph longer than the model window: split on token boundaries
+            windows = self._token_windows(para, offsets, self.chunk_overlap)
+            for sub_idx, (token_start, token_end, char_start, char_end) in enumerate(windows):
+                chunks.append({
+                    "index": len(chunks),
+                    "text": para[char_start:char_end],
+                    "start": para_start + char_start,
+                    "end": para_start + char_end,
+                    "strategy": "paragraph",
+                    "metadata": {
+                        "paragraph_index": idx,
+                        "sub_index": sub_idx,
+                        "token_count": token_end - token_start
+                    }
+                })
+        
+        logger.info("Chunked by paragraph", chunks_count=len(chunks), max_tokens=self.max_tokens)
+        return chunks
+    
     def _chunk_by_section(self, text: str) -> List[Dict[str, Any]]:
         """Split text by sections (headers, markers)"""
         
@@ -157,19 +431,119 @@ class TextChunker:
     
     def _chunk_by_semantic(self, text: str) -> List[Dict[str, Any]]:
         """
-        Split text by semantic boundaries (experimental)
-        Uses simple heuristics for topic changes
+        Split text where the topic shifts between adjacent sentences
+        
+        All sentences are embedded in one batch. A breakpoint is placed
+        after every sentence whose cosine distance to the next one exceeds
+        the SEMANTIC_BREAKPOINT_PERCENTILE of the document's distances, as
+        long as the current chunk has reached its minimum size. Chunks are
+        also closed before exceeding the maximum size (max_tokens with a
+        tokenizer, MAX_CHUNK_SIZE characters otherwise).
         """
+        spans = [m.span() for m in re.finditer(SENTENCE_PATTERN, text, flags=re.DOTALL)]
+        sentences = [text[start:end] for start, end in spans]
         
-        # For now, use paragraph strategy with semantic hints
-        # In production, could use more sophisticated NLP
+        if len(sentences) < 3:
+            return self._relabel(self._chunk_by_paragraph(text), "semantic")
         
-        chunks = self._chunk_by_paragraph(text)
+        try:
+            # Shares the model with the embedding thread: encode one at a time
+            with encode_lock:
+                embeddings = get_embedding_model().encode(
+                    sentences,
+                    batch_size=settings.EMBEDDING_BATCH_SIZE,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True
+                )
+        except Exception as e:
+            logger.warning("Sentence embedding failed, chunking by paragraph", error=str(e))
+            return self._relabel(self._chunk_by_paragraph(text), "semantic")
         
-        # Add semantic similarity markers (placeholder)
-        for chunk in chunks:
-            chunk["strategy"] = "semantic"
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        distances = 1.0 - np.sum(embeddings[:-1] * embeddings[1:], axis=1)
+        threshold = np.percentile(distances, settings.SEMANTIC_BREAKPOINT_PERCENTILE)
         
+        if self._get_tokenizer() is not None:
+            offsets = self._offsets(sentences)
+            sizes = [len(sentence_offsets) for sentence_offsets in offsets]
+            min_size, max_size = settings.SEMANTIC_MIN_CHUNK_TOKENS, self.max_tokens
+        else:
+            offsets = None
+            sizes = [len(sentence) for sentence in sentences]
+            min_size, max_size = settings.MIN_CHUNK_SIZE, settings.MAX_CHUNK_SIZE
+        
+        # Group sentence indices between breakpoints
+        groups = [[0]]
+        group_size = sizes[0]
+        for i in range(1, len(sentences)):
+            topic_shift = distances[i - 1] > threshold and group_size >= min_size
+            if topic_shift or group_size + sizes[i] > max_size:
+                groups.append([i])
+                group_size = sizes[i]
+            else:
+                groups[-1].append(i)
+                group_size += sizes[i]
+        
+        # Fold a short tail into the previous chunk when it fits
+        if len(groups) > 1 and group_size < min_size:
+            if sum(sizes[i] for i in groups[-2]) + group_size <= max_size:
+                groups[-2].extend(groups.pop())
+        
+        chunks = []
+        for group in groups:
+            if len(group) == 1 and sizes[group[0]] > max_size:
+                pieces = self._split_sentence(text, spans[group[0]], offsets[group[0]] if offsets is not None else None)
+            else:
+                pieces = [(spans[group[0]][0], spans[group[-1]][1])]
+            
+            for start, end in pieces:
+                chunk_text = text[start:end]
+                if len(chunk_text) < settings.MIN_CHUNK_SIZE:
+                    continue
+                chunks.append({
+                    "index": len(chunks),
+                    "text": chunk_text,
+                    "start": start,
+                    "end": end,
+                    "strategy": "semantic",
+                    "metadata": {
+                        "sentence_start": group[0],
+                        "sentence_end": group[-1] + 1,
+                        "breakpoint_threshold": round(float(threshold), 4)
+                    }
+                })
+        
+        logger.info(
+            "Chunked by semantic breakpoints",
+            sentences=len(sentences),
+            chunks_count=len(chunks)
+        )
+        return chunks
+    
+    def _split_sentence(
+        self,
+        text: str,
+        span: Tuple[int, int],
+        offsets: Optional[List[Tuple[int, int]]]
+    ) -> List[Tuple[int, int]]:
+        """Character spans of an oversized sentence cut to the maximum chunk size"""
+        start, end = span
+        
+        if offsets:
+            sentence = text[start:end]
+            return [
+                (start + char_start, start + char_end)
+                for _, _, char_start, char_end in self._token_windows(sentence, offsets, 0)
+            ]
+        
+        step = settings.MAX_CHUNK_SIZE
+        return [(pos, min(pos + step, end)) for pos in range(start, end, step)]
+    
+    @staticmethod
+    def _relabel(chunks: List[Dict[str, Any]], strategy: str) -> List[Dict[str, Any]]:
+        """Mark chunks produced by a fallback strategy"""
+        for chunk in chunks:
+            chunk["strategy"] = strategy
         return chunks
     
     def _split_long_text(self, text: str) -> List[str]:
@@ -186,6 +560,97 @@ class TextChunker:
         return chunks
 
 
+class StreamingChunker:
+    """
+    Incremental chunking of one document with bounded memory
+    
+    Text is buffered until CHUNK_STREAM_BUFFER_CHARS characters are held,
+    then everything up to the last paragraph break (or, failing that, the
+    last whitespace) is chunked with the regular strategy and released.
+    Only the unfinished tail stays in memory.
+    """
+    
+    def __init__(self, chunker: TextChunker, strategy: str = None):
+        self.chunker = chunker
+        self.strategy = strategy or chunker.strategy
+        self.flush_chars = settings.CHUNK_STREAM_BUFFER_CHARS
+        self.buffer = ""
+        self.base = 0  # Document offset of the buffer start
+        self.chunk_count = 0
+    
+    def _cut_point(self) -> Optional[int]:
+        """Where the buffer can be cut without splitting a paragraph"""
+        if len(self.buffer) < self.flush_chars:
+            return None
+        
+        breaks = list(re.finditer(r'\n\s*\n', self.buffer))
+        if breaks:
+            return breaks[-1].end()
+        
+        whitespace = max(self.buffer.rfind(" "), self.buffer.rfind("\n"))
+        return whitespace + 1 if whitespace > 0 else len(self.buffer)
+    
+    def _emit(self, segment: str) -> List[Dict[str, Any]]:
+        """Chunk a complete segment and place its chunks in document coordinates"""
+        chunks = self.chunker.chunk_text(segment, self.strategy)
+        # Semantic and token-aware strategies report character offsets into the segment
+        exact_offsets = self.strategy == "semantic" or (
+            self.strategy != "section" and self.chunker._get_tokenizer() is not None
+        )
+        
+        for chunk in chunks:
+            chunk["index"] = self.chunk_count
+            self.chunk_count += 1
+            if exact_offsets:
+                chunk["start"] += self.base
+                chunk["end"] += self.base
+            else:
+                chunk["metadata"]["segment_offset"] = self.base
+        
+        return chunks
+    
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Add text and return the chunks it completed
+        
+        Args:
+            text: Next piece of the document
+            
+        Returns:
+            Newly completed chunks (possibly empty)
+        """
+        self.buffer += text
+        chunks = []
+        
+        cut = self._cut_point()
+        while cut:
+            segment, self.buffer = self.buffer[:cut], self.buffer[cut:]
+            chunks.extend(self._emit(segment))
+            self.base += cut
+            cut = self._cut_point()
+        
+        return chunks
+    
+    def finish(self) -> List[Dict[str, Any]]:
+        """Chunk whatever is left at the end of the document"""
+        segment, self.buffer = self.buffer, ""
+        chunks = self._emit(segment) if segment.strip() else []
+        self.base += len(segment)
+        return chunks
+
+
+def iter_batches(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Group an iterable into lists of at most size items"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
 # Global chunker instance
 _chunker = None
 
@@ -196,3 +661,9 @@ def get_chunker() -> TextChunker:
     if _chunker is None:
         _chunker = TextChunker()
     return _chunker
+
+
+def reset_chunker():
+    """Forget the chunker so the next get_chunker() uses the current model's tokenizer"""
+    global _chunker
+    _chunker = None
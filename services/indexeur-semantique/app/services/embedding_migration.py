@@ -0,0 +1,496 @@
+"""
+Background re-embedding of document chunks into a shadow index with atomic cutover
+"""
+
+import os
+import re
+import json
+import shutil
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+import structlog
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models.document_chunk import DocumentChunk
+from ..embeddings.providers import (
+    ACTIVE_MODEL_FILENAME,
+    get_active_model_config,
+    load_embedding_model,
+    swap_embedding_model,
+    write_active_model_config
+)
+from ..embeddings.length_batching import encode_length_bucketed
+from ..embeddings.projection import PROJECTION_FILENAME, reset_projection
+from ..embeddings.embedding_generator import reload_embedding_generator
+from ..embeddings.worker_pool import close_embedding_worker_pool
+from .chunker import reset_chunker
+from .faiss_manager import FAISSManager, get_faiss_manager, reload_faiss_manager
+from .index_files import file_version
+
+logger = structlog.get_logger()
+
+STATE_FILENAME = "migration_state.json"
+
+# Slack on the catch-up watermark for clock resolution and in-flight transactions
+CATCHUP_MARGIN = timedelta(minutes=5)
+INDEX_FILES = ("faiss.index", "metadata.pkl", PROJECTION_FILENAME, ACTIVE_MODEL_FILENAME)
+
+
+class EmbeddingMigration:
+    """
+    Re-embed every chunk in document_chunks with a target model
+
+    Chunks are streamed in id keyset order from a persisted cursor, so the
+    job resumes after a restart. Once the scan completes, catch-up sweeps
+    pick up chunks created since the migration started (by database clock)
+    that the shadow index does not hold yet. Vectors go to a shadow FAISS
+    index under FAISS_INDEX_PATH/migrations/<model>; search keeps using the
+    live index until cutover() swaps index files, model and singletons in
+    one step.
+    """
+
+    def __init__(self, target_model: str, target_provider: str = None, batch_size: int = None):
+        self.target_model = target_model
+        self.target_provider = target_provider or settings.EMBEDDING_PROVIDER
+        self.batch_size = batch_size or settings.MIGRATION_BATCH_SIZE
+
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "__", f"{self.target_provider}-{target_model}")
+        self.shadow_dir = os.path.join(settings.FAISS_INDEX_PATH, "migrations", slug)
+        self.state_path = os.path.join(self.shadow_dir, STATE_FILENAME)
+
+        self.model = None
+        self.shadow: Optional[FAISSManager] = None
+        self.migrated_ids = set()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+        self.state = self._load_state()
+
+    def _load_state(self) -> Dict[str, Any]:
+        """Load persisted progress or start fresh"""
+        if os.path.exists(self.state_path):
+            with open(self.state_path, "r") as f:
+                state = json.load(f)
+            logger.info("Resuming embedding migration", target=self.target_model, processed=state["processed"])
+            return state
+
+        return {
+            "target_model": self.target_model,
+            "target_provider": self.target_provider,
+            "status": "pending",
+            "cursor_id": None,
+            "scan_complete": False,
+            "catchup_since": None,
+            "processed": 0,
+            "vectors": 0,
+            "started_at": datetime.utcnow().isoformat(),
+            "updated_at": None,
+            "cutover_at": None,
+            "error": None
+        }
+
+    def _save_state(self):
+        """Persist progress"""
+        os.makedirs(self.shadow_dir, exist_ok=True)
+        self.state["updated_at"] = datetime.utcnow().isoformat()
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def _ensure_loaded(self):
+        """Load the target model and open the shadow index"""
+        if self.model is None:
+            self.model = load_embedding_model(self.target_provider, self.target_model)
+
+        if self.shadow is None:
+            dimension = int(self.model.get_sentence_embedding_dimension())
+            self.shadow = FAISSManager(index_dir=self.shadow_dir, dimension=dimension)
+
+            # Drop vectors written after the last checkpoint (crash between index and state save)
+            if self.shadow.index.ntotal > self.state["vectors"]:
+                keep = self.state["vectors"]
+                logger.warning(
+                    "Truncating shadow index to last checkpoint",
+                    vectors=self.shadow.index.ntotal,
+                    checkpoint=keep
+                )
+                vectors = self.shadow.get_vectors()[:keep]
+                metadata = [self.shadow.id_to_chunk.get(i, {}) for i in range(keep)]
+                self.shadow.rebuild(vectors, metadata)
+
+            self.migrated_ids = {str(meta.get("chunk_id")) for meta in self.shadow.id_to_chunk.values()}
+
+    @staticmethod
+    def _db_now(db: Session) -> datetime:
+        """Current time on the database clock (the clock created_at uses)"""
+        return db.query(func.now()).scalar()
+
+    def _next_batch(self, db: Session) -> List[DocumentChunk]:
+        """Next chunks to migrate: id-ordered scan first, then catch-up"""
+        if not self.state["scan_complete"]:
+            query = db.query(DocumentChunk)
+            if self.state["cursor_id"] is not None:
+                query = query.filter(DocumentChunk.id > self.state["cursor_id"])
+
+            chunks = query.order_by(DocumentChunk.id).limit(self.batch_size).all()
+            if chunks:
+                self.state["cursor_id"] = str(chunks[-1].id)
+                return chunks
+
+            self.state["scan_complete"] = True
+
+        # Chunks created since the watermark that the scan passed over
+        since = datetime.fromisoformat(self.state["catchup_since"]) - CATCHUP_MARGIN
+        query = db.query(DocumentChunk).filter(
+            DocumentChunk.created_at >= since
+        ).order_by(DocumentChunk.created_at, DocumentChunk.id)
+
+        chunks = []
+        for chunk in query.yield_per(1000):
+            if str(chunk.id) not in self.migrated_ids:
+                chunks.append(chunk)
+                if len(chunks) >= self.batch_size:
+                    break
+        return chunks
+
+    def _chunk_metadata(self, chunk: DocumentChunk) -> Dict[str, Any]:
+        """Metadata for a chunk, reusing the live index entry when available"""
+        live = get_faiss_manager().id_to_chunk.get(chunk.faiss_index_id)
+        if live and str(live.get("chunk_id")) == str(chunk.id):
+            return dict(live)
+
+        return {
+            "chunk_id": str(chunk.id),
+            "document_id": chunk.document_id,
+            "chunk_index": chunk.chunk_index,
+            "chunk_text": chunk.chunk_text
+        }
+
+    def _migrate_batch(self, chunks: List[DocumentChunk]):
+        """Embed one batch with the target model into the shadow index"""
+        max_chars = settings.EMBEDDING_MAX_LENGTH * 4
+        texts = [chunk.chunk_text[:max_chars] for chunk in chunks]
+
+        embeddings = encode_length_bucketed(self.model, texts)
+        self.shadow.add_vectors(embeddings, [self._chunk_metadata(c) for c in chunks], save=False)
+
+        self.migrated_ids.update(str(chunk.id) for chunk in chunks)
+        self.state["processed"] += len(chunks)
+        self.state["vectors"] = self.shadow.index.ntotal
+
+    def _checkpoint(self):
+        """Persist shadow index, then the cursor that matches it"""
+        self.shadow.save_index()
+        self._save_state()
+
+    def run_pending(self, db: Session, stop: threading.Event = None) -> int:
+        """
+        Migrate every chunk after the cursor
+
+        Args:
+            db: Database session
+            stop: Optional event to interrupt between batches
+
+        Returns:
+            Number of chunks migrated
+        """
+        self._ensure_loaded()
+        migrated = 0
+        batches_since_checkpoint = 0
+
+        sweep_started_at = self._db_now(db)
+        if self.state["catchup_since"] is None:
+            self.state["catchup_since"] = sweep_started_at.isoformat()
+
+        while stop is None or not stop.is_set():
+            chunks = self._next_batch(db)
+            if not chunks:
+                # Everything before this sweep is migrated; later sweeps start here
+                self.state["catchup_since"] = sweep_started_at.isoformat()
+                break
+
+            self._migrate_batch(chunks)
+            migrated += len(chunks)
+            batches_since_checkpoint += 1
+
+            if batches_since_checkpoint >= settings.MIGRATION_CHECKPOINT_BATCHES:
+                self._checkpoint()
+                batches_since_checkpoint = 0
+                logger.info("Embedding migration progress", target=self.target_model, processed=self.state["processed"])
+
+        self._checkpoint()
+        return migrated
+
+    def _run_background(self):
+        """Background thread body"""
+        db = SessionLocal()
+        try:
+            self.run_pending(db, stop=self._stop)
+            self.state["status"] = "stopped" if self._stop.is_set() else "ready"
+            self._save_state()
+            logger.info("Embedding migration finished", target=self.target_model, status=self.state["status"])
+        except Exception as e:
+            self.state["status"] = "failed"
+            self.state["error"] = str(e)
+            self._save_state()
+            logger.error("Embedding migration failed", target=self.target_model, error=str(e))
+        finally:
+            db.close()
+
+    def start(self):
+        """Start (or resume) migrating in a background thread"""
+        with self._lock:
+            if self.state["status"] == "cut_over":
+                raise ValueError(f"Migration to {self.target_model} was already cut over")
+            if self.is_running():
+                return
+
+            self._stop.clear()
+            self.state["status"] = "running"
+            self.state["error"] = None
+            self._save_state()
+
+            self._thread = threading.Thread(target=self._run_background, name="embedding-migration", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = None):
+        """Stop after the current batch; progress is kept for resuming"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def cutover(self, db: Session) -> Dict[str, Any]:
+        """
+        Catch up and switch serving to the shadow index and target model
+
+        Blocking: the API runs it in a worker thread. Most of the catch-up
+        runs first; the final sweep, the swap and the chunk row update then
+        hold the live index's write lock, so no chunk is committed (by this
+        process or the consumer) in between. Indexing runs that embedded
+        with the old model re-embed before committing, and the consumer
+        switches models when it sees the new embedding_model.json. Searches
+        keep being served throughout.
+
+        Args:
+            db: Database session
+
+        Returns:
+            Migration status
+        """
+        with self._lock:
+            if self.is_running():
+                raise ValueError("Migration is still running; wait for status 'ready'")
+            if self.state["status"] != "ready":
+                raise ValueError(f"Migration is not ready for cutover (status: {self.state['status']})")
+
+            # Chunks indexed since the background pass finished
+            caught_up = self.run_pending(db)
+
+            with get_faiss_manager().writing():
+                caught_up += self.run_pending(db)
+                retired_dir = self._swap(db)
+
+            self.state["status"] = "cut_over"
+            self.state["cutover_at"] = datetime.utcnow().isoformat()
+            self._save_state()
+
+            logger.info(
+                "Embedding migration cut over",
+                target=self.target_model,
+                vectors=self.state["vectors"],
+                caught_up=caught_up,
+                retired=retired_dir
+            )
+
+            return self.get_status(db)
+
+    def _swap(self, db: Session) -> str:
+        """
+        Install the shadow index and target model
+
+        The chunk rows are updated in the transaction that is committed
+        right after the file swap; if the swap or the commit fails, the
+        retired files are moved back and the rows rolled back, so
+        document_chunks always matches the live index.
+
+        Returns:
+            Directory holding the retired live files
+        """
+        write_active_model_config(self.shadow_dir, self.target_provider, self.target_model)
+
+        live_dir = settings.FAISS_INDEX_PATH
+        retired_dir = os.path.join(live_dir, "retired", datetime.utcnow().strftime("%Y%m%dT%H%M%S"))
+        os.makedirs(retired_dir, exist_ok=True)
+
+        # Stage shadow files next to the live ones, then swap with renames
+        staged = ("faiss.index", "metadata.pkl", ACTIVE_MODEL_FILENAME)
+        for name in staged:
+            shutil.copy(os.path.join(self.shadow_dir, name), os.path.join(live_dir, name + ".cutover"))
+
+        retired, installed = [], []
+        try:
+            self._update_chunk_rows(db)
+
+            for name in INDEX_FILES:
+                live_path = os.path.join(live_dir, name)
+                if os.path.exists(live_path):
+                    os.replace(live_path, os.path.join(retired_dir, name))
+                    retired.append(name)
+
+            for name in staged:
+                os.replace(os.path.join(live_dir, name + ".cutover"), os.path.join(live_dir, name))
+                installed.append(name)
+
+            db.commit()
+        except Exception:
+            db.rollback()
+            self._restore(live_dir, retired_dir, staged, retired, installed)
+            raise
+
+        # Swap in-process serving state
+        install_embedding_model(self.model, self.target_provider, self.target_model)
+
+        return retired_dir
+
+    @staticmethod
+    def _restore(live_dir: str, retired_dir: str, staged: Tuple[str, ...], retired: List[str], installed: List[str]):
+        """Put the retired live files back after a failed swap"""
+        for name in staged:
+            leftover = os.path.join(live_dir, name + ".cutover")
+            if os.path.exists(leftover):
+                os.remove(leftover)
+            if name in installed and name not in retired:
+                os.remove(os.path.join(live_dir, name))
+        for name in retired:
+            os.replace(os.path.join(retired_dir, name), os.path.join(live_dir, name))
+        logger.warning("Cutover rolled back, live index restored", retired=retired)
+
+    def _update_chunk_rows(self, db: Session):
+        """Point document_chunks rows at their new FAISS IDs and model (not committed)"""
+        mappings = [
+            {"id": meta["chunk_id"], "faiss_index_id": faiss_id, "embedding_model": self.target_model}
+            for faiss_id, meta in self.shadow.id_to_chunk.items()
+            if meta.get("chunk_id")
+        ]
+
+        for start in range(0, len(mappings), 1000):
+            db.bulk_update_mappings(DocumentChunk, mappings[start:start + 1000])
+
+    def get_status(self, db: Session = None) -> Dict[str, Any]:
+        """Get migration progress"""
+        status = dict(self.state)
+        status["running"] = self.is_running()
+        status["remaining"] = None
+
+        if db is not None and status["status"] != "cut_over":
+            status["remaining"] = max(db.query(DocumentChunk).count() - status["processed"], 0)
+
+        return status
+
+
+# file_version of the live embedding_model.json this process serves
+_active_version = None
+
+
+def install_embedding_model(model, provider: str, model_name: str):
+    """
+    Serve a new embedding model in this process
+
+    Replaces the shared model and every singleton derived from it, then
+    bumps the model generation so indexing runs that embedded with the
+    previous model re-embed before writing.
+
+    Args:
+        model: Already loaded model
+        provider: Its provider name
+        model_name: Its model name
+    """
+    global _active_version
+
+    reset_projection()
+    swap_embedding_model(model, provider, model_name)
+    # Worker processes and the token-aware chunker still hold the old model and tokenizer
+    close_embedding_worker_pool()
+    reset_chunker()
+    reload_faiss_manager()
+    reload_embedding_generator()
+
+    _active_version = file_version(os.path.join(settings.FAISS_INDEX_PATH, ACTIVE_MODEL_FILENAME))
+
+
+def follow_active_model() -> bool:
+    """
+    Switch to the model another process cut the live index over to
+
+    Checks the version of embedding_model.json next to the live index, the
+    way the index managers check their files. Call while holding the live
+    index's writing(), so no vectors are added between the check and the
+    switch.
+
+    Returns:
+        True if a different model was installed
+    """
+    global _active_version
+
+    path = os.path.join(settings.FAISS_INDEX_PATH, ACTIVE_MODEL_FILENAME)
+    version = file_version(path)
+    if version == _active_version:
+        return False
+
+    active = get_active_model_config()
+    if (active["provider"], active["model"]) == (settings.EMBEDDING_PROVIDER, settings.EMBEDDING_MODEL):
+        _active_version = version
+        return False
+
+    logger.info("Live index was cut over by another process, switching model", model=active["model"])
+    install_embedding_model(load_embedding_model(active["provider"], active["model"]), active["provider"], active["model"])
+    return True
+
+
+# Current migration (one at a time)
+_migration = None
+
+
+def get_embedding_migration() -> Optional[EmbeddingMigration]:
+    """Get the current embedding migration, if one was started"""
+    return _migration
+
+
+def start_embedding_migration(
+    target_model: str,
+    target_provider: str = None,
+    batch_size: int = None
+) -> EmbeddingMigration:
+    """
+    Start or resume a migration to a target model
+
+    Args:
+        target_model: Model to re-embed with
+        target_provider: Provider of the target model (defaults to EMBEDDING_PROVIDER)
+        batch_size: Chunks per batch (defaults to MIGRATION_BATCH_SIZE)
+
+    Returns:
+        The running migration
+    """
+    global _migration
+
+    if _migration is not None and _migration.is_running():
+        if (_migration.target_model, _migration.target_provider) != (target_model, target_provider or _migration.target_provider):
+            raise ValueError(f"Migration to {_migration.target_model} is already running")
+        return _migration
+
+    if (target_provider or settings.EMBEDDING_PROVIDER, target_model) == (settings.EMBEDDING_PROVIDER, settings.EMBEDDING_MODEL):
+        raise ValueError(f"Index already uses {target_model}")
+
+    _migration = EmbeddingMigration(target_model, target_provider, batch_size)
+    _migration.start()
+    return _migration
@@ -1,99 +1,30 @@
 """
-Embedding service supporting multiple providers (SentenceTransformers, Ollama)
+Embedding service facade over the shared embedding layer
 """
 
 from typing import List
 import numpy as np
 import structlog
-from sentence_transformers import SentenceTransformer
 
 from ..config import settings
+from ..embeddings.embedding_generator import get_embedding_generator
 
 logger = structlog.get_logger()
 
 
 class EmbeddingService:
-    """Unified embedding interface supporting multiple providers"""
+    """
+    Unified embedding interface supporting multiple providers
+
+    Delegates to the shared EmbeddingGenerator, so the provider-selected model
+    (sentence-transformers, onnx or ollama) is loaded once per process and
+    every vector is L2-normalized the same way regardless of entry point.
+    """
     
     def __init__(self):
-        self.provider = settings.EMBEDDING_PROVIDER
-        self.model = None
-        self.dimension = settings.EMBEDDING_DIMENSION
-        self._initialize()
-    
-    def _initialize(self):
-        """Initialize embedding model based on provider"""
-        try:
-            if self.provider == "sentence-transformers":
-                self._initialize_sentence_transformers()
-            elif self.provider == "ollama":
-                self._initialize_ollama()
-            else:
-                raise ValueError(f"Unsupported embedding provider: {self.provider}")
-            
-            logger.info(
-                "Embedding model initialized",
-                provider=self.provider,
-                model=settings.EMBEDDING_MODEL,
-                dimension=self.dimension
-            )
-            
-        except Exception as e:
-            logger.error("Embedding model initialization failed", error=str(e))
-            raise
-    
-    def _initialize_sentence_transformers(self):
-        """Initialize SentenceTransformers model"""
-        logger.info(
-            "Loading SentenceTransformers model",
-            model=settings.EMBEDDING_MODEL,
-            device=settings.EMBEDDING_DEVICE
-        )
-        
-        self.model = SentenceTransformer(
-            settings.EMBEDDING_MODEL,
-            device=settings.EMBEDDING_DEVICE
-        )
-        
-        # Verify dimension matches
-        actual_dim = self.model.get_sentence_embedding_dimension()
-        if actual_dim != settings.EMBEDDING_DIMENSION:
-            logger.warning(
-                "Embedding dimension mismatch",
-                expected=settings.EMBEDDING_DIMENSION,
-                actual=actual_dim
-            )
-            self.dimension = actual_dim
-    
-    def _initialize_ollama(self):
-        """Initialize Ollama embeddings"""
-        import ollama
-        
-        logger.info(
-            "Using Ollama embeddings",
-            model=settings.EMBEDDING_MODEL
-        )
-        
-        # Test connection
-        try:
-            test_result = ollama.embeddings(
-                model=settings.EMBEDDING_MODEL,
-                prompt="test"
-            )
-            actual_dim = len(test_result['embedding'])
-            
-            if actual_dim != settings.EMBEDDING_DIMENSION:
-                logger.warning(
-                    "Embedding dimension mismatch",
-                    expected=settings.EMBEDDING_DIMENSION,
-                    actual=actual_dim
-                )
-                self.dimension = actual_dim
-            
-            logger.info("Ollama connection successful")
-        except Exception as e:
-            logger.error("Ollama connection test failed", error=str(e))
-            raise
+        self.generator = get_embedding_generator()
+        self.provider = self.generator.provider
+        self.dimension = self.generator.dimension
     
     def encode(
         self,
@@ -105,7 +36,8 @@ class EmbeddingService:
         
         Args:
             texts: List of text strings to embed
-            show_progress: Show progress bar (for sentence-transformers)
+            show_progress: Accepted for backward compatibility (progress is
+                shown automatically for large batches)
             
         Returns:
             NumPy array of shape (len(texts), dimension)
@@ -114,44 +46,11 @@ class EmbeddingService:
             return np.array([])
         
         try:
-            if self.provider == "sentence-transformers":
-                return self._encode_sentence_transformers(texts, show_progress)
-            elif self.provider == "ollama":
-                return self._encode_ollama(texts)
+            return self.generator.generate_embeddings_batch(texts)
         except Exception as e:
             logger.error("Encoding failed", error=str(e), num_texts=len(texts))
             raise
     
-    def _encode_sentence_transformers(
-        self,
-        texts: List[str],
-        show_progress: bool = False
-    ) -> np.ndarray:
-        """Encode using SentenceTransformers"""
-        embeddings = self.model.encode(
-            texts,
-            batch_size=settings.EMBEDDING_BATCH_SIZE,
-            show_progress_bar=show_progress,
-            convert_to_numpy=True,
-            normalize_embeddings=False  # FAISS will handle normalization if needed
-        )
-        
-        return embeddings
-    
-    def _encode_ollama(self, texts: List[str]) -> np.ndarray:
-        """Encode using Ollama"""
-        import ollama
-        
-        embeddings = []
-        for text in texts:
-            response = ollama.embeddings(
-                model=settings.EMBEDDING_MODEL,
-                prompt=text
-            )
-            embeddings.append(response['embedding'])
-        
-        return np.array(embeddings, dtype=np.float32)
-    
     def encode_single(self, text: str) -> np.ndarray:
         """
         Generate embedding for a single text
@@ -162,8 +61,7 @@ class EmbeddingService:
         Returns:
             1D NumPy array of shape (dimension,)
         """
-        result = self.encode([text])
-        return result[0] if len(result) > 0 else np.array([])
+        return self.generator.generate_embedding(text)
     
     def get_dimension(self) -> int:
         """Get embedding dimension"""
@@ -175,8 +73,9 @@ class EmbeddingService:
             "provider": self.provider,
             "model": settings.EMBEDDING_MODEL,
             "dimension": self.dimension,
-            "device": settings.EMBEDDING_DEVICE if self.provider == "sentence-transformers" else "ollama",
-            "batch_size": settings.EMBEDDING_BATCH_SIZE
+            "device": settings.EMBEDDING_DEVICE if self.provider != "ollama" else "ollama",
+            "batch_size": settings.EMBEDDING_BATCH_SIZE,
+            "normalized": True
         }
 
 
@@ -6,25 +6,50 @@ import faiss
 import numpy as np
 import os
 import pickle
+import threading
+from contextlib import contextmanager
 from typing import List, Tuple, Dict, Any
 import structlog
 
 from ..config import settings
+from ..embeddings.projection import EmbeddingProjection, get_projection
+from .index_files import file_version, file_lock, atomic_pickle_dump, BackgroundReloader
 
 logger = structlog.get_logger()
 
 
 class FAISSManager:
-    """FAISS index management for semantic search"""
+    """
+    FAISS index management for semantic search
     
-    def __init__(self):
+    The API and the RabbitMQ consumer share the index files: writers hold
+    writing(), which reloads the index first if the other process saved a
+    newer one, and searches reload it when the saved version changes.
+    """
+    
+    def __init__(self, index_dir: str = None, dimension: int = None):
+        """
+        Args:
+            index_dir: Directory of the index (defaults to FAISS_INDEX_PATH)
+            dimension: Vector dimension for a new index (defaults to the
+                projected or configured embedding dimension)
+        """
         self.index = None
         self.index_type = settings.FAISS_INDEX_TYPE
-        self.dimension = settings.EMBEDDING_DIMENSION
-        self.index_path = os.path.join(settings.FAISS_INDEX_PATH, "faiss.index")
-        self.metadata_path = os.path.join(settings.FAISS_INDEX_PATH, "metadata.pkl")
+        self.index_dir = index_dir or settings.FAISS_INDEX_PATH
+        self.projection = get_projection() if index_dir is None else EmbeddingProjection.load(index_dir)
+        if dimension is None:
+            dimension = self.projection.output_dim if self.projection else settings.EMBEDDING_DIMENSION
+        self.dimension = dimension
+        self.index_path = os.path.join(self.index_dir, "faiss.index")
+        self.metadata_path = os.path.join(self.index_dir, "metadata.pkl")
         self.id_to_chunk = {}  # Mapping FAISS ID to chunk metadata
         self.next_id = 0
+        self.lock = threading.RLock()  # Held by writers so FAISS IDs stay sequential
+        self.index_lock = threading.Lock()  # FAISS does not support searching while adding
+        self.loaded_version = None  # file_version of the metadata last loaded or saved
+        self._write_depth = 0
+        self.reloader = BackgroundReloader(self._reload, "faiss-reload")
         
         self._initialize_index()
     
@@ -32,7 +57,7 @@ class FAISSManager:
         """Initialize or load FAISS index"""
         try:
             # Create directory if needed
-            os.makedirs(settings.FAISS_INDEX_PATH, exist_ok=True)
+            os.makedirs(self.index_dir, exist_ok=True)
             
             # Try to load existing index
             if os.path.exists(self.index_path):
@@ -73,19 +98,28 @@ class FAISSManager:
             logger.error("Index creation failed", error=str(e))
             raise
     
+    def _read_index(self):
+        """Read the index and its metadata from disk (raises on failure)"""
+        index = faiss.read_index(self.index_path)
+        id_to_chunk, next_id = {}, 0
+        
+        # Load metadata
+        if os.path.exists(self.metadata_path):
+            with open(self.metadata_path, 'rb') as f:
+                metadata = pickle.load(f)
+                id_to_chunk = metadata['id_to_chunk']
+                next_id = metadata['next_id']
+        
+        with self.index_lock:
+            self.index, self.id_to_chunk, self.next_id = index, id_to_chunk, next_id
+        self.loaded_version = file_version(self.metadata_path)
+    
     def _load_index(self):
         """Load existing FAISS index"""
         try:
             logger.info("Loading existing FAISS index", path=self.index_path)
             
-            self.index = faiss.read_index(self.index_path)
-            
-            # Load metadata
-            if os.path.exists(self.metadata_path):
-                with open(self.metadata_path, 'rb') as f:
-                    metadata = pickle.load(f)
-                    self.id_to_chunk = metadata['id_to_chunk']
-                    self.next_id = metadata['next_id']
+            self._read_index()
             
             logger.info(
                 "Index loaded successfully",
@@ -103,15 +137,18 @@ class FAISSManager:
         try:
             logger.info("Saving FAISS index", path=self.index_path)
             
-            faiss.write_index(self.index, self.index_path)
+            # Write then rename, so the other process never reads a partial file
+            tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            faiss.write_index(self.index, tmp_path)
+            os.replace(tmp_path, self.index_path)
             
             # Save metadata
             metadata = {
                 'id_to_chunk': self.id_to_chunk,
                 'next_id': self.next_id
             }
-            with open(self.metadata_path, 'wb') as f:
-                pickle.dump(metadata, f)
+            atomic_pickle_dump(metadata, self.metadata_path)
+            self.loaded_version = file_version(self.metadata_path)
             
             logger.info("Index saved successfully")
             
@@ -119,10 +156,70 @@ class FAISSManager:
             logger.error("Index saving failed", error=str(e))
             raise
     
+    def refresh(self, wait: bool = False):
+        """
+        Reload the index if another process saved a newer one
+        
+        Searches call this without waiting: the reload runs in a background
+        thread (behind in-process writers and the file lock) while they keep
+        using the index already loaded.
+        
+        Args:
+            wait: Reload in the calling thread instead
+        """
+        if file_version(self.metadata_path) == self.loaded_version:
+            return
+        
+        if wait:
+            self._reload()
+        else:
+            self.reloader.start()
+    
+    def _reload(self):
+        """Reload the saved index unless it is already loaded"""
+        with self.lock:
+            if self._write_depth:
+                return  # This thread is writing and already holds the latest index
+            with file_lock(self.index_path):
+                if file_version(self.metadata_path) == self.loaded_version:
+                    return
+                try:
+                    self._read_index()
+                    logger.info("FAISS index reloaded", total_vectors=self.index.ntotal, next_id=self.next_id)
+                except Exception as e:
+                    logger.error("FAISS index reload failed, keeping loaded index", error=str(e))
+    
+    @contextmanager
+    def writing(self):
+        """
+        Exclusive write access to the index across threads and processes
+        
+        On entry the index is reloaded if another process saved a newer
+        one, so changes saved inside the block extend the latest index.
+        """
+        with self.lock:
+            if self._write_depth:
+                self._write_depth += 1
+                try:
+                    yield self
+                finally:
+                    self._write_depth -= 1
+                return
+            
+            with file_lock(self.index_path):
+                self._write_depth += 1
+                try:
+                    if file_version(self.metadata_path) != self.loaded_version:
+                        self._read_index()
+                    yield self
+                finally:
+                    self._write_depth -= 1
+    
     def add_vectors(
         self,
         embeddings: np.ndarray,
-        chunk_metadata: List[Dict[str, Any]]
+        chunk_metadata: List[Dict[str, Any]],
+        save: bool = True
     ) -> List[int]:
         """
         Add vectors to FAISS index
@@ -130,6 +227,7 @@ class FAISSManager:
         Args:
             embeddings: Array of embedding vectors
             chunk_metadata: List of metadata for each chunk
+            save: Persist the index after adding (bulk writers checkpoint themselves)
             
         Returns:
             List of FAISS IDs assigned
@@ -138,23 +236,24 @@ class FAISSManager:
             if embeddings.shape[0] != len(chunk_metadata):
                 raise ValueError("Embeddings and metadata count mismatch")
             
-            # Train index if needed (for IVF indexes)
-            if isinstance(self.index, faiss.IndexIVFFlat) and not self.index.is_trained:
-                logger.info("Training IVF index", vectors=embeddings.shape[0])
-                self.index.train(embeddings)
-            
-            # Add vectors
-            start_id = self.next_id
-            self.index.add(embeddings.astype('float32'))
-            
-            # Store metadata
-            assigned_ids = []
-            for i, metadata in enumerate(chunk_metadata):
-                faiss_id = start_id + i
-                self.id_to_chunk[faiss_id] = metadata
-                assigned_ids.append(faiss_id)
-            
-            self.next_id += len(embeddings)
+            with self.lock, self.index_lock:
+                # Train index if needed (for IVF indexes)
+                if isinstance(self.index, faiss.IndexIVFFlat) and not self.index.is_trained:
+                    logger.info("Training IVF index", vectors=embeddings.shape[0])
+                    self.index.train(embeddings)
+                
+                # Add vectors
+                start_id = self.next_id
+                self.index.add(embeddings.astype('float32'))
+                
+                # Store metadata
+                assigned_ids = []
+                for i, metadata in enumerate(chunk_metadata):
+                    faiss_id = start_id + i
+                    self.id_to_chunk[faiss_id] = metadata
+                    assigned_ids.append(faiss_id)
+                
+                self.next_id += len(embeddings)
             
             logger.info(
                 "Vectors added to index",
@@ -163,7 +262,8 @@ class FAISSManager:
             )
             
             # Save index
-            self.save_index()
+            if save:
+                self.save_index()
             
             return assigned_ids
             
@@ -188,23 +288,19 @@ class FAISSManager:
         """
         try:
             top_k = top_k or settings.SEARCH_TOP_K
+            self.refresh()
             
             # Ensure query is 2D array
             if query_embedding.ndim == 1:
                 query_embedding = query_embedding.reshape(1, -1)
             
-            # Search
-            distances, indices = self.index.search(
-                query_embedding.astype('float32'),
-                top_k
-            )
-            try:
-                with open(r"c:\Users\HP\Desktop\MedBot-Intelligence\debug_log_ABS.txt", "a") as f_log:
-                    f_log.write(f"DEBUG FAISS SEARCH: k={top_k}\n")
-                    f_log.write(f"INDICES: {indices}\n")
-                    f_log.write(f"DISTS: {distances}\n")
-            except Exception as e:
-                print(f"CONFIRMED LOG ERROR: {e}")
+            # Search (held only for the search itself, never across a writer's commit)
+            with self.index_lock:
+                distances, indices = self.index.search(
+                    query_embedding.astype('float32'),
+                    top_k
+                )
+                id_to_chunk = self.id_to_chunk
             
             # Format results
             results = []
@@ -219,7 +315,7 @@ class FAISSManager:
                 # if similarity < settings.SIMILARITY_THRESHOLD:
                 #    continue
                 
-                metadata = self.id_to_chunk.get(int(idx), {})
+                metadata = id_to_chunk.get(int(idx), {})
                 
                 results.append({
                     "faiss_id": int(idx),
@@ -236,6 +332,39 @@ class FAISSManager:
             logger.error("Search failed", error=str(e))
             raise
     
+    def get_vectors(self) -> np.ndarray:
+        """
+        Reconstruct all stored vectors in FAISS ID order
+        
+        Returns:
+            Array of shape (total_vectors, dimension)
+        """
+        with self.index_lock:
+            if self.index.ntotal == 0:
+                return np.zeros((0, self.index.d), dtype=np.float32)
+            
+            if isinstance(self.index, faiss.IndexIVF):
+                self.index.make_direct_map()
+            
+            return self.index.reconstruct_n(0, self.index.ntotal)
+    
+    def rebuild(self, embeddings: np.ndarray, chunk_metadata: List[Dict[str, Any]]) -> List[int]:
+        """
+        Replace the index with new vectors, keeping FAISS IDs aligned with the input order
+        
+        Args:
+            embeddings: Array of embedding vectors (may have a new dimension)
+            chunk_metadata: List of metadata for each chunk
+            
+        Returns:
+            List of FAISS IDs assigned
+        """
+        self.dimension = embeddings.shape[1]
+        self._create_index()
+        self.id_to_chunk = {}
+        self.next_id = 0
+        return self.add_vectors(embeddings, chunk_metadata)
+    
     def delete_by_document_id(self, document_id: str):
         """
         Delete all vectors for a document
@@ -247,9 +376,11 @@ class FAISSManager:
     
     def get_stats(self) -> Dict[str, Any]:
         """Get index statistics"""
+        self.refresh()
         return {
             "total_vectors": self.index.ntotal,
             "dimension": self.dimension,
+            "projection": self.projection.get_stats() if self.projection else None,
             "index_type": self.index_type,
             "is_trained": getattr(self.index, 'is_trained', True),
             "total_chunks": len(self.id_to_chunk)
@@ -266,3 +397,10 @@ def get_faiss_manager() -> FAISSManager:
     if _manager is None:
         _manager = FAISSManager()
     return _manager
+
+
+def reload_faiss_manager() -> FAISSManager:
+    """Replace the singleton with a fresh load of FAISS_INDEX_PATH"""
+    global _manager
+    _manager = FAISSManager()
+    return _manager
@@ -0,0 +1,90 @@
+"""
+Index files shared by the API and the RabbitMQ consumer processes
+
+Both processes load the FAISS, BM25 and patient indexes into memory and
+write them back to the same files. Writers take an exclusive file lock and
+reload the file first if another process changed it; readers notice when
+the file's version changes and reload it in the background, so each process
+sees the other's writes without a search ever waiting on the file lock.
+"""
+
+import os
+import pickle
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking (single-process local setups)
+    fcntl = None
+
+
+def file_version(path: str) -> Optional[Tuple[int, int, int]]:
+    """
+    Identity of a file's current content
+
+    Files are replaced atomically on save, so a new inode, modification
+    time or size means another write happened.
+
+    Returns:
+        (inode, mtime in ns, size), or None if the file does not exist
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+@contextmanager
+def file_lock(path: str):
+    """Exclusive lock on path shared by every process (not reentrant)"""
+    if fcntl is None:
+        yield
+        return
+
+    with open(path + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def atomic_pickle_dump(data: Any, path: str):
+    """Pickle data to path so readers never see a partially written file"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class BackgroundReloader:
+    """
+    Run an index reload in a background thread, one at a time
+
+    Request paths only notice that the file changed and start the reload;
+    they keep serving the index already in memory until the reload swaps
+    the new one in.
+    """
+
+    def __init__(self, reload: Callable[[], None], name: str):
+        self._reload = reload
+        self._name = name
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Start a reload unless one is already running"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._reload, name=self._name, daemon=True)
+            self._thread.start()
+
+    def join(self, timeout: float = None):
+        """Wait for the running reload, if any"""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
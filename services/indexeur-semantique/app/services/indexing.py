@@ -0,0 +1,311 @@
+"""
+Shared indexing pipeline: chunks to SQL, FAISS and BM25 in one pass
+"""
+
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+import numpy as np
+import structlog
+import uuid
+
+from ..config import settings
+from ..models.document_chunk import DocumentChunk, ParentChunk
+from ..embeddings.embedding_generator import get_embedding_generator, get_model_generation
+from .chunker import get_chunker
+from .faiss_manager import get_faiss_manager
+from .bm25_manager import get_bm25_manager
+from .patient_index import get_patient_index
+from .embedding_migration import follow_active_model
+
+logger = structlog.get_logger()
+
+
+class DocumentIndexer:
+    """
+    Index chunks of one or more documents into SQL, FAISS and BM25
+    
+    Used by every entry point (/index, /index/stream, /index/batch and the
+    RabbitMQ consumer), so all three stores always receive the same chunks
+    with the same metadata.
+    
+    Batches of INDEX_BATCH_SIZE chunks are filled across document
+    boundaries. Chunk IDs are generated client-side and FAISS IDs are
+    assigned before the rows are written, so each batch is one bulk INSERT.
+    Vectors are staged until finish(), which commits and only then adds
+    them to FAISS, so a failed indexing run leaves no orphan vectors. If
+    another writer (thread or process) took those FAISS IDs meanwhile, the
+    rows are renumbered before the commit. If the embedding model was
+    swapped (migration cutover, here or in the other process) after the
+    vectors were computed, finish() re-embeds them with the new model
+    first. BM25 is extended once for everything added.
+    """
+    
+    def __init__(self, db: Session):
+        self.db = db
+        self.faiss_manager = get_faiss_manager()
+        self.bm25_manager = get_bm25_manager()
+        self.patient_index = get_patient_index()
+        
+        self.documents = {}
+        self.pending = []
+        self.first_faiss_id = None
+        self.staged_vectors = []
+        self.model_generations = set()  # Model generations the staged vectors come from
+        self.bm25_texts = []
+        self.bm25_metadata = []
+    
+    @property
+    def embedding_generator(self):
+        """Resolved on each use: callers that pass embeddings never load a model"""
+        return get_embedding_generator()
+    
+    def track_document(
+        self,
+        document_id: str,
+        chunking_strategy: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Per-document state, created on first use
+        
+        Returns:
+            State dict with document_id, metadata, faiss_ids and parent_count
+        """
+        document_id = str(document_id)
+        if document_id not in self.documents:
+            self.documents[document_id] = {
+                "document_id": document_id,
+                "chunking_strategy": chunking_strategy,
+                "metadata": metadata or {},
+                "queued": 0,
+                "parent_count": 0,
+                "faiss_ids": []
+            }
+        return self.documents[document_id]
+    
+    def add(
+        self,
+        chunks: Iterable[Dict[str, Any]],
+        document_id: str,
+        chunking_strategy: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ):
+        """Queue a document's chunks, indexing every full batch"""
+        document = self.track_document(document_id, chunking_strategy, metadata)
+        for chunk in chunks:
+            self.pending.append((document, chunk))
+            document["queued"] += 1
+            if len(self.pending) >= settings.INDEX_BATCH_SIZE:
+                self._index_pending()
+    
+    def add_hierarchical(
+        self,
+        text: str,
+        document_id: str,
+        chunking_strategy: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Store the text's parent sections and queue their child chunks
+        
+        Children are chunked from each parent with the given strategy,
+        numbered across the document, and carry their parent's ID in the
+        FAISS and BM25 metadata.
+        """
+        chunker = get_chunker()
+        document = self.track_document(document_id, chunking_strategy, metadata)
+        
+        for parent in chunker.chunk_parents(text):
+            children = chunker.chunk_text(parent["text"], chunking_strategy)
+            if not children:
+                continue
+            
+            child_start = document["queued"]
+            parent_id = str(uuid.uuid4())
+            self.db.add(ParentChunk(
+                id=parent_id,
+                document_id=document["document_id"],
+                parent_index=parent["index"],
+                parent_text=parent["text"],
+                header=parent["header"][:500] or None,
+                child_start=child_start,
+                child_end=child_start + len(children)
+            ))
+            document["parent_count"] += 1
+            
+            for offset, child in enumerate(children):
+                child["index"] = child_start + offset
+                child["parent_id"] = parent_id
+            self.add(children, document_id, chunking_strategy, metadata)
+    
+    def _index_pending(self):
+        """Embed and write the queued chunks"""
+        batch, self.pending = self.pending, []
+        generator = self.embedding_generator
+        embeddings = generator.generate_embeddings_batch([chunk["text"] for _, chunk in batch])
+        self.write_batch(batch, embeddings, generator.generation)
+    
+    def write_batch(
+        self,
+        batch: List[Tuple[Dict[str, Any], Dict[str, Any]]],
+        embeddings: np.ndarray,
+        model_generation: Optional[int] = None
+    ):
+        """
+        Write already-embedded chunks to the database and stage their vectors
+        
+        Args:
+            batch: (document state from track_document, chunk) pairs
+            embeddings: One vector per chunk, in batch order
+            model_generation: Generation of the generator that produced the
+                embeddings (defaults to the current one)
+        """
+        if self.first_faiss_id is None:
+            self.first_faiss_id = self.faiss_manager.next_id
+        first_id = self.first_faiss_id + len(self.bm25_metadata)
+        chunk_ids = [str(uuid.uuid4()) for _ in batch]
+        faiss_ids = list(range(first_id, first_id + len(batch)))
+        
+        rows = []
+        chunk_metadata = []
+        for chunk_id, faiss_id, (document, chunk) in zip(chunk_ids, faiss_ids, batch):
+            rows.append({
+                "id": chunk_id,
+                "document_id": document["document_id"],
+                "chunk_index": chunk["index"],
+                "chunk_text": chunk["text"],
+                "chunking_strategy": document["chunking_strategy"],
+                "start_position": chunk.get("start"),
+                "end_position": chunk.get("end"),
+                "embedding_model": settings.EMBEDDING_MODEL,
+                "faiss_index_id": faiss_id
+            })
+            chunk_meta = {
+                "chunk_id": chunk_id,
+                "document_id": document["document_id"],
+                "chunk_index": chunk["index"],
+                "chunk_text": chunk["text"]
+            }
+            if chunk.get("parent_id"):
+                chunk_meta["parent_id"] = chunk["parent_id"]
+            # Merge with request metadata (e.g. including patient_id)
+            chunk_meta.update(document["metadata"])
+            chunk_metadata.append(chunk_meta)
+        
+        # One multi-row INSERT for the batch, FAISS IDs included
+        self.db.execute(insert(DocumentChunk), rows)
+        
+        for faiss_id, (document, _) in zip(faiss_ids, batch):
+            document["faiss_ids"].append(faiss_id)
+        self.staged_vectors.append(np.asarray(embeddings, dtype=np.float32))
+        self.model_generations.add(get_model_generation() if model_generation is None else model_generation)
+        self.bm25_texts.extend(row["chunk_text"] for row in rows)
+        self.bm25_metadata.extend(chunk_metadata)
+    
+    def _update_rows(self, **values):
+        """Update this run's chunk rows (not committed)"""
+        chunk_ids = [meta["chunk_id"] for meta in self.bm25_metadata]
+        for start in range(0, len(chunk_ids), 500):
+            self.db.execute(
+                update(DocumentChunk)
+                .where(DocumentChunk.id.in_(chunk_ids[start:start + 500]))
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+    
+    def _renumber(self, shift: int):
+        """Move this run's FAISS IDs past vectors another writer added meanwhile"""
+        self._update_rows(faiss_index_id=DocumentChunk.faiss_index_id + shift)
+        for document in self.documents.values():
+            document["faiss_ids"] = [faiss_id + shift for faiss_id in document["faiss_ids"]]
+        self.first_faiss_id += shift
+    
+    def _reembed(self):
+        """Embed the staged chunks again with the model now served"""
+        generator = self.embedding_generator
+        texts = self.bm25_texts
+        logger.info("Embedding model changed during indexing, re-embedding", chunks=len(texts))
+        
+        self.staged_vectors = [
+            generator.generate_embeddings_batch(texts[start:start + settings.INDEX_BATCH_SIZE])
+            for start in range(0, len(texts), settings.INDEX_BATCH_SIZE)
+        ]
+        self.model_generations = {generator.generation}
+        self._update_rows(embedding_model=settings.EMBEDDING_MODEL)
+    
+    def finish(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Index the last partial batch, commit, then add the staged vectors to
+        FAISS and update BM25 and patients
+        
+        Returns:
+            Per-document state by document ID (faiss_ids, parent_count)
+        """
+        if self.pending:
+            self._index_pending()
+        
+        if not self.bm25_texts:
+            return self.documents
+        
+        while not self._commit_vectors():
+            self._reembed()
+        
+        # Add to BM25 index (Lexical)
+        try:
+            self.bm25_manager.add_documents(self.bm25_texts, self.bm25_metadata)
+        except Exception as e:
+            logger.error("BM25 indexing failed (continuing with Semantic only)", error=str(e))
+        
+        # Update patient aggregates
+        for document in self.documents.values():
+            if not document["faiss_ids"]:
+                continue
+            try:
+                self.patient_index.record_document(
+                    document["document_id"],
+                    len(document["faiss_ids"]),
+                    document["metadata"]
+                )
+            except Exception as e:
+                logger.error("Patient index update failed", error=str(e))
+        
+        logger.info(
+            "Chunks indexed",
+            documents=sum(1 for d in self.documents.values() if d["faiss_ids"]),
+            chunks=len(self.bm25_texts)
+        )
+        
+        return self.documents
+    
+    def _commit_vectors(self) -> bool:
+        """
+        Commit the rows and add the staged vectors to the live index
+        
+        Returns:
+            False, with nothing committed, if the staged vectors come from a
+            model that is no longer served
+        """
+        faiss_manager = get_faiss_manager()  # Replaced when the model is swapped
+        
+        # Held across the commit: IDs stay reserved against this and the other process
+        with faiss_manager.writing():
+            follow_active_model()
+            if faiss_manager is not get_faiss_manager() or self.model_generations != {get_model_generation()}:
+                return False
+            
+            self.faiss_manager = faiss_manager
+            shift = faiss_manager.next_id - self.first_faiss_id
+            if shift:
+                self._renumber(shift)
+            self.db.commit()
+            
+            assigned = faiss_manager.add_vectors(
+                np.vstack(self.staged_vectors), self.bm25_metadata, save=False
+            )
+            self.staged_vectors = []
+            if assigned[0] != self.first_faiss_id:
+                raise RuntimeError("FAISS IDs changed while the batch was being committed")
+            faiss_manager.save_index()
+        
+        return True
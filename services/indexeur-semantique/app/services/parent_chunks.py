@@ -0,0 +1,77 @@
+"""
+Small-to-big retrieval: resolve child chunk hits to their parent sections
+"""
+
+from typing import List, Dict, Any
+from sqlalchemy.orm import Session
+import structlog
+
+from ..models.document_chunk import ParentChunk
+
+logger = structlog.get_logger()
+
+
+def collapse_to_parents(
+    results: List[Dict[str, Any]],
+    db: Session,
+    top_k: int
+) -> List[Dict[str, Any]]:
+    """
+    Replace child chunk hits with their parent sections, deduplicated
+    
+    Each parent appears once, at the rank of its best child hit, with the
+    parent text as chunk_text. The matching child text and the number of
+    children that matched are kept in the result metadata. Hits without a
+    parent (documents indexed flat) pass through unchanged.
+    
+    Args:
+        results: Ranked search results (child chunk metadata at top level)
+        db: Database session
+        top_k: Number of results to return
+        
+    Returns:
+        Ranked results, at most top_k
+    """
+    parent_ids = {r["parent_id"] for r in results if r.get("parent_id")}
+    if not parent_ids:
+        return results[:top_k]
+    
+    parents = {
+        parent.id: parent
+        for parent in db.query(ParentChunk).filter(ParentChunk.id.in_(parent_ids))
+    }
+    
+    collapsed = []
+    by_parent = {}
+    
+    for result in results:
+        parent = parents.get(result.get("parent_id"))
+        if parent is None:
+            collapsed.append(result)
+            continue
+        
+        if parent.id in by_parent:
+            by_parent[parent.id]["metadata"]["matched_chunks"] += 1
+            continue
+        
+        merged = dict(result)
+        merged["chunk_text"] = parent.parent_text
+        merged["metadata"] = {
+            **result.get("metadata", {}),
+            "parent_id": parent.id,
+            "parent_index": parent.parent_index,
+            "header": parent.header,
+            "matched_chunk_text": result.get("chunk_text"),
+            "matched_chunks": 1
+        }
+        by_parent[parent.id] = merged
+        collapsed.append(merged)
+    
+    logger.info(
+        "Collapsed results to parents",
+        child_results=len(results),
+        parents=len(by_parent),
+        results=min(len(collapsed), top_k)
+    )
+    
+    return collapsed[:top_k]
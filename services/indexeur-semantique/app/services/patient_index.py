@@ -0,0 +1,379 @@
+"""
+Patient aggregate index for the /patients endpoint
+"""
+
+import os
+import pickle
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+import structlog
+
+from ..config import settings
+from .index_files import file_version, file_lock, atomic_pickle_dump, BackgroundReloader
+
+logger = structlog.get_logger()
+
+
+def _coerce_age(value: Any) -> Optional[int]:
+    """Age as an int, or None when the metadata value is not a number"""
+    if isinstance(value, bool):
+        return None
+    try:
+        return int(float(str(value).strip()))
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+class PatientIndex:
+    """In-memory patient aggregate maintained incrementally on index/delete events"""
+
+    def __init__(self):
+        self.patients = {}  # patient_id -> aggregate
+        self.documents = {}  # document_id -> {patient_id, chunk_count, document_type, indexed_at}
+        self.index_path = os.path.join(settings.PATIENT_INDEX_PATH, "patient_index.pkl")
+        self._ordered_ids = None  # Cached ordering, invalidated on every change
+        self.lock = threading.RLock()
+        self.data_lock = threading.Lock()  # Readers never see the aggregate mid-update
+        self.loaded_version = None  # file_version of the aggregate last loaded or saved
+        self._write_depth = 0
+        self.reloader = BackgroundReloader(self._reload, "patient-index-reload")
+
+        self._initialize_index()
+
+    def _initialize_index(self):
+        """Initialize or load the patient index"""
+        try:
+            os.makedirs(settings.PATIENT_INDEX_PATH, exist_ok=True)
+
+            if os.path.exists(self.index_path):
+                self._load_index()
+            else:
+                self._bootstrap_from_faiss()
+
+        except Exception as e:
+            logger.error("Patient index initialization failed", error=str(e))
+            raise
+
+    def _bootstrap_from_faiss(self):
+        """Seed the aggregate from chunk metadata already stored alongside FAISS"""
+        from .faiss_manager import get_faiss_manager
+
+        try:
+            documents = {}
+            for metadata in get_faiss_manager().id_to_chunk.values():
+                document_id = metadata.get("document_id")
+                if not document_id or not metadata.get("patient_id"):
+                    continue
+
+                entry = documents.setdefault(document_id, {"metadata": metadata, "chunk_count": 0})
+                entry["chunk_count"] += 1
+
+            for document_id, entry in documents.items():
+                self._apply_document(document_id, entry["chunk_count"], entry["metadata"])
+
+            logger.info(
+                "Patient index bootstrapped from FAISS metadata",
+                patients=len(self.patients),
+                documents=len(self.documents)
+            )
+
+            if self.documents:
+                self.save_index()
+
+        except Exception as e:
+            logger.warning("Patient index bootstrap failed, starting fresh", error=str(e))
+            self.patients = {}
+            self.documents = {}
+
+    def _apply_document(
+        self,
+        document_id: str,
+        chunk_count: int,
+        metadata: Dict[str, Any],
+        indexed_at: Optional[str] = None
+    ) -> bool:
+        """Fold one document into the aggregate without persisting"""
+        patient_id = metadata.get("patient_id")
+        if not patient_id:
+            return False
+
+        patient_id = str(patient_id)
+        document_id = str(document_id)
+        indexed_at = indexed_at or datetime.utcnow().isoformat()
+
+        # Re-indexing a document replaces its previous contribution
+        if document_id in self.documents:
+            self._remove_document(document_id)
+
+        document_type = metadata.get("document_type")
+        self.documents[document_id] = {
+            "patient_id": patient_id,
+            "chunk_count": chunk_count,
+            "document_type": document_type,
+            "indexed_at": indexed_at
+        }
+
+        patient = self.patients.get(patient_id)
+        if patient is None:
+            patient = {
+                "id": patient_id,
+                "name": None,
+                "age": None,
+                "gender": None,
+                "document_count": 0,
+                "chunk_count": 0,
+                "last_indexed_at": None,
+                "document_types": {}
+            }
+            self.patients[patient_id] = patient
+
+        # Demographics come from the most recent document that carries them
+        for field, key in (("name", "patient_name"), ("age", "patient_age"), ("gender", "patient_gender")):
+            if metadata.get(key) is not None:
+                patient[field] = _coerce_age(metadata[key]) if field == "age" else metadata[key]
+
+        patient["document_count"] += 1
+        patient["chunk_count"] += chunk_count
+        if document_type:
+            patient["document_types"][document_type] = patient["document_types"].get(document_type, 0) + 1
+        if patient["last_indexed_at"] is None or indexed_at > patient["last_indexed_at"]:
+            patient["last_indexed_at"] = indexed_at
+
+        self._ordered_ids = None
+        return True
+
+    def _remove_document(self, document_id: str) -> bool:
+        """Remove one document's contribution without persisting"""
+        document = self.documents.pop(str(document_id), None)
+        if document is None:
+            return False
+
+        patient_id = document["patient_id"]
+        patient = self.patients.get(patient_id)
+        if patient is None:
+            return True
+
+        patient["document_count"] -= 1
+        patient["chunk_count"] -= document["chunk_count"]
+
+        document_type = document["document_type"]
+        if document_type and document_type in patient["document_types"]:
+            patient["document_types"][document_type] -= 1
+            if patient["document_types"][document_type] <= 0:
+                del patient["document_types"][document_type]
+
+        if patient["document_count"] <= 0:
+            del self.patients[patient_id]
+        elif patient["last_indexed_at"] == document["indexed_at"]:
+            # Only the patient's own documents need scanning to recompute the latest timestamp
+            patient["last_indexed_at"] = max(
+                (d["indexed_at"] for d in self.documents.values() if d["patient_id"] == patient_id),
+                default=None
+            )
+
+        self._ordered_ids = None
+        return True
+
+    def record_document(self, document_id: str, chunk_count: int, metadata: Dict[str, Any]):
+        """
+        Record an indexed document in the patient aggregate
+
+        Args:
+            document_id: Document UUID
+            chunk_count: Number of chunks indexed for the document
+            metadata: Document metadata (patient_id, patient_name, document_type, ...)
+        """
+        try:
+            with self.writing():
+                with self.data_lock:
+                    applied = self._apply_document(document_id, chunk_count, metadata or {})
+                if not applied:
+                    return
+
+                logger.info(
+                    "Patient index updated",
+                    document_id=str(document_id),
+                    patient_id=str(metadata["patient_id"])
+                )
+
+                self.save_index()
+
+        except Exception as e:
+            logger.error("Patient index update failed", error=str(e))
+            raise
+
+    def delete_by_document_id(self, document_id: str):
+        """
+        Remove a document from the patient aggregate
+
+        Args:
+            document_id: Document UUID to delete
+        """
+        try:
+            with self.writing():
+                with self.data_lock:
+                    removed = self._remove_document(document_id)
+                if not removed:
+                    return
+
+                logger.info("Document removed from patient index", document_id=str(document_id))
+
+                self.save_index()
+
+        except Exception as e:
+            logger.error("Patient index deletion failed", error=str(e))
+            raise
+
+    def get_patients(self, offset: int = 0, limit: int = 20) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Get a page of patients, most recently indexed first
+
+        Args:
+            offset: Number of patients to skip
+            limit: Maximum number of patients to return
+
+        Returns:
+            Tuple of (total patients, page of patient aggregates)
+        """
+        self.refresh()
+
+        # Writers and reloads reset the ordering: page from a local copy
+        with self.data_lock:
+            if self._ordered_ids is None:
+                self._ordered_ids = sorted(
+                    self.patients,
+                    key=lambda pid: self.patients[pid]["last_indexed_at"] or "",
+                    reverse=True
+                )
+            ordered_ids = self._ordered_ids
+
+            page = []
+            for patient_id in ordered_ids[offset:offset + limit]:
+                patient = self.patients[patient_id]
+                page.append({
+                    **patient,
+                    "age": _coerce_age(patient["age"]),  # Aggregates saved before ages were coerced
+                    "document_types": sorted(patient["document_types"])
+                })
+
+        return len(ordered_ids), page
+
+    def save_index(self):
+        """Save patient index to disk"""
+        try:
+            atomic_pickle_dump({'documents': self.documents, 'patients': self.patients}, self.index_path)
+            self.loaded_version = file_version(self.index_path)
+
+        except Exception as e:
+            logger.error("Patient index saving failed", error=str(e))
+            raise
+
+    def _read_index(self):
+        """Read the aggregate from disk (raises on failure)"""
+        version = file_version(self.index_path)
+        with open(self.index_path, 'rb') as f:
+            index_data = pickle.load(f)
+
+        with self.data_lock:
+            self.documents = index_data['documents']
+            self.patients = index_data['patients']
+            self._ordered_ids = None
+        self.loaded_version = version
+
+    def _load_index(self):
+        """Load patient index from disk"""
+        try:
+            self._read_index()
+
+            logger.info(
+                "Patient index loaded successfully",
+                patients=len(self.patients),
+                documents=len(self.documents)
+            )
+
+        except Exception as e:
+            logger.error("Patient index loading failed", error=str(e))
+            self.patients = {}
+            self.documents = {}
+
+    def refresh(self, wait: bool = False):
+        """
+        Reload the aggregate if another process saved a newer one
+
+        Listings call this without waiting: the reload runs in a background
+        thread (behind in-process writers and the file lock) while they keep
+        serving the aggregate already loaded.
+
+        Args:
+            wait: Reload in the calling thread instead
+        """
+        if file_version(self.index_path) == self.loaded_version:
+            return
+
+        if wait:
+            self._reload()
+        else:
+            self.reloader.start()
+
+    def _reload(self):
+        """Reload the saved aggregate unless it is already loaded"""
+        with self.lock:
+            if self._write_depth:
+                return  # This thread is writing and already holds the latest aggregate
+            with file_lock(self.index_path):
+                if file_version(self.index_path) == self.loaded_version:
+                    return
+                try:
+                    self._read_index()
+                    logger.info("Patient index reloaded", patients=len(self.patients))
+                except Exception as e:
+                    logger.error("Patient index reload failed, keeping loaded index", error=str(e))
+
+    @contextmanager
+    def writing(self):
+        """
+        Exclusive write access to the aggregate across threads and processes
+
+        On entry the aggregate is reloaded if another process saved a newer
+        one, so the save inside the block never drops its documents.
+        """
+        with self.lock:
+            if self._write_depth:
+                self._write_depth += 1
+                try:
+                    yield self
+                finally:
+                    self._write_depth -= 1
+                return
+
+            with file_lock(self.index_path):
+                self._write_depth += 1
+                try:
+                    if file_version(self.index_path) != self.loaded_version:
+                        self._read_index()
+                    yield self
+                finally:
+                    self._write_depth -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get patient index statistics"""
+        self.refresh()
+        with self.data_lock:
+            return {
+                "total_patients": len(self.patients),
+                "total_documents": len(self.documents)
+            }
+
+
+# Global patient index instance
+_patient_index = None
+
+
+def get_patient_index() -> PatientIndex:
+    """Get patient index singleton"""
+    global _patient_index
+    if _patient_index is None:
+        _patient_index = PatientIndex()
+    return _patient_index
@@ -0,0 +1,172 @@
+"""
+Fixed-size vs length-bucketed embedding batching benchmark
+
+Encodes the same chunks twice with the configured embedding provider:
+fixed EMBEDDING_BATCH_SIZE batches in arrival order, and length-bucketed
+token-budget batches. Reports throughput and padding efficiency (real
+tokens / padded tokens) for each.
+
+Chunks come from the document_chunks table (--from-db, the real length
+distribution), a JSONL corpus (--corpus) or the synthetic generator.
+
+Usage:
+    python scripts/benchmark_batching.py --from-db --limit 5000 --output batching_bench.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.config import settings
+from app.embeddings.providers import get_embedding_model
+from app.embeddings.length_batching import (
+    token_lengths,
+    plan_batches,
+    padding_efficiency,
+    encode_length_bucketed
+)
+from benchmark_retrieval import generate_corpus, load_corpus
+
+
+def load_db_chunks(limit):
+    """Load chunk texts from the document_chunks table"""
+    from app.database import SessionLocal
+    from app.models.document_chunk import DocumentChunk
+
+    db = SessionLocal()
+    try:
+        rows = db.query(DocumentChunk.chunk_text).limit(limit).all()
+        return [row[0] for row in rows]
+    finally:
+        db.close()
+
+
+def encode_fixed(model, texts, batch_size):
+    """Arrival-order batches of a fixed size"""
+    return np.vstack([
+        model.encode(texts[i:i + batch_size], batch_size=batch_size, normalize_embeddings=True)
+        for i in range(0, len(texts), batch_size)
+    ])
+
+
+def best_time(fn, repeats):
+    """Best wall time over several runs"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def length_summary(lengths):
+    """Percentiles of the token length distribution"""
+    return {f"p{p}": int(np.percentile(lengths, p)) for p in (5, 25, 50, 75, 95, 99)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Length-bucketed batching benchmark")
+    parser.add_argument("--from-db", action="store_true", help="Use chunks from document_chunks")
+    parser.add_argument("--corpus", type=Path, default=None, help="JSONL corpus ({text} per line)")
+    parser.add_argument("--limit", type=int, default=5000, help="Number of chunks to encode")
+    parser.add_argument("--batch-size", type=int, default=settings.EMBEDDING_BATCH_SIZE, help="Fixed batch size")
+    parser.add_argument("--token-budget", type=int, default=settings.EMBEDDING_TOKEN_BUDGET, help="Padded tokens per bucketed batch")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed passes per strategy")
+    parser.add_argument("--output", type=Path, default=Path("batching_benchmark.json"), help="JSON report path")
+
+    args = parser.parse_args()
+
+    if args.from_db:
+        texts = load_db_chunks(args.limit)
+        source = "document_chunks"
+    elif args.corpus:
+        texts = [c["text"] for c in load_corpus(args.corpus, limit=args.limit)]
+        source = str(args.corpus)
+    else:
+        texts = [c["text"] for c in generate_corpus(args.limit)]
+        source = "synthetic"
+
+    if not texts:
+        print("❌ No chunks to encode")
+        sys.exit(1)
+
+    print(f"🔥 Loading {settings.EMBEDDING_PROVIDER} model {settings.EMBEDDING_MODEL}...")
+    model = get_embedding_model()
+
+    lengths = token_lengths(model, texts)
+    fixed_batches = [
+        list(range(i, min(i + args.batch_size, len(texts))))
+        for i in range(0, len(texts), args.batch_size)
+    ]
+    bucketed_batches = plan_batches(lengths, args.token_budget)
+
+    model.encode(texts[:args.batch_size], batch_size=args.batch_size)  # Warm up
+
+    print(f"⏱️  Fixed batches of {args.batch_size}...")
+    fixed_seconds = best_time(lambda: encode_fixed(model, texts, args.batch_size), args.repeats)
+
+    print(f"⏱️  Length-bucketed batches under {args.token_budget} tokens...")
+    bucketed_seconds = best_time(
+        lambda: encode_length_bucketed(model, texts, token_budget=args.token_budget),
+        args.repeats
+    )
+
+    fixed = encode_fixed(model, texts, args.batch_size)
+    bucketed = encode_length_bucketed(model, texts, token_budget=args.token_budget)
+    min_cosine = float(np.sum(fixed * bucketed, axis=1).min())
+
+    results = {
+        "fixed": {
+            "batches": len(fixed_batches),
+            "padding_efficiency": round(padding_efficiency(lengths, fixed_batches), 4),
+            "seconds": round(fixed_seconds, 4),
+            "texts_per_second": round(len(texts) / fixed_seconds, 1),
+        },
+        "length_bucketed": {
+            "batches": len(bucketed_batches),
+            "padding_efficiency": round(padding_efficiency(lengths, bucketed_batches), 4),
+            "seconds": round(bucketed_seconds, 4),
+            "texts_per_second": round(len(texts) / bucketed_seconds, 1),
+        },
+    }
+    speedup = round(fixed_seconds / bucketed_seconds, 2)
+
+    report = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "provider": settings.EMBEDDING_PROVIDER,
+        "model": settings.EMBEDDING_MODEL,
+        "source": source,
+        "texts": len(texts),
+        "token_lengths": length_summary(lengths),
+        "batch_size": args.batch_size,
+        "token_budget": args.token_budget,
+        "results": results,
+        "speedup": speedup,
+        "min_cosine_fixed_vs_bucketed": round(min_cosine, 6),
+    }
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print("=" * 50)
+    print(f"Token lengths: {report['token_lengths']}")
+    for name, stats in results.items():
+        print(
+            f"{name:<16} {stats['texts_per_second']:>9} texts/s  "
+            f"padding efficiency {stats['padding_efficiency']:.2%}  ({stats['batches']} batches)"
+        )
+    print(f"Speedup: x{speedup}  (min cosine fixed vs bucketed {min_cosine:.6f})")
+    print(f"\n✅ Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Embedding backend throughput and parity benchmark
+
+Compares the PyTorch SentenceTransformer (fp32) against the ONNX Runtime
+backend (fp32 and dynamic int8) on synthetic clinical chunks, reporting
+texts/second and cosine parity against the PyTorch vectors.
+
+Usage:
+    python scripts/benchmark_embeddings.py --texts 2000 --batch-size 32 --output embed_bench.json
+"""
+
+import os
+import sys
+import json
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.config import settings
+from app.embeddings.onnx_backend import (
+    ONNXEmbeddingModel,
+    benchmark_throughput,
+    check_parity
+)
+from benchmark_retrieval import generate_corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding backend benchmark")
+    parser.add_argument("--texts", type=int, default=2000, help="Number of chunks to encode")
+    parser.add_argument("--batch-size", type=int, default=settings.EMBEDDING_BATCH_SIZE, help="Encode batch size")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed passes per backend")
+    parser.add_argument("--threads", type=int, default=None, help="Override ONNX_INTRA_OP_THREADS")
+    parser.add_argument("--output", type=Path, default=Path("embedding_benchmark.json"), help="JSON report path")
+
+    args = parser.parse_args()
+
+    if args.threads is not None:
+        settings.ONNX_INTRA_OP_THREADS = args.threads
+
+    from sentence_transformers import SentenceTransformer
+
+    texts = [c["text"] for c in generate_corpus(args.texts)]
+
+    print(f"🔥 Loading PyTorch model {settings.EMBEDDING_MODEL}...")
+    reference = SentenceTransformer(settings.EMBEDDING_MODEL, device=settings.EMBEDDING_DEVICE)
+
+    backends = {
+        "pytorch_fp32": reference,
+        "onnx_fp32": ONNXEmbeddingModel(settings.EMBEDDING_MODEL, quantized=False),
+        "onnx_int8": ONNXEmbeddingModel(settings.EMBEDDING_MODEL, quantized=True),
+    }
+
+    results = {}
+    for name, model in backends.items():
+        print(f"⏱️  Benchmarking {name}...")
+        results[name] = benchmark_throughput(model, texts, args.batch_size, repeats=args.repeats)
+        if name != "pytorch_fp32":
+            results[name]["parity"] = check_parity(model, reference, texts[:256])
+
+    baseline = results["pytorch_fp32"]["texts_per_second"]
+    for stats in results.values():
+        stats["speedup"] = round(stats["texts_per_second"] / baseline, 2)
+
+    report = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "model": settings.EMBEDDING_MODEL,
+        "device": settings.EMBEDDING_DEVICE,
+        "texts": len(texts),
+        "batch_size": args.batch_size,
+        "onnx_intra_op_threads": settings.ONNX_INTRA_OP_THREADS,
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print("=" * 50)
+    for name, stats in results.items():
+        parity = stats.get("parity", {})
+        parity_text = f" min_cos={parity['min_cosine']:.4f}" if parity else ""
+        print(f"{name:<13} {stats['texts_per_second']:>9} texts/s  x{stats['speedup']}{parity_text}")
+    print(f"\n✅ Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,553 @@
+"""
+Offline retrieval quality and latency benchmark for the IndexeurSémantique engine
+
+This script builds a synthetic clinical corpus (reusing the patient generators
+under scripts/data_collection) or loads one from JSONL, indexes it with the real
+engine components into an isolated work directory, and measures:
+- Ingestion throughput (embedding, FAISS and BM25 stages)
+- Index size on disk
+- Cold-start time (model load, FAISS load, BM25 load)
+- p50/p95/p99 query latency and recall@k for semantic, lexical and hybrid modes
+- Optionally, the size/latency/recall impact of PCA-projected vectors
+
+Results are written to a JSON report so every engine change is measurable.
+
+Usage:
+    python scripts/benchmark_retrieval.py --sizes 10000,100000 --output bench.json
+    python scripts/benchmark_retrieval.py --corpus corpus.jsonl --modes lexical
+    python scripts/benchmark_retrieval.py --sizes 100000 --modes semantic --projection-dims 128,64
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path to import app modules
+SERVICE_DIR = Path(__file__).resolve().parents[1]
+REPO_ROOT = SERVICE_DIR.parents[1]
+sys.path.insert(0, str(SERVICE_DIR))
+sys.path.insert(0, str(REPO_ROOT / "scripts" / "data_collection"))
+
+from app.config import settings
+
+MODES = ("semantic", "lexical", "hybrid")
+RECALL_KS = (1, 5, 10)
+
+PLANS = [
+    "continue current management",
+    "titrate medication and follow up in 2 weeks",
+    "refer to specialist",
+    "repeat labs in 3 months",
+    "admit for observation",
+]
+
+
+# ---------------------------------------------------------------------------
+# Corpus
+# ---------------------------------------------------------------------------
+
+def generate_corpus(n_chunks, chunks_per_document=8, seed=42):
+    """
+    Generate a synthetic clinical chunk corpus
+
+    Patients, diagnoses and base clinical notes come from the training data
+    generator; each document then gets section chunks (labs, vitals,
+    medications, assessment) with per-chunk values so chunks are distinguishable.
+    """
+    import generate_synthetic_data as synthetic
+
+    rng = random.Random(seed)
+    np.random.seed(seed)
+
+    n_documents = max(1, n_chunks // chunks_per_document)
+    n_patients = max(1, min(n_documents // 4, 5000))
+
+    print(f"🧬 Generating {n_patients} synthetic patients...")
+    patients_df = synthetic.generate_patient_demographics(n_patients)
+    diagnoses_df = synthetic.generate_diagnoses(patients_df)
+    notes_df = synthetic.generate_clinical_notes(patients_df, diagnoses_df)
+
+    code_to_condition = {
+        code: condition
+        for condition, codes in synthetic.ICD10_CODES.items()
+        for code in codes
+    }
+    all_meds = [med for meds in synthetic.MEDICATIONS.values() for med in meds]
+
+    patients = []
+    for (_, patient), diagnoses, note in zip(
+        patients_df.iterrows(), diagnoses_df["diagnoses"], notes_df["clinical_notes"]
+    ):
+        conditions = sorted({code_to_condition[c] for c in diagnoses if c in code_to_condition})
+        meds = [
+            med
+            for condition in conditions
+            for med in synthetic.MEDICATIONS.get(condition, [])
+        ] or all_meds
+        patients.append({
+            "patient_id": patient["patient_id"],
+            "age": int(patient["age"]),
+            "gender": patient["gender"],
+            "diagnoses": list(diagnoses),
+            "conditions": conditions or ["general"],
+            "meds": meds,
+            "note": note,
+        })
+
+    print(f"📝 Generating {n_chunks} chunks across {n_documents} documents...")
+    corpus = []
+    for doc_idx in range(n_documents):
+        patient = patients[doc_idx % n_patients]
+        document_id = f"doc-{doc_idx:07d}"
+        visit_date = f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+
+        for chunk_idx in range(chunks_per_document):
+            if len(corpus) >= n_chunks:
+                break
+
+            section = chunk_idx % 5
+            condition = rng.choice(patient["conditions"])
+            if section == 0:
+                text = f"Clinical note {visit_date}: {patient['note']}"
+            elif section == 1:
+                text = (
+                    f"Laboratory results on {visit_date}: glucose {rng.randint(70, 320)} mg/dL, "
+                    f"creatinine {rng.uniform(0.5, 4.0):.1f} mg/dL, hemoglobin {rng.uniform(8, 17):.1f} g/dL, "
+                    f"potassium {rng.uniform(3.0, 6.0):.1f} mmol/L."
+                )
+            elif section == 2:
+                text = (
+                    f"Vital signs: blood pressure {rng.randint(95, 190)}/{rng.randint(55, 110)} mmHg, "
+                    f"heart rate {rng.randint(48, 130)} bpm, SpO2 {rng.randint(86, 100)}%, "
+                    f"temperature {rng.uniform(36.0, 39.5):.1f} C. {patient['age']}yo {patient['gender']}."
+                )
+            elif section == 3:
+                med = rng.choice(patient["meds"])
+                text = (
+                    f"Medications: {med} {rng.choice([5, 10, 20, 25, 40, 50, 100, 500])} mg "
+                    f"{rng.choice(['daily', 'twice daily', 'at bedtime', 'as needed'])}, "
+                    f"started {visit_date} for {condition.replace('_', ' ')}."
+                )
+            else:
+                code = rng.choice(patient["diagnoses"]) if patient["diagnoses"] else "Z00.00"
+                text = (
+                    f"Assessment: {condition.replace('_', ' ')} ({code}), "
+                    f"{rng.choice(['stable', 'improving', 'worsening', 'uncontrolled'])}. "
+                    f"Plan: {rng.choice(PLANS)}."
+                )
+
+            corpus.append({
+                "chunk_id": f"{document_id}-{chunk_idx:03d}",
+                "document_id": document_id,
+                "patient_id": patient["patient_id"],
+                "chunk_index": chunk_idx,
+                "text": text,
+            })
+
+    return corpus
+
+
+def load_corpus(path, limit=None):
+    """Load a corpus from JSONL ({chunk_id, document_id, text, ...} per line)"""
+    corpus = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if limit is not None and len(corpus) >= limit:
+                break
+            if line.strip():
+                corpus.append(json.loads(line))
+    return corpus
+
+
+def save_corpus(corpus, path):
+    """Save a corpus as JSONL"""
+    with open(path, "w", encoding="utf-8") as f:
+        for chunk in corpus:
+            f.write(json.dumps(chunk) + "\n")
+
+
+def build_queries(corpus, n_queries, words_per_query=6, seed=42):
+    """
+    Build known-item queries from sampled chunks
+
+    Each query is an ordered subset of one chunk's words; that chunk is the
+    single relevant result used for recall@k.
+    """
+    rng = random.Random(seed)
+    targets = rng.sample(corpus, k=min(n_queries, len(corpus)))
+
+    queries = []
+    for chunk in targets:
+        words = [w.strip(".,:;()") for w in chunk["text"].split()]
+        words = [w for w in words if len(w) > 2]
+        if not words:
+            continue
+        positions = sorted(rng.sample(range(len(words)), k=min(words_per_query, len(words))))
+        queries.append({
+            "query": " ".join(words[p] for p in positions),
+            "relevant_chunk_id": chunk["chunk_id"],
+        })
+
+    return queries
+
+
+# ---------------------------------------------------------------------------
+# Engine
+# ---------------------------------------------------------------------------
+
+def configure_workdir(workdir):
+    """Point every on-disk index at an isolated work directory"""
+    from app.embeddings.projection import reset_projection
+
+    settings.FAISS_INDEX_PATH = os.path.join(workdir, "faiss_indices")
+    settings.BM25_INDEX_PATH = os.path.join(workdir, "bm25_indices")
+    settings.PATIENT_INDEX_PATH = os.path.join(workdir, "patient_index")
+    reset_projection()
+
+
+def directory_size(path):
+    """Total size in bytes of all files below path"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def percentile_ms(samples, pct):
+    """Percentile of a list of second-based samples, in milliseconds"""
+    if not samples:
+        return None
+    return round(float(np.percentile(samples, pct)) * 1000, 3)
+
+
+def ingest(corpus, modes, batch_size, embedding_generator):
+    """Index the corpus with the engine components, timing each stage"""
+    from app.services.faiss_manager import FAISSManager
+    from app.services.bm25_manager import BM25Manager
+
+    need_semantic = any(m in modes for m in ("semantic", "hybrid"))
+    need_lexical = any(m in modes for m in ("lexical", "hybrid"))
+
+    faiss_manager = FAISSManager() if need_semantic else None
+    bm25_manager = BM25Manager() if need_lexical else None
+
+    timings = {"embedding_s": 0.0, "faiss_s": 0.0, "bm25_s": 0.0}
+
+    for start in range(0, len(corpus), batch_size):
+        batch = corpus[start:start + batch_size]
+        texts = [c["text"] for c in batch]
+        metadata = [
+            {
+                "chunk_id": c["chunk_id"],
+                "document_id": c["document_id"],
+                "chunk_index": c.get("chunk_index", 0),
+                "chunk_text": c["text"],
+                "patient_id": c.get("patient_id"),
+            }
+            for c in batch
+        ]
+
+        if need_semantic:
+            t0 = time.perf_counter()
+            embeddings = embedding_generator.generate_embeddings_batch(texts)
+            timings["embedding_s"] += time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            faiss_manager.add_vectors(embeddings, metadata)
+            timings["faiss_s"] += time.perf_counter() - t0
+
+        if need_lexical:
+            t0 = time.perf_counter()
+            bm25_manager.add_documents(texts, metadata)
+            timings["bm25_s"] += time.perf_counter() - t0
+
+        print(f"   indexed {min(start + batch_size, len(corpus))}/{len(corpus)} chunks")
+
+    total_s = sum(timings.values())
+    result = {
+        **{k: round(v, 3) for k, v in timings.items()},
+        "total_s": round(total_s, 3),
+        "chunks_per_s": round(len(corpus) / total_s, 1) if total_s else None,
+    }
+    if need_semantic and timings["embedding_s"]:
+        result["embedding_chunks_per_s"] = round(len(corpus) / timings["embedding_s"], 1)
+
+    return result
+
+
+def measure_cold_start(modes):
+    """Time loading each persisted component from disk"""
+    from app.services.faiss_manager import FAISSManager
+    from app.services.bm25_manager import BM25Manager
+    from app.embeddings.embedding_generator import EmbeddingGenerator
+
+    result = {}
+    components = {}
+
+    if any(m in modes for m in ("semantic", "hybrid")):
+        t0 = time.perf_counter()
+        components["embedding_generator"] = EmbeddingGenerator()
+        result["embedding_model_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+
+        t0 = time.perf_counter()
+        components["faiss"] = FAISSManager()
+        result["faiss_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+
+    if any(m in modes for m in ("lexical", "hybrid")):
+        t0 = time.perf_counter()
+        components["bm25"] = BM25Manager()
+        result["bm25_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+
+    result["total_ms"] = round(sum(result.values()), 1)
+    return result, components
+
+
+def run_query(mode, query, top_k, components, hybrid_service):
+    """Run one query the same way the /search endpoint does"""
+    if mode == "lexical":
+        return components["bm25"].search(query, top_k=top_k)
+
+    query_embedding = components["embedding_generator"].generate_embedding(query)
+
+    if mode == "semantic":
+        return components["faiss"].search(query_embedding, top_k=top_k)
+
+    semantic_results = components["faiss"].search(query_embedding, top_k=top_k * 2)
+    lexical_results = components["bm25"].search(query, top_k=top_k * 2)
+    return hybrid_service.hybrid_search(
+        semantic_results=semantic_results,
+        lexical_results=lexical_results,
+        top_k=top_k,
+    )
+
+
+def evaluate_queries(mode, queries, top_k, components, hybrid_service, warmup=5):
+    """Measure latency percentiles and recall@k for one search mode"""
+    for q in queries[:warmup]:
+        run_query(mode, q["query"], top_k, components, hybrid_service)
+
+    latencies = []
+    hits = {k: 0 for k in RECALL_KS if k <= top_k}
+
+    for q in queries:
+        t0 = time.perf_counter()
+        results = run_query(mode, q["query"], top_k, components, hybrid_service)
+        latencies.append(time.perf_counter() - t0)
+
+        ranked_ids = [str(r.get("chunk_id")) for r in results]
+        for k in hits:
+            if q["relevant_chunk_id"] in ranked_ids[:k]:
+                hits[k] += 1
+
+    n = len(queries) or 1
+    return {
+        "queries": len(queries),
+        "p50_ms": percentile_ms(latencies, 50),
+        "p95_ms": percentile_ms(latencies, 95),
+        "p99_ms": percentile_ms(latencies, 99),
+        "mean_ms": round(float(np.mean(latencies)) * 1000, 3) if latencies else None,
+        **{f"recall@{k}": round(v / n, 4) for k, v in hits.items()},
+    }
+
+
+def benchmark_projections(queries, args, components, workdir):
+    """Measure index size, latency and recall of PCA-projected copies of the FAISS index"""
+    from app.services.faiss_manager import FAISSManager
+    from app.embeddings.embedding_generator import EmbeddingGenerator
+    from app.embeddings.projection import EmbeddingProjection, reset_projection
+
+    full_index = components["faiss"]
+    vectors = full_index.get_vectors()
+    metadata = [full_index.id_to_chunk.get(i, {}) for i in range(len(vectors))]
+
+    rng = np.random.default_rng(args.seed)
+    sample = vectors[rng.choice(len(vectors), size=min(settings.EMBEDDING_PROJECTION_SAMPLE, len(vectors)), replace=False)]
+
+    full_path = settings.FAISS_INDEX_PATH
+    results = {}
+
+    try:
+        for dim in args.projection_dims:
+            print(f"🧮 Projecting {vectors.shape[1]} -> {dim} dimensions...")
+            projection = EmbeddingProjection.fit(sample, dim, whiten=settings.EMBEDDING_PROJECTION_WHITEN)
+
+            settings.FAISS_INDEX_PATH = os.path.join(workdir, f"faiss_pca{dim}")
+            projection.save(settings.FAISS_INDEX_PATH)
+            reset_projection()
+
+            projected_faiss = FAISSManager()
+            projected_faiss.rebuild(projection.apply(vectors), metadata)
+
+            projected = {"faiss": projected_faiss, "embedding_generator": EmbeddingGenerator()}
+            results[str(dim)] = {
+                "explained_variance": round(float(projection.explained_variance_ratio.sum()), 4),
+                "faiss_bytes": directory_size(settings.FAISS_INDEX_PATH),
+                **evaluate_queries("semantic", queries, args.top_k, projected, None),
+            }
+    finally:
+        settings.FAISS_INDEX_PATH = full_path
+        reset_projection()
+
+    return results
+
+
+def benchmark_size(corpus, queries, args):
+    """Run the full benchmark for one corpus"""
+    from app.services.hybrid_search import HybridSearchService
+
+    workdir = tempfile.mkdtemp(prefix="indexeur-bench-", dir=args.workdir)
+    configure_workdir(workdir)
+
+    embedding_generator = None
+    if any(m in args.modes for m in ("semantic", "hybrid")):
+        from app.embeddings.embedding_generator import EmbeddingGenerator
+        embedding_generator = EmbeddingGenerator()
+
+    print(f"⚙️  Ingesting {len(corpus)} chunks into {workdir}")
+    ingestion = ingest(corpus, args.modes, args.ingest_batch_size, embedding_generator)
+    del embedding_generator
+
+    index_size = {
+        "faiss_bytes": directory_size(settings.FAISS_INDEX_PATH),
+        "bm25_bytes": directory_size(settings.BM25_INDEX_PATH),
+    }
+    index_size["total_bytes"] = sum(index_size.values())
+
+    print("🧊 Measuring cold start...")
+    cold_start, components = measure_cold_start(args.modes)
+
+    hybrid_service = HybridSearchService()
+    query_results = {}
+    for mode in args.modes:
+        print(f"🔎 Running {len(queries)} {mode} queries...")
+        query_results[mode] = evaluate_queries(mode, queries, args.top_k, components, hybrid_service)
+
+    projection_results = {}
+    if args.projection_dims and "faiss" in components:
+        projection_results = benchmark_projections(queries, args, components, workdir)
+
+    return {
+        "corpus_chunks": len(corpus),
+        "corpus_documents": len({c["document_id"] for c in corpus}),
+        "workdir": workdir,
+        "ingestion": ingestion,
+        "index_size": index_size,
+        "cold_start": cold_start,
+        "search": query_results,
+        "projection": projection_results,
+    }
+
+
+def git_commit():
+    """Current git commit, if available"""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IndexeurSémantique retrieval benchmark")
+    parser.add_argument("--sizes", type=str, default="10000",
+                        help="Comma-separated corpus sizes in chunks (e.g. 10000,100000,1000000)")
+    parser.add_argument("--corpus", type=Path, default=None,
+                        help="Load corpus from JSONL instead of generating it")
+    parser.add_argument("--save-corpus", type=Path, default=None,
+                        help="Save each generated corpus as JSONL (size is appended to the name)")
+    parser.add_argument("--modes", type=str, default=",".join(MODES),
+                        help="Comma-separated search modes to benchmark")
+    parser.add_argument("--queries", type=int, default=200, help="Number of known-item queries")
+    parser.add_argument("--top-k", type=int, default=10, help="Results per query")
+    parser.add_argument("--ingest-batch-size", type=int, default=5000,
+                        help="Chunks per engine indexing call")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for corpus and queries")
+    parser.add_argument("--projection-dims", type=str, default="",
+                        help="Comma-separated PCA dimensions to compare against full-size semantic search")
+    parser.add_argument("--workdir", type=str, default=None, help="Parent directory for benchmark indices")
+    parser.add_argument("--output", type=Path, default=Path("benchmark_report.json"),
+                        help="Path of the JSON report")
+
+    args = parser.parse_args()
+    args.modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown = set(args.modes) - set(MODES)
+    if unknown:
+        parser.error(f"Unknown modes: {', '.join(sorted(unknown))}")
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    args.projection_dims = [int(d) for d in args.projection_dims.split(",") if d.strip()]
+
+    report = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "git_commit": git_commit(),
+        "host": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {
+            "embedding_model": settings.EMBEDDING_MODEL,
+            "embedding_device": settings.EMBEDDING_DEVICE,
+            "embedding_batch_size": settings.EMBEDDING_BATCH_SIZE,
+            "faiss_index_type": settings.FAISS_INDEX_TYPE,
+            "hybrid_search_mode": settings.HYBRID_SEARCH_MODE,
+            "bm25_k1": settings.BM25_K1,
+            "bm25_b": settings.BM25_B,
+            "modes": args.modes,
+            "top_k": args.top_k,
+            "queries": args.queries,
+            "seed": args.seed,
+            "projection_dims": args.projection_dims,
+        },
+        "runs": [],
+    }
+
+    for size in sizes:
+        print("=" * 50)
+        if args.corpus:
+            corpus = load_corpus(args.corpus, limit=size)
+            print(f"📂 Loaded {len(corpus)} chunks from {args.corpus}")
+        else:
+            corpus = generate_corpus(size, seed=args.seed)
+            if args.save_corpus:
+                path = args.save_corpus.with_name(f"{args.save_corpus.stem}_{size}{args.save_corpus.suffix}")
+                save_corpus(corpus, path)
+                print(f"💾 Corpus saved to {path}")
+
+        queries = build_queries(corpus, args.queries, seed=args.seed)
+        report["runs"].append(benchmark_size(corpus, queries, args))
+
+        # Write after every size so partial results survive long runs
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    print("=" * 50)
+    for run in report["runs"]:
+        print(f"📊 {run['corpus_chunks']} chunks: "
+              f"{run['ingestion']['chunks_per_s']} chunks/s ingest, "
+              f"{run['index_size']['total_bytes'] / 1e6:.1f} MB, "
+              f"cold start {run['cold_start']['total_ms']} ms")
+        for mode, stats in run["search"].items():
+            recall = ", ".join(f"{k}={v}" for k, v in stats.items() if k.startswith("recall@"))
+            print(f"   {mode:<9} p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms {recall}")
+        for dim, stats in run["projection"].items():
+            recall = ", ".join(f"{k}={v}" for k, v in stats.items() if k.startswith("recall@"))
+            print(f"   pca{dim:<6} p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms "
+                  f"{stats['faiss_bytes'] / 1e6:.1f} MB {recall}")
+    print(f"\n✅ Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Fit a PCA projection on the indexed vectors and rebuild FAISS with reduced vectors
+
+The projection is fitted on a sample of the vectors already stored in the
+FAISS index, saved as projection.pkl next to faiss.index, and applied to
+every stored vector. FAISS IDs are preserved, so document_chunks rows stay
+valid. From then on the embedding generator projects document and query
+vectors automatically.
+
+The original index is kept as faiss.index.pre_projection.
+
+Usage:
+    python scripts/fit_projection.py --dim 128
+    python scripts/fit_projection.py --dim 96 --whiten --sample 20000
+"""
+
+import os
+import sys
+import shutil
+import argparse
+import numpy as np
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+from app.embeddings.projection import EmbeddingProjection, get_projection
+from app.services.faiss_manager import FAISSManager
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit a PCA projection for the FAISS index")
+    parser.add_argument("--dim", type=int, default=settings.EMBEDDING_PROJECTION_DIM, help="Target dimension")
+    parser.add_argument("--whiten", action="store_true", default=settings.EMBEDDING_PROJECTION_WHITEN,
+                        help="Whiten projected components")
+    parser.add_argument("--sample", type=int, default=settings.EMBEDDING_PROJECTION_SAMPLE,
+                        help="Vectors sampled to fit the projection")
+    parser.add_argument("--seed", type=int, default=42, help="Sampling seed")
+
+    args = parser.parse_args()
+
+    if get_projection() is not None:
+        print("❌ Index is already projected; restore faiss.index.pre_projection and remove projection.pkl to refit")
+        sys.exit(1)
+
+    manager = FAISSManager()
+    vectors = manager.get_vectors()
+    total = len(vectors)
+
+    if total == 0:
+        print("❌ FAISS index is empty")
+        sys.exit(1)
+
+    print(f"📂 Loaded {total} vectors of dimension {vectors.shape[1]}")
+
+    rng = np.random.default_rng(args.seed)
+    sample = vectors[rng.choice(total, size=min(args.sample, total), replace=False)]
+
+    print(f"🧮 Fitting PCA {vectors.shape[1]} -> {args.dim} on {len(sample)} vectors...")
+    projection = EmbeddingProjection.fit(sample, args.dim, whiten=args.whiten)
+    print(f"   explained variance: {projection.explained_variance_ratio.sum():.2%}")
+
+    shutil.copy(manager.index_path, manager.index_path + ".pre_projection")
+
+    metadata = [manager.id_to_chunk.get(i, {}) for i in range(total)]
+    manager.rebuild(projection.apply(vectors), metadata)
+    projection.save(settings.FAISS_INDEX_PATH)
+
+    before = total * vectors.shape[1] * 4
+    after = total * args.dim * 4
+    print(f"✅ Rebuilt index: {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB of vectors")
+    print("   Restart the indexer to load the projection for new documents and queries")
+
+
+if __name__ == "__main__":
+    main()
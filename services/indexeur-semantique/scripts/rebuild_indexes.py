@@ -0,0 +1,233 @@
+"""
+Rebuild the FAISS and BM25 indexes offline from the document_chunks table
+
+Rows are streamed from the database in batches. Every batch is embedded
+with the configured model (using the embedding worker pool when
+EMBEDDING_WORKERS is set) while BM25 tokenization of the same rows runs in
+a process pool. Both indexes are built in a staging directory and swapped
+in at the end, so nothing is re-posted over HTTP and the live files are
+only replaced once the rebuild succeeded.
+
+Request metadata (patient_id, ...) is not stored in document_chunks; it is
+carried over from the current FAISS and BM25 metadata by chunk ID, and
+parent links are restored from the parent_chunks table.
+
+The previous files are kept with a .pre_rebuild suffix. Pause ingestion
+while the rebuild runs: if the live indexes changed meanwhile, nothing is
+swapped. The swap and the faiss_index_id update hold the index file locks,
+and the running indexer and consumer reload the new files on their own.
+
+Usage:
+    python scripts/rebuild_indexes.py
+    python scripts/rebuild_indexes.py --bm25-only --workers 8
+"""
+
+import os
+import sys
+import shutil
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.document_chunk import DocumentChunk, ParentChunk
+from app.embeddings.projection import PROJECTION_FILENAME
+from app.services.faiss_manager import FAISSManager
+from app.services.bm25_manager import BM25Manager, tokenize_texts
+from app.services.index_files import file_version, file_lock
+
+BASE_KEYS = {"chunk_id", "document_id", "chunk_index", "chunk_text"}
+
+
+def load_carried_metadata(bm25_only):
+    """Extra metadata of the current indexes, by chunk ID"""
+    carried = {}
+    for meta in BM25Manager().metadata:
+        carried[meta.get("chunk_id")] = meta
+    if not bm25_only:
+        for meta in FAISSManager().id_to_chunk.values():
+            carried.setdefault(meta.get("chunk_id"), meta)
+
+    return {
+        chunk_id: {k: v for k, v in meta.items() if k not in BASE_KEYS}
+        for chunk_id, meta in carried.items()
+        if chunk_id
+    }
+
+
+def load_parent_ranges(db):
+    """Parent ID ranges over chunk_index, by document ID"""
+    ranges = {}
+    for parent in db.query(ParentChunk.id, ParentChunk.document_id, ParentChunk.child_start, ParentChunk.child_end):
+        ranges.setdefault(parent.document_id, []).append((parent.child_start, parent.child_end, parent.id))
+    return ranges
+
+
+def chunk_metadata(row, carried, parent_ranges):
+    """FAISS/BM25 metadata of one document_chunks row"""
+    meta = {
+        "chunk_id": row.id,
+        "document_id": row.document_id,
+        "chunk_index": row.chunk_index,
+        "chunk_text": row.chunk_text
+    }
+    for start, end, parent_id in parent_ranges.get(row.document_id, ()):
+        if start <= row.chunk_index < end:
+            meta["parent_id"] = parent_id
+            break
+    meta.update(carried.get(row.id, {}))
+    return meta
+
+
+def live_versions(bm25_only):
+    """Versions of the live files the indexer and the consumer write"""
+    versions = [file_version(os.path.join(settings.BM25_INDEX_PATH, "bm25_index.pkl"))]
+    if not bm25_only:
+        versions.append(file_version(os.path.join(settings.FAISS_INDEX_PATH, "metadata.pkl")))
+    return versions
+
+
+def swap_in(staging_dir, live_dir, filenames, swapped):
+    """Back up live files and move the staged ones into place, recording each swap"""
+    for filename in filenames:
+        live = os.path.join(live_dir, filename)
+        existed = os.path.exists(live)
+        if existed:
+            shutil.copy(live, live + ".pre_rebuild")
+        os.replace(os.path.join(staging_dir, filename), live)
+        swapped.append((live, existed))
+
+
+def restore(swapped):
+    """Put back the live files replaced by swap_in"""
+    for live, existed in reversed(swapped):
+        if existed:
+            os.replace(live + ".pre_rebuild", live)
+        else:
+            os.remove(live)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild FAISS and BM25 from document_chunks")
+    parser.add_argument("--batch-size", type=int, default=1024, help="Rows read and embedded per batch")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="BM25 tokenization processes")
+    parser.add_argument("--bm25-only", action="store_true", help="Rebuild only the lexical index (no model needed)")
+
+    args = parser.parse_args()
+    start_time = time.time()
+
+    db = SessionLocal()
+    started_versions = live_versions(args.bm25_only)
+    total = db.query(DocumentChunk).count()
+    if total == 0:
+        print("❌ document_chunks is empty")
+        sys.exit(1)
+
+    print(f"📂 {total} chunks in document_chunks")
+    carried = load_carried_metadata(args.bm25_only)
+    parent_ranges = load_parent_ranges(db)
+    print(f"   metadata carried over for {len(carried)} chunks, {sum(map(len, parent_ranges.values()))} parents")
+
+    faiss_staging = os.path.join(settings.FAISS_INDEX_PATH, "rebuild")
+    bm25_staging = os.path.join(settings.BM25_INDEX_PATH, "rebuild")
+    for staging in (faiss_staging, bm25_staging):
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+
+    faiss_manager = None
+    generator = None
+    if not args.bm25_only:
+        from app.embeddings import get_embedding_generator
+
+        projection = os.path.join(settings.FAISS_INDEX_PATH, PROJECTION_FILENAME)
+        if os.path.exists(projection):
+            shutil.copy(projection, faiss_staging)
+        faiss_manager = FAISSManager(index_dir=faiss_staging)
+        generator = get_embedding_generator()
+        print(f"🔥 Re-embedding with {settings.EMBEDDING_PROVIDER} model {settings.EMBEDDING_MODEL}")
+
+    stmt = (
+        select(DocumentChunk.id, DocumentChunk.document_id, DocumentChunk.chunk_index, DocumentChunk.chunk_text)
+        .order_by(DocumentChunk.document_id, DocumentChunk.chunk_index)
+        .execution_options(yield_per=args.batch_size)
+    )
+
+    metadata = []
+    tokenized = []
+    faiss_updates = []
+    done = 0
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for rows in db.execute(stmt).partitions():
+            texts = [row.chunk_text for row in rows]
+            batch_metadata = [chunk_metadata(row, carried, parent_ranges) for row in rows]
+
+            # Tokenize in the pool while this process embeds
+            tokenized.append(pool.submit(tokenize_texts, texts))
+            metadata.extend(batch_metadata)
+
+            if faiss_manager is not None:
+                embeddings = generator.generate_embeddings_batch(texts)
+                faiss_ids = faiss_manager.add_vectors(embeddings, batch_metadata, save=False)
+                faiss_updates.extend(
+                    {"id": row.id, "faiss_index_id": faiss_id, "embedding_model": settings.EMBEDDING_MODEL}
+                    for row, faiss_id in zip(rows, faiss_ids)
+                )
+
+            done += len(rows)
+            print(f"   {done}/{total} chunks ({done / (time.time() - start_time):.0f}/s)")
+
+        corpus = [tokens for future in tokenized for tokens in future.result()]
+
+    bm25_manager = BM25Manager(index_dir=bm25_staging)
+    bm25_manager.corpus = corpus
+    bm25_manager.metadata = metadata
+    bm25_manager.save_index()
+
+    if faiss_manager is not None:
+        faiss_manager.save_index()
+
+    # Same locks as the indexer and the consumer (FAISS first, as they take it)
+    with ExitStack() as locks:
+        if faiss_manager is not None:
+            locks.enter_context(file_lock(os.path.join(settings.FAISS_INDEX_PATH, "faiss.index")))
+        locks.enter_context(file_lock(os.path.join(settings.BM25_INDEX_PATH, "bm25_index.pkl")))
+
+        if live_versions(args.bm25_only) != started_versions:
+            for staging in (faiss_staging, bm25_staging):
+                shutil.rmtree(staging, ignore_errors=True)
+            print("❌ The live indexes changed during the rebuild, nothing was swapped")
+            print("   Pause ingestion and run the rebuild again")
+            sys.exit(1)
+
+        swapped = []
+        try:
+            if faiss_manager is not None:
+                for i in range(0, len(faiss_updates), args.batch_size):
+                    db.bulk_update_mappings(DocumentChunk, faiss_updates[i:i + args.batch_size])
+                swap_in(faiss_staging, settings.FAISS_INDEX_PATH, ["faiss.index", "metadata.pkl"], swapped)
+
+            swap_in(bm25_staging, settings.BM25_INDEX_PATH, ["bm25_index.pkl"], swapped)
+            db.commit()
+        except Exception:
+            db.rollback()
+            restore(swapped)
+            raise
+
+    for staging in (faiss_staging, bm25_staging):
+        shutil.rmtree(staging, ignore_errors=True)
+    db.close()
+
+    print(f"✅ Rebuilt {'BM25' if args.bm25_only else 'FAISS and BM25'} from {done} chunks in {time.time() - start_time:.1f}s")
+    print("   The indexer and the consumer load the new indexes on their next search or write")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Unit tests for token-aware chunking
+"""
+
+import re
+import threading
+import pytest
+import numpy as np
+from app.services import chunker as chunker_module
+from app.services.chunker import TextChunker, StreamingChunker, iter_batches
+from app.config import settings
+
+
+class WordPieceTokenizer:
+    """Minimal fast-tokenizer stand-in: words split into 4-character pieces"""
+
+    is_fast = True
+
+    def __init__(self):
+        self.calls = 0
+
+    def num_special_tokens_to_add(self, pair=False):
+        return 2
+
+    def _offsets(self, text):
+        offsets = []
+        for match in re.finditer(r"\w+|[^\w\s]", text):
+            for start in range(match.start(), match.end(), 4):
+                offsets.append((start, min(start + 4, match.end())))
+        return offsets
+
+    def __call__(self, texts, **kwargs):
+        self.calls += 1
+        return {"offset_mapping": [self._offsets(text) for text in texts]}
+
+
+@pytest.fixture
+def chunker(monkeypatch):
+    """Chunker with a 32-token window (30 after special tokens) and 5-token overlap"""
+    monkeypatch.setattr(settings, "CHUNK_SIZE", 32)
+    monkeypatch.setattr(settings, "CHUNK_OVERLAP", 5)
+    monkeypatch.setattr(settings, "MIN_CHUNK_SIZE", 10)
+
+    chunker = TextChunker()
+    chunker._tokenizer = WordPieceTokenizer()
+    chunker._tokenizer_checked = True
+    chunker.max_tokens = 30
+    return chunker
+
+
+def clinical_text(sentences=40):
+    return " ".join(
+        f"Patient {i} presents with hypertension and tachycardia, treated with metoprolol."
+        for i in range(sentences)
+    )
+
+
+def test_token_chunks_fit_window(chunker):
+    text = clinical_text()
+    chunks = chunker.chunk_text(text, "token")
+    tokenizer = chunker._tokenizer
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert len(tokenizer._offsets(chunk["text"])) <= 30
+        assert text[chunk["start"]:chunk["end"]] == chunk["text"]
+
+
+def test_token_overlap(chunker):
+    chunks = chunker.chunk_text(clinical_text(), "sliding_window")
+
+    for previous, current in zip(chunks, chunks[1:]):
+        overlap = previous["metadata"]["token_end"] - current["metadata"]["token_start"]
+        assert 0 < overlap <= 5 + 30 // 8
+        assert current["start"] < previous["end"]
+
+
+def test_windows_end_on_word_boundaries(chunker):
+    text = clinical_text()
+    for chunk in chunker.chunk_text(text, "token")[:-1]:
+        assert chunk["end"] == len(text) or not text[chunk["end"]].isalnum()
+
+
+def test_paragraphs_sized_in_tokens(chunker):
+    short = "Vital signs stable, blood pressure 120/80 mmHg."
+    text = f"{short}\n\n{clinical_text(10)}\n\nx\n\n{short}"
+    chunks = chunker.chunk_text(text, "paragraph")
+
+    assert chunks[0]["text"] == short
+    assert chunks[-1]["text"] == short
+    assert any("sub_index" in c["metadata"] for c in chunks)
+    for chunk in chunks:
+        assert text[chunk["start"]:chunk["end"]] == chunk["text"]
+        assert chunk["metadata"]["token_count"] <= 30
+
+
+def test_chunk_texts_tokenizes_in_one_batch(chunker):
+    results = chunker.chunk_texts([clinical_text(5), clinical_text(8)], "token")
+
+    assert len(results) == 2
+    assert chunker._get_tokenizer().calls == 1
+
+
+def test_each_thread_tokenizes_with_its_own_copy(chunker):
+    tokenizers = []
+
+    def chunk():
+        chunker.chunk_text(clinical_text(5), "token")
+        tokenizers.append(chunker._get_tokenizer())
+
+    threads = [threading.Thread(target=chunk) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(tokenizer) for tokenizer in tokenizers}) == 2
+    assert all(tokenizer.calls == 1 for tokenizer in tokenizers)
+    assert chunker._tokenizer.calls == 0
+
+
+def test_word_fallback_without_tokenizer(monkeypatch):
+    monkeypatch.setattr(settings, "CHUNK_TOKEN_AWARE", False)
+    monkeypatch.setattr(settings, "CHUNK_SIZE", 20)
+    monkeypatch.setattr(settings, "CHUNK_OVERLAP", 5)
+
+    chunks = TextChunker().chunk_text(clinical_text(10), "sliding_window")
+
+    assert chunks
+    assert all(len(c["text"].split()) <= 20 for c in chunks)
+
+
+def paged_document(pages=12):
+    return [
+        "\n\n".join(clinical_text(3) for _ in range(4)) + "\n\n"
+        for _ in range(pages)
+    ]
+
+
+def test_streamed_pages_keep_document_offsets(chunker, monkeypatch):
+    monkeypatch.setattr(settings, "CHUNK_STREAM_BUFFER_CHARS", 2000)
+    pages = paged_document()
+    text = "".join(pages)
+
+    chunks = list(chunker.iter_chunks(pages, "paragraph"))
+
+    assert [c["index"] for c in chunks] == list(range(len(chunks)))
+    for chunk in chunks:
+        assert text[chunk["start"]:chunk["end"]] == chunk["text"]
+    assert [c["text"] for c in chunks] == [c["text"] for c in chunker.chunk_text(text, "paragraph")]
+
+
+def test_stream_buffer_stays_bounded(chunker, monkeypatch):
+    monkeypatch.setattr(settings, "CHUNK_STREAM_BUFFER_CHARS", 2000)
+    stream = StreamingChunker(chunker, "token")
+    page_size = max(len(page) for page in paged_document())
+
+    emitted = 0
+    for page in paged_document(30):
+        emitted += len(stream.feed(page))
+        assert len(stream.buffer) < 2000 + page_size
+
+    emitted += len(stream.finish())
+    assert emitted > 0
+    assert stream.buffer == ""
+
+
+def test_iter_batches():
+    assert list(iter_batches(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(iter_batches([], 3)) == []
+
+
+class TopicModel:
+    """Embeds each sentence as the one-hot vector of the topic word it mentions"""
+
+    topics = ["cardiac", "renal", "hepatic"]
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, sentences, **kwargs):
+        self.calls += 1
+        vectors = np.zeros((len(sentences), len(self.topics)), dtype=np.float32)
+        for row, sentence in enumerate(sentences):
+            vectors[row, next(i for i, t in enumerate(self.topics) if t in sentence)] = 1.0
+        return vectors
+
+
+def topic_text(sentences_per_topic=6):
+    return " ".join(
+        f"The {topic} workup for visit {i} was reviewed in detail."
+        for topic in TopicModel.topics
+        for i in range(sentences_per_topic)
+    )
+
+
+@pytest.fixture
+def topic_model(monkeypatch):
+    model = TopicModel()
+    monkeypatch.setattr(chunker_module, "get_embedding_model", lambda: model)
+    monkeypatch.setattr(settings, "SEMANTIC_BREAKPOINT_PERCENTILE", 80.0)
+    monkeypatch.setattr(settings, "SEMANTIC_MIN_CHUNK_TOKENS", 20)
+    return model
+
+
+def test_semantic_chunks_split_at_topic_shifts(chunker, topic_model, monkeypatch):
+    monkeypatch.setattr(chunker, "max_tokens", 400)
+    text = topic_text()
+
+    chunks = chunker.chunk_text(text, "semantic")
+
+    assert topic_model.calls == 1
+    assert len(chunks) == 3
+    for chunk, topic in zip(chunks, TopicModel.topics):
+        assert text[chunk["start"]:chunk["end"]] == chunk["text"]
+        assert chunk["text"].count(topic) == 6
+        assert chunk["strategy"] == "semantic"
+
+
+def test_semantic_chunks_respect_max_size(chunker, topic_model):
+    chunks = chunker.chunk_text(topic_text(), "semantic")
+
+    assert len(chunks) > 3
+    for chunk in chunks:
+        assert len(chunker._tokenizer._offsets(chunk["text"])) <= 30
+        assert sum(topic in chunk["text"] for topic in TopicModel.topics) == 1
+
+
+def test_semantic_min_size_without_tokenizer(topic_model, monkeypatch):
+    monkeypatch.setattr(settings, "CHUNK_TOKEN_AWARE", False)
+    monkeypatch.setattr(settings, "MIN_CHUNK_SIZE", 200)
+    monkeypatch.setattr(settings, "MAX_CHUNK_SIZE", 2000)
+
+    chunks = TextChunker().chunk_text(topic_text(2), "semantic")
+
+    assert chunks
+    assert all(len(c["text"]) >= 200 for c in chunks)
@@ -0,0 +1,203 @@
+"""
+Unit tests for the pipelined RabbitMQ consumer (no broker needed)
+"""
+
+import json
+import time
+import queue
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import consumer as consumer_module
+from app.embeddings import embedding_generator
+from app.services import indexing as indexing_module
+from app.config import settings
+from app.database import Base
+from app.models.document_chunk import DocumentChunk
+from app.services.chunker import TextChunker
+from app.services.faiss_manager import FAISSManager
+
+
+class FakeConnection:
+    """Runs thread-safe callbacks on the test thread, like pika's connection thread"""
+
+    def __init__(self):
+        self.callbacks = queue.Queue()
+
+    def add_callback_threadsafe(self, callback):
+        self.callbacks.put(callback)
+
+    def drain(self, until, timeout=10):
+        deadline = time.monotonic() + timeout
+        while not until() and time.monotonic() < deadline:
+            try:
+                self.callbacks.get(timeout=0.05)()
+            except queue.Empty:
+                pass
+
+
+class FakeChannel:
+    def __init__(self):
+        self.acked, self.nacked, self.published, self.routes = [], [], [], []
+
+    def basic_ack(self, delivery_tag):
+        self.acked.append(delivery_tag)
+
+    def basic_nack(self, delivery_tag, requeue=True):
+        self.nacked.append(delivery_tag)
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        self.published.append(json.loads(body))
+        self.routes.append((routing_key, properties.headers if properties else None))
+
+
+class FakeGenerator:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+        self.generation = 0
+
+    def generate_embeddings_batch(self, texts):
+        self.calls.append(len(texts))
+        if self.fail or any("poison" in text for text in texts):
+            raise RuntimeError("model unavailable")
+        return np.random.default_rng(0).random((len(texts), 8), dtype=np.float32)
+
+
+class FakeBM25:
+    added = []
+
+    def add_documents(self, texts, chunk_metadata):
+        FakeBM25.added.extend(chunk_metadata)
+
+
+@pytest.fixture
+def pipeline(monkeypatch, tmp_path):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(consumer_module, "SessionLocal", sessionmaker(bind=engine))
+    monkeypatch.setattr(settings, "CONSUMER_BATCH_WAIT_MS", 300)
+    monkeypatch.setattr(settings, "CONSUMER_EMBED_BATCH_CHUNKS", 1000)
+    monkeypatch.setattr(settings, "CHUNKING_STRATEGY", "paragraph")
+    monkeypatch.setattr(settings, "CHUNK_TOKEN_AWARE", False)
+    monkeypatch.setattr(settings, "MIN_CHUNK_SIZE", 10)
+    monkeypatch.setattr(settings, "FAISS_INDEX_PATH", str(tmp_path / "faiss"))
+
+    faiss_manager = FAISSManager(index_dir=str(tmp_path / "faiss"), dimension=8)
+    monkeypatch.setattr(consumer_module, "get_chunker", TextChunker)
+    generator = FakeGenerator()
+    monkeypatch.setattr(consumer_module, "get_embedding_generator", lambda: generator)
+    monkeypatch.setattr(embedding_generator, "_generation", 0)
+    monkeypatch.setattr(indexing_module, "get_faiss_manager", lambda: faiss_manager)
+    monkeypatch.setattr(indexing_module, "get_bm25_manager", FakeBM25)
+    monkeypatch.setattr(indexing_module, "get_patient_index", lambda: SimpleNamespace(record_document=lambda *args: None))
+
+    FakeBM25.added = []
+    consumer = consumer_module.RabbitMQConsumer()
+    consumer.faiss_manager = faiss_manager
+    consumer.connection = FakeConnection()
+    consumer.channel = FakeChannel()
+    consumer.start_stages()
+
+    yield consumer, engine
+
+    consumer.stop_stages()
+
+
+def deliver(consumer, tag, document_id, paragraphs, attempts=0):
+    body = json.dumps({
+        "event": "document_anonymized",
+        "data": {
+            "document_id": document_id,
+            "anonymized_text": "\n\n".join(paragraphs),
+            "metadata": {"patient_id": "p-" + document_id}
+        }
+    })
+    properties = SimpleNamespace(headers={"x-index-attempts": attempts} if attempts else None)
+    consumer.callback(consumer.channel, SimpleNamespace(delivery_tag=tag), properties, body)
+
+
+def test_messages_share_embedding_batch_and_ack_after_commit(pipeline):
+    consumer, engine = pipeline
+    for tag in range(1, 4):
+        deliver(consumer, tag, f"doc-{tag}", [f"Paragraph {i} of document {tag} about blood pressure." for i in range(tag)])
+
+    consumer.connection.drain(until=lambda: len(consumer.channel.acked) == 3)
+
+    assert sorted(consumer.channel.acked) == [1, 2, 3]
+    assert consumer.embedding_generator.calls == [6]
+    assert {m["data"]["document_id"] for m in consumer.channel.published} == {"doc-1", "doc-2", "doc-3"}
+
+    rows = sessionmaker(bind=engine)().query(DocumentChunk).all()
+    assert sorted(r.faiss_index_id for r in rows) == list(range(6))
+    assert consumer.faiss_manager.index.ntotal == 6
+    assert sorted(m["chunk_id"] for m in FakeBM25.added) == sorted(r.id for r in rows)
+    assert all(m["patient_id"] == "p-" + m["document_id"] for m in FakeBM25.added)
+
+
+def test_large_messages_are_embedded_and_written_in_index_batches(pipeline, monkeypatch):
+    consumer, engine = pipeline
+    monkeypatch.setattr(settings, "INDEX_BATCH_SIZE", 2)
+    deliver(consumer, 1, "doc-1", [f"Paragraph {i} about the heart rate trend." for i in range(5)])
+
+    consumer.connection.drain(until=lambda: consumer.channel.acked)
+
+    assert consumer.channel.acked == [1]
+    assert consumer.embedding_generator.calls == [2, 2, 1]
+    rows = sessionmaker(bind=engine)().query(DocumentChunk).all()
+    assert sorted(r.chunk_index for r in rows) == list(range(5))
+
+
+def test_failed_message_is_requeued_with_attempt_count(pipeline):
+    consumer, _ = pipeline
+    consumer.embedding_generator.fail = True
+    deliver(consumer, 7, "doc-7", ["A paragraph long enough to be a chunk."])
+
+    consumer.connection.drain(until=lambda: consumer.channel.acked)
+
+    assert consumer.channel.acked == [7]
+    assert consumer.channel.routes == [(settings.RABBITMQ_CONSUME_QUEUE, {"x-index-attempts": 1, "x-index-error": "model unavailable"})]
+    assert consumer.channel.published[0]["data"]["document_id"] == "doc-7"
+    assert consumer.faiss_manager.index.ntotal == 0
+
+
+def test_failed_message_is_dead_lettered_after_max_attempts(pipeline, monkeypatch):
+    consumer, _ = pipeline
+    monkeypatch.setattr(settings, "CONSUMER_MAX_ATTEMPTS", 3)
+    consumer.embedding_generator.fail = True
+    deliver(consumer, 7, "doc-7", ["A paragraph long enough to be a chunk."], attempts=2)
+
+    consumer.connection.drain(until=lambda: consumer.channel.acked)
+
+    assert consumer.channel.acked == [7]
+    assert consumer.channel.routes[0][0] == settings.RABBITMQ_DEAD_LETTER_QUEUE
+
+
+def test_failing_message_does_not_hold_back_its_batch(pipeline):
+    consumer, engine = pipeline
+    deliver(consumer, 1, "doc-1", ["A healthy paragraph about blood pressure."])
+    deliver(consumer, 2, "doc-2", ["A poison paragraph the model cannot embed."])
+    deliver(consumer, 3, "doc-3", ["Another healthy paragraph about glucose."])
+
+    consumer.connection.drain(until=lambda: len(consumer.channel.acked) == 3)
+
+    assert sorted(consumer.channel.acked) == [1, 2, 3]
+    indexed = {m["data"]["document_id"] for m in consumer.channel.published if m["event"] == "document_indexed"}
+    assert indexed == {"doc-1", "doc-3"}
+    assert (settings.RABBITMQ_CONSUME_QUEUE, {"x-index-attempts": 1, "x-index-error": "model unavailable"}) in consumer.channel.routes
+    rows = sessionmaker(bind=engine)().query(DocumentChunk).all()
+    assert {r.document_id for r in rows} == {"doc-1", "doc-3"}
+
+
+def test_unknown_and_undecodable_messages(pipeline):
+    consumer, _ = pipeline
+    consumer.callback(consumer.channel, SimpleNamespace(delivery_tag=1), None, json.dumps({"event": "other"}))
+    consumer.callback(consumer.channel, SimpleNamespace(delivery_tag=2), None, b"not json")
+
+    assert consumer.channel.acked == [1]
+    assert consumer.channel.nacked == [2]
@@ -0,0 +1,216 @@
+"""
+Unit tests for background re-embedding into a shadow index
+"""
+
+import os
+import pytest
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.config import settings
+from app.database import Base
+from app.models.document_chunk import DocumentChunk
+from app.embeddings import providers, embedding_generator, projection
+from app.services import faiss_manager as faiss_manager_module
+from app.services import embedding_migration as migration_module
+from app.services.embedding_migration import EmbeddingMigration
+from app.services.faiss_manager import get_faiss_manager
+
+
+class HashModel:
+    """Deterministic model of a fixed dimension"""
+
+    def __init__(self, dimension, on_encode=None):
+        self.dimension = dimension
+        self.on_encode = on_encode
+
+    def get_sentence_embedding_dimension(self):
+        return self.dimension
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, normalize_embeddings=False, show_progress_bar=False):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if self.on_encode:
+            self.on_encode()
+        vectors = np.array(
+            [[(hash(t) >> (8 * i)) % 97 + 1.0 for i in range(self.dimension)] for t in texts],
+            dtype=np.float32
+        )
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors[0] if single else vectors
+
+
+@pytest.fixture
+def session_factory(monkeypatch, tmp_path):
+    """In-memory database, isolated FAISS directory and test providers"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    monkeypatch.setattr(migration_module, "SessionLocal", factory)
+    monkeypatch.setattr(settings, "FAISS_INDEX_PATH", str(tmp_path / "faiss"))
+    monkeypatch.setattr(settings, "EMBEDDING_PROVIDER", "test-old")
+    monkeypatch.setattr(settings, "EMBEDDING_MODEL", "old-model")
+    monkeypatch.setattr(settings, "EMBEDDING_DIMENSION", 3)
+    monkeypatch.setitem(providers._PROVIDERS, "test-old", lambda name: HashModel(3))
+    monkeypatch.setitem(providers._PROVIDERS, "test-new", lambda name: HashModel(4))
+    monkeypatch.setattr(providers, "_model", None)
+    monkeypatch.setattr(embedding_generator, "_generator", None)
+    monkeypatch.setattr(faiss_manager_module, "_manager", None)
+    monkeypatch.setattr(embedding_generator, "_generation", 0)
+    monkeypatch.setattr(migration_module, "_active_version", None)
+    projection.reset_projection()
+
+    yield factory
+
+    projection.reset_projection()
+
+
+def index_chunks(db, texts):
+    """Index chunks the way /index does, with the live model"""
+    generator = embedding_generator.get_embedding_generator()
+    manager = get_faiss_manager()
+
+    rows = []
+    for i, text in enumerate(texts):
+        row = DocumentChunk(
+            document_id="doc-1",
+            chunk_index=i,
+            chunk_text=text,
+            chunking_strategy="paragraph",
+            embedding_model=settings.EMBEDDING_MODEL
+        )
+        db.add(row)
+        db.flush()
+        rows.append(row)
+
+    metadata = [{"chunk_id": str(r.id), "document_id": r.document_id, "chunk_index": r.chunk_index, "chunk_text": r.chunk_text} for r in rows]
+    faiss_ids = manager.add_vectors(generator.generate_embeddings_batch(texts), metadata)
+    for row, faiss_id in zip(rows, faiss_ids):
+        row.faiss_index_id = faiss_id
+    db.commit()
+
+
+def test_migration_and_cutover(session_factory):
+    db = session_factory()
+    index_chunks(db, [f"chunk {i}" for i in range(7)])
+
+    migration = EmbeddingMigration("new-model", "test-new", batch_size=3)
+    migration.start()
+    migration._thread.join(timeout=30)
+
+    assert migration.state["status"] == "ready"
+    assert migration.state["processed"] == 7
+    assert get_faiss_manager().index.d == 3  # Still serving the old index
+
+    # Indexed after the background pass; picked up at cutover
+    index_chunks(db, ["late chunk"])
+    status = migration.cutover(db)
+
+    live = get_faiss_manager()
+    assert status["status"] == "cut_over"
+    assert live.index.d == 4
+    assert live.index.ntotal == 8
+    assert settings.EMBEDDING_MODEL == "new-model"
+    assert embedding_generator.get_embedding_generator().dimension == 4
+    assert os.path.exists(os.path.join(settings.FAISS_INDEX_PATH, providers.ACTIVE_MODEL_FILENAME))
+
+    rows = db.query(DocumentChunk).all()
+    assert {r.embedding_model for r in rows} == {"new-model"}
+    for row in rows:
+        assert live.id_to_chunk[row.faiss_index_id]["chunk_id"] == row.id
+
+    query = embedding_generator.get_embedding_generator().generate_embedding("late chunk")
+    assert live.search(query, top_k=1)[0]["chunk_text"] == "late chunk"
+
+
+def test_cutover_drops_state_tied_to_the_old_model(session_factory, monkeypatch):
+    from app.services import chunker as chunker_module
+
+    closed = []
+    monkeypatch.setattr(migration_module, "close_embedding_worker_pool", lambda: closed.append(True))
+    old_chunker = chunker_module.get_chunker()
+
+    db = session_factory()
+    index_chunks(db, ["chunk 0"])
+    migration = EmbeddingMigration("new-model", "test-new")
+    migration.start()
+    migration._thread.join(timeout=30)
+    migration.cutover(db)
+
+    assert closed == [True]
+    assert chunker_module.get_chunker() is not old_chunker
+
+
+def test_failed_row_update_restores_the_live_index(session_factory, monkeypatch):
+    db = session_factory()
+    index_chunks(db, ["chunk 0", "chunk 1"])
+    migration = EmbeddingMigration("new-model", "test-new")
+    migration.start()
+    migration._thread.join(timeout=30)
+
+    def failing_commit():
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(db, "commit", failing_commit)
+    with pytest.raises(RuntimeError):
+        migration.cutover(db)
+
+    live_dir = settings.FAISS_INDEX_PATH
+    assert not os.path.exists(os.path.join(live_dir, providers.ACTIVE_MODEL_FILENAME))
+    assert not any(name.endswith(".cutover") for name in os.listdir(live_dir))
+    assert faiss_manager_module.FAISSManager().index.d == 3
+    assert settings.EMBEDDING_MODEL == "old-model"
+    assert migration.state["status"] == "ready"
+    assert {r.embedding_model for r in session_factory().query(DocumentChunk)} == {"old-model"}
+
+
+def test_other_process_follows_the_cutover(session_factory):
+    db = session_factory()
+    index_chunks(db, ["chunk 0"])
+    generation = embedding_generator.get_model_generation()
+
+    assert not migration_module.follow_active_model()
+
+    # The API process cut the live index over to the new model
+    providers.write_active_model_config(settings.FAISS_INDEX_PATH, "test-new", "new-model")
+
+    assert migration_module.follow_active_model()
+    assert settings.EMBEDDING_MODEL == "new-model"
+    assert embedding_generator.get_embedding_generator().dimension == 4
+    assert embedding_generator.get_model_generation() == generation + 1
+    assert not migration_module.follow_active_model()
+
+
+def test_migration_resumes_from_checkpoint(session_factory, monkeypatch):
+    monkeypatch.setattr(settings, "MIGRATION_CHECKPOINT_BATCHES", 1)
+    db = session_factory()
+    index_chunks(db, [f"chunk {i}" for i in range(5)])
+
+    first = EmbeddingMigration("new-model", "test-new", batch_size=2)
+    first._ensure_loaded()
+    first.model.on_encode = first._stop.set  # Stop after the first batch
+    first.run_pending(db, stop=first._stop)
+
+    assert first.state["processed"] == 2
+
+    resumed = EmbeddingMigration("new-model", "test-new", batch_size=2)
+    resumed.run_pending(db)
+
+    chunk_ids = [meta["chunk_id"] for meta in resumed.shadow.id_to_chunk.values()]
+    assert resumed.state["processed"] == 5
+    assert len(chunk_ids) == len(set(chunk_ids)) == 5
+
+
+def test_cutover_requires_ready(session_factory):
+    db = session_factory()
+    migration = EmbeddingMigration("new-model", "test-new")
+
+    with pytest.raises(ValueError):
+        migration.cutover(db)
@@ -0,0 +1,96 @@
+"""
+Unit tests for the embedding provider registry and the Ollama backend
+"""
+
+import json
+import httpx
+import pytest
+import numpy as np
+from app.embeddings import providers
+from app.embeddings.providers import (
+    OllamaEmbeddingModel,
+    register_provider,
+    available_providers,
+    get_embedding_model,
+    close_embedding_model
+)
+from app.config import settings
+
+
+def make_ollama_model(handler):
+    """Ollama model whose HTTP client is served by an in-process handler"""
+    model = OllamaEmbeddingModel("test-embed")
+    model.client.close()
+    model.client = httpx.Client(base_url=model.base_url, transport=httpx.MockTransport(handler))
+    return model
+
+
+class TestProviderRegistry:
+    """Test provider registration and the shared model"""
+
+    def setup_method(self):
+        close_embedding_model()
+
+    def teardown_method(self):
+        close_embedding_model()
+
+    def test_builtin_providers_registered(self):
+        assert {"sentence-transformers", "onnx", "ollama"} <= set(available_providers())
+
+    def test_shared_model_loaded_once(self, monkeypatch):
+        loads = []
+
+        @register_provider("test-provider")
+        def _load(model_name):
+            loads.append(model_name)
+            return object()
+
+        monkeypatch.setattr(settings, "EMBEDDING_PROVIDER", "test-provider")
+        first = get_embedding_model()
+        second = get_embedding_model()
+
+        assert first is second
+        assert loads == [settings.EMBEDDING_MODEL]
+        providers._PROVIDERS.pop("test-provider")
+
+    def test_unknown_provider_rejected(self, monkeypatch):
+        monkeypatch.setattr(settings, "EMBEDDING_PROVIDER", "does-not-exist")
+        with pytest.raises(ValueError):
+            get_embedding_model()
+
+
+class TestOllamaEmbeddingModel:
+    """Test batched Ollama embeddings"""
+
+    def test_batches_through_embed_endpoint(self):
+        requests = []
+
+        def handler(request):
+            body = json.loads(request.content)
+            requests.append(body["input"])
+            return httpx.Response(200, json={"embeddings": [[3.0, 4.0] for _ in body["input"]]})
+
+        model = make_ollama_model(handler)
+        embeddings = model.encode([f"text {i}" for i in range(5)], batch_size=2, normalize_embeddings=True)
+        model.close()
+
+        assert sorted(len(batch) for batch in requests) == [1, 2, 2]
+        assert embeddings.shape == (5, 2)
+        np.testing.assert_allclose(embeddings[0], [0.6, 0.8], rtol=1e-6)
+
+    def test_falls_back_to_legacy_endpoint(self):
+        def handler(request):
+            if request.url.path == "/api/embed":
+                return httpx.Response(404)
+            prompt = json.loads(request.content)["prompt"]
+            return httpx.Response(200, json={"embedding": [float(len(prompt)), 1.0]})
+
+        model = make_ollama_model(handler)
+        embeddings = model.encode(["a", "abc"])
+        single = model.encode("ab")
+        dimension = model.get_sentence_embedding_dimension()
+        model.close()
+
+        np.testing.assert_allclose(embeddings, [[1.0, 1.0], [3.0, 1.0]])
+        assert single.shape == (2,)
+        assert dimension == 2
@@ -0,0 +1,170 @@
+"""
+Unit tests for the shared indexing pipeline
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.database import Base
+from app.models.document_chunk import DocumentChunk, ParentChunk
+from app.embeddings import embedding_generator
+from app.services import indexing as indexing_module
+from app.services.chunker import TextChunker
+from app.services.faiss_manager import FAISSManager
+from app.services.indexing import DocumentIndexer
+
+
+class RecordingBM25:
+    def __init__(self):
+        self.calls = []
+
+    def add_documents(self, texts, chunk_metadata):
+        self.calls.append(list(chunk_metadata))
+
+
+class CountingGenerator:
+    def __init__(self):
+        self.batches = []
+        self.generation = 0
+
+    def generate_embeddings_batch(self, texts):
+        self.batches.append(len(texts))
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+@pytest.fixture
+def stores(monkeypatch, tmp_path):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    faiss_manager = FAISSManager(index_dir=str(tmp_path / "faiss"), dimension=4)
+    bm25 = RecordingBM25()
+    generator = CountingGenerator()
+    recorded = []
+
+    monkeypatch.setattr(settings, "INDEX_BATCH_SIZE", 4)
+    monkeypatch.setattr(settings, "FAISS_INDEX_PATH", str(tmp_path / "faiss"))
+    monkeypatch.setattr(embedding_generator, "_generation", 0)
+    monkeypatch.setattr(indexing_module, "get_faiss_manager", lambda: faiss_manager)
+    monkeypatch.setattr(indexing_module, "get_bm25_manager", lambda: bm25)
+    monkeypatch.setattr(indexing_module, "get_embedding_generator", lambda: generator)
+    monkeypatch.setattr(
+        indexing_module,
+        "get_patient_index",
+        lambda: SimpleNamespace(record_document=lambda *args: recorded.append(args))
+    )
+
+    return SimpleNamespace(
+        db=sessionmaker(bind=engine)(),
+        faiss=faiss_manager,
+        bm25=bm25,
+        generator=generator,
+        recorded=recorded
+    )
+
+
+def chunks(n):
+    return [{"index": i, "text": f"chunk {i}", "start": i * 10, "end": i * 10 + 7} for i in range(n)]
+
+
+def test_sql_faiss_and_bm25_receive_the_same_chunks(stores):
+    indexer = DocumentIndexer(stores.db)
+    indexer.add(chunks(3), "doc-a", "paragraph", {"patient_id": "p1"})
+    indexer.add(chunks(6), "doc-b", "paragraph", {"patient_id": "p2"})
+    documents = indexer.finish()
+
+    assert stores.generator.batches == [4, 4, 1]  # Batches span documents
+    assert documents["doc-a"]["faiss_ids"] == [0, 1, 2]
+    assert documents["doc-b"]["faiss_ids"] == list(range(3, 9))
+
+    rows = {row.id: row for row in stores.db.query(DocumentChunk)}
+    (bm25_metadata,) = stores.bm25.calls
+    assert len(rows) == len(bm25_metadata) == stores.faiss.index.ntotal == 9
+    for meta in bm25_metadata:
+        row = rows[meta["chunk_id"]]
+        assert stores.faiss.id_to_chunk[row.faiss_index_id] == meta
+        assert meta["patient_id"] == {"doc-a": "p1", "doc-b": "p2"}[row.document_id]
+
+    assert [args[:2] for args in stores.recorded] == [("doc-a", 3), ("doc-b", 6)]
+
+
+def test_write_batch_takes_precomputed_embeddings(stores):
+    indexer = DocumentIndexer(stores.db)
+    document = indexer.track_document("doc-a", "token", {})
+    indexer.write_batch([(document, chunk) for chunk in chunks(2)], np.zeros((2, 4), dtype=np.float32))
+    indexer.finish()
+
+    assert stores.generator.batches == []
+    assert stores.db.query(DocumentChunk).count() == 2
+
+
+def test_hierarchical_children_link_to_parents(stores, monkeypatch):
+    monkeypatch.setattr(settings, "CHUNK_TOKEN_AWARE", False)
+    monkeypatch.setattr(indexing_module, "get_chunker", TextChunker)
+    monkeypatch.setattr(settings, "MIN_CHUNK_SIZE", 10)
+
+    paragraph = "Blood pressure was measured twice and remained elevated."
+    text = f"HISTORY: {paragraph}\n\n{paragraph}\n\nPLAN: {paragraph}"
+
+    indexer = DocumentIndexer(stores.db)
+    indexer.add_hierarchical(text, "doc-a", "paragraph")
+    indexer.finish()
+
+    parents = stores.db.query(ParentChunk).order_by(ParentChunk.parent_index).all()
+    (bm25_metadata,) = stores.bm25.calls
+    assert len(parents) == 2
+    for parent in parents:
+        children = [m for m in bm25_metadata if m["parent_id"] == parent.id]
+        assert [m["chunk_index"] for m in children] == list(range(parent.child_start, parent.child_end))
+
+
+def test_failed_commit_leaves_no_faiss_vectors(stores, monkeypatch):
+    indexer = DocumentIndexer(stores.db)
+    indexer.add(chunks(6), "doc-a", "paragraph")
+
+    def fail():
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(stores.db, "commit", fail)
+    with pytest.raises(RuntimeError):
+        indexer.finish()
+
+    assert stores.faiss.index.ntotal == 0
+    assert stores.faiss.next_id == 0
+    assert stores.faiss.id_to_chunk == {}
+
+
+def test_rows_are_renumbered_past_concurrent_faiss_writes(stores):
+    indexer = DocumentIndexer(stores.db)
+    indexer.add(chunks(3), "doc-a", "paragraph")
+    indexer._index_pending()  # Rows written, vectors staged
+
+    # Another writer adds vectors before this run commits
+    stores.faiss.add_vectors(np.zeros((2, 4), dtype=np.float32), [{}, {}], save=False)
+    documents = indexer.finish()
+
+    assert documents["doc-a"]["faiss_ids"] == [2, 3, 4]
+    rows = stores.db.query(DocumentChunk).order_by(DocumentChunk.chunk_index).all()
+    assert [row.faiss_index_id for row in rows] == [2, 3, 4]
+    for row in rows:
+        assert stores.faiss.id_to_chunk[row.faiss_index_id]["chunk_id"] == row.id
+
+
+def test_vectors_are_reembedded_when_the_model_changes_before_commit(stores, monkeypatch):
+    indexer = DocumentIndexer(stores.db)
+    indexer.add(chunks(3), "doc-a", "paragraph")
+    indexer._index_pending()  # Embedded with the old model
+
+    # A cutover swaps the model before this run commits
+    monkeypatch.setattr(embedding_generator, "_generation", 1)
+    monkeypatch.setattr(settings, "EMBEDDING_MODEL", "new-model")
+    stores.generator.generation = 1
+    indexer.finish()
+
+    assert stores.generator.batches == [3, 3]
+    assert stores.faiss.index.ntotal == 3
+    assert {row.embedding_model for row in stores.db.query(DocumentChunk)} == {"new-model"}
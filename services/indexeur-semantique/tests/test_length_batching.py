@@ -0,0 +1,70 @@
+"""
+Unit tests for length-bucketed embedding batching
+"""
+
+import numpy as np
+from app.embeddings.length_batching import (
+    token_lengths,
+    plan_batches,
+    padding_efficiency,
+    encode_length_bucketed
+)
+
+
+class WordModel:
+    """Model without a tokenizer that records the batches it receives"""
+
+    def __init__(self):
+        self.batches = []
+
+    def get_sentence_embedding_dimension(self):
+        return 2
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=False):
+        self.batches.append(list(texts))
+        vectors = np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+        if normalize_embeddings:
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors
+
+
+def test_plan_batches_respects_budget():
+    lengths = [10, 200, 12, 180, 11, 190, 9, 8]
+    batches = plan_batches(lengths, token_budget=400)
+
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    for batch in batches:
+        assert len(batch) * max(lengths[i] for i in batch) <= 400 or len(batch) == 1
+
+
+def test_plan_batches_groups_similar_lengths():
+    lengths = [10, 200, 12, 180, 11, 190, 9, 8]
+    batches = plan_batches(lengths, token_budget=400)
+
+    assert padding_efficiency(lengths, batches) > padding_efficiency(lengths, [list(range(8))])
+    assert {1, 3} <= set(batches[0]) or {1, 5} <= set(batches[0])
+
+
+def test_plan_batches_max_batch_size():
+    batches = plan_batches([5] * 10, token_budget=1000, max_batch_size=4)
+    assert [len(b) for b in batches] == [4, 4, 2]
+
+
+def test_encode_restores_input_order():
+    texts = ["a" * n for n in (40, 4, 400, 8, 120, 4)]
+    model = WordModel()
+
+    embeddings = encode_length_bucketed(model, texts, token_budget=64)
+
+    expected = WordModel().encode(texts, normalize_embeddings=True)
+    np.testing.assert_allclose(embeddings, expected, rtol=1e-6)
+    assert len(model.batches) > 1
+    assert model.batches[0][0] == "a" * 400
+
+
+def test_token_length_estimate_without_tokenizer():
+    assert token_lengths(WordModel(), ["", "a" * 40]) == [2, 12]
+
+
+def test_encode_empty():
+    assert encode_length_bucketed(WordModel(), []).shape == (0, 2)
@@ -0,0 +1,156 @@
+"""
+Unit tests for query embedding micro-batching
+"""
+
+import asyncio
+import threading
+import pytest
+import numpy as np
+from app.embeddings.micro_batcher import EmbeddingMicroBatcher
+from app.config import settings
+
+
+class RecordingGenerator:
+    """Deterministic embedding generator that records batch sizes"""
+
+    def __init__(self):
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def truncate(self, text):
+        return text
+
+    def generate_embedding(self, text):
+        return self.generate_embeddings_batch([text])[0]
+
+    def generate_embeddings_batch(self, texts):
+        with self.lock:
+            self.batches.append(len(texts))
+        return np.array([[float(len(t)), 1.0] for t in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def batcher_settings(monkeypatch):
+    """Generous window so concurrent test requests share a batch"""
+    monkeypatch.setattr(settings, 'EMBEDDING_MICROBATCH_ENABLED', True)
+    monkeypatch.setattr(settings, 'EMBEDDING_MICROBATCH_WAIT_MS', 50.0)
+    monkeypatch.setattr(settings, 'EMBEDDING_MICROBATCH_MAX_SIZE', 4)
+
+
+def test_concurrent_requests_share_a_batch(batcher_settings):
+    """Test that concurrent callers are served by one batched encode"""
+    generator = RecordingGenerator()
+    batcher = EmbeddingMicroBatcher(generator=generator)
+
+    async def run():
+        try:
+            return await asyncio.gather(*(batcher.embed("x" * n) for n in (1, 2, 3)))
+        finally:
+            await batcher.stop()
+
+    results = asyncio.run(run())
+
+    assert generator.batches == [3]
+    # Each caller gets its own vector back, in order
+    assert [r[0] for r in results] == [1.0, 2.0, 3.0]
+
+
+def test_max_batch_size_is_respected(batcher_settings):
+    """Test that batches never exceed the configured maximum"""
+    generator = RecordingGenerator()
+    batcher = EmbeddingMicroBatcher(generator=generator)
+
+    async def run():
+        try:
+            return await asyncio.gather(*(batcher.embed(f"query {i}") for i in range(10)))
+        finally:
+            await batcher.stop()
+
+    results = asyncio.run(run())
+
+    assert len(results) == 10
+    assert max(generator.batches) <= 4
+    assert sum(generator.batches) == 10
+
+
+def test_errors_propagate_to_callers(batcher_settings):
+    """Test that a failed encode fails every caller in the batch"""
+
+    class FailingGenerator(RecordingGenerator):
+        def generate_embeddings_batch(self, texts):
+            raise RuntimeError("model unavailable")
+
+    batcher = EmbeddingMicroBatcher(generator=FailingGenerator())
+
+    async def run():
+        try:
+            return await asyncio.gather(
+                batcher.embed("a"), batcher.embed("b"), return_exceptions=True
+            )
+        finally:
+            await batcher.stop()
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_batcher_survives_a_generator_that_fails_before_encoding(batcher_settings):
+    """Test that a failure resolving or truncating fails the batch and keeps batching"""
+
+    class TruncateFailsOnce(RecordingGenerator):
+        failed = False
+
+        def truncate(self, text):
+            if not self.failed:
+                self.failed = True
+                raise RuntimeError("tokenizer unavailable")
+            return text
+
+    batcher = EmbeddingMicroBatcher(generator=TruncateFailsOnce())
+
+    async def run():
+        try:
+            first = await asyncio.gather(batcher.embed("a"), return_exceptions=True)
+            second = await asyncio.wait_for(batcher.embed("bb"), timeout=5)
+            return first, second
+        finally:
+            await batcher.stop()
+
+    (first,), second = asyncio.run(run())
+
+    assert isinstance(first, RuntimeError)
+    assert second.tolist() == [2.0, 1.0]
+
+
+def test_disabled_batcher_embeds_directly(batcher_settings, monkeypatch):
+    """Test that disabling micro-batching calls the generator inline"""
+    monkeypatch.setattr(settings, 'EMBEDDING_MICROBATCH_ENABLED', False)
+    generator = RecordingGenerator()
+    batcher = EmbeddingMicroBatcher(generator=generator)
+
+    result = asyncio.run(batcher.embed("abc"))
+
+    assert result[0] == 3.0
+    assert batcher.get_stats()["batches_total"] == 0
+
+
+def test_stats(batcher_settings):
+    """Test queueing metrics"""
+    generator = RecordingGenerator()
+    batcher = EmbeddingMicroBatcher(generator=generator)
+
+    async def run():
+        try:
+            await asyncio.gather(*(batcher.embed("q") for _ in range(3)))
+        finally:
+            await batcher.stop()
+
+    asyncio.run(run())
+    stats = batcher.get_stats()
+
+    assert stats["requests_total"] == 3
+    assert stats["batches_total"] == 1
+    assert stats["avg_batch_size"] == 3
+    assert stats["batch_size_counts"] == {3: 1}
+    assert stats["queue_wait_p95_ms"] is not None
@@ -0,0 +1,98 @@
+"""
+Unit tests for parent/child (small-to-big) retrieval
+"""
+
+import asyncio
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.database import Base
+from app.models.document_chunk import ParentChunk
+from app.services.chunker import TextChunker
+from app.services.parent_chunks import collapse_to_parents
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def add_parent(db, parent_id, text, index=0):
+    db.add(ParentChunk(
+        id=parent_id,
+        document_id="doc-1",
+        parent_index=index,
+        parent_text=text,
+        child_start=0,
+        child_end=3
+    ))
+    db.commit()
+
+
+def hit(chunk_id, parent_id=None, score=1.0):
+    result = {"chunk_id": chunk_id, "document_id": "doc-1", "chunk_text": f"child {chunk_id}", "similarity": score}
+    if parent_id:
+        result["parent_id"] = parent_id
+    return result
+
+
+def test_children_collapse_to_deduplicated_parents(db):
+    add_parent(db, "p1", "Parent one full section")
+    add_parent(db, "p2", "Parent two full section", index=1)
+
+    results = [hit("c1", "p1", 0.9), hit("c2", "p2", 0.8), hit("c3", "p1", 0.7), hit("c4", score=0.6)]
+    collapsed = collapse_to_parents(results, db, top_k=10)
+
+    assert [r["chunk_id"] for r in collapsed] == ["c1", "c2", "c4"]
+    assert collapsed[0]["chunk_text"] == "Parent one full section"
+    assert collapsed[0]["metadata"]["matched_chunk_text"] == "child c1"
+    assert collapsed[0]["metadata"]["matched_chunks"] == 2
+    assert collapsed[2]["chunk_text"] == "child c4"
+
+
+def test_top_k_counts_parents(db):
+    add_parent(db, "p1", "Parent one")
+
+    results = [hit("c1", "p1"), hit("c2", "p1"), hit("c3"), hit("c4")]
+
+    assert [r["chunk_id"] for r in collapse_to_parents(results, db, top_k=2)] == ["c1", "c3"]
+
+
+def test_parents_follow_sections_and_size_cap(monkeypatch):
+    monkeypatch.setattr(settings, "CHUNK_TOKEN_AWARE", False)
+    monkeypatch.setattr(settings, "MIN_CHUNK_SIZE", 10)
+    monkeypatch.setattr(settings, "PARENT_CHUNK_MAX_SIZE", 300)
+
+    paragraph = "Blood pressure was measured twice and remained elevated during the visit."
+    text = (
+        "HISTORY: " + paragraph + "\n\n"
+        "TREATMENT: " + "\n\n".join([paragraph] * 8)
+    )
+    parents = TextChunker().chunk_parents(text)
+
+    assert parents[0]["header"].strip() == "HISTORY:"
+    assert len(parents) > 2
+    assert all(len(p["text"]) <= 300 for p in parents)
+    assert [p["index"] for p in parents] == list(range(len(parents)))
+
+
+def test_delete_document_removes_parent_sections(db, monkeypatch):
+    from app.api import search as search_api
+
+    class NoIndex:
+        def delete_by_document_id(self, document_id):
+            return 0
+
+    monkeypatch.setattr(search_api, "get_bm25_manager", NoIndex)
+    monkeypatch.setattr(search_api, "get_patient_index", NoIndex)
+    add_parent(db, "p1", "Parent one full section")
+
+    asyncio.run(search_api.delete_document("doc-1", db))
+
+    assert db.query(ParentChunk).count() == 0
@@ -0,0 +1,184 @@
+"""
+Unit tests for the patient aggregate index
+"""
+
+import pytest
+import tempfile
+import threading
+from app.services import faiss_manager as faiss_manager_module
+from app.services.patient_index import PatientIndex
+from app.config import settings
+
+
+@pytest.fixture
+def temp_index_path(monkeypatch):
+    """Create temporary directories for patient and FAISS indices"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        monkeypatch.setattr(settings, 'PATIENT_INDEX_PATH', f"{tmpdir}/patients")
+        monkeypatch.setattr(settings, 'FAISS_INDEX_PATH', f"{tmpdir}/faiss")
+        monkeypatch.setattr(faiss_manager_module, '_manager', None)
+        yield tmpdir
+
+
+@pytest.fixture
+def patient_index(temp_index_path):
+    """Create patient index instance"""
+    return PatientIndex()
+
+
+def test_record_document(patient_index):
+    """Test that indexing a document updates the patient aggregate"""
+    patient_index.record_document("doc1", 4, {
+        "patient_id": "PAT001",
+        "patient_name": "Ahmed Benali",
+        "document_type": "lab_report"
+    })
+    patient_index.record_document("doc2", 2, {"patient_id": "PAT001", "document_type": "discharge"})
+
+    total, patients = patient_index.get_patients()
+
+    assert total == 1
+    patient = patients[0]
+    assert patient["id"] == "PAT001"
+    assert patient["name"] == "Ahmed Benali"
+    assert patient["document_count"] == 2
+    assert patient["chunk_count"] == 6
+    assert patient["document_types"] == ["discharge", "lab_report"]
+    assert patient["last_indexed_at"] is not None
+
+
+def test_document_without_patient_is_ignored(patient_index):
+    """Test that documents without a patient_id are not aggregated"""
+    patient_index.record_document("doc1", 3, {"document_type": "note"})
+
+    total, patients = patient_index.get_patients()
+
+    assert total == 0
+    assert patients == []
+
+
+def test_reindex_replaces_previous_counts(patient_index):
+    """Test that re-indexing a document does not double count it"""
+    patient_index.record_document("doc1", 4, {"patient_id": "PAT001"})
+    patient_index.record_document("doc1", 6, {"patient_id": "PAT001"})
+
+    _, patients = patient_index.get_patients()
+
+    assert patients[0]["document_count"] == 1
+    assert patients[0]["chunk_count"] == 6
+
+
+def test_delete_by_document_id(patient_index):
+    """Test that deleting documents updates and eventually drops the patient"""
+    patient_index.record_document("doc1", 4, {"patient_id": "PAT001", "document_type": "lab_report"})
+    patient_index.record_document("doc2", 2, {"patient_id": "PAT001", "document_type": "discharge"})
+
+    patient_index.delete_by_document_id("doc1")
+    _, patients = patient_index.get_patients()
+
+    assert patients[0]["document_count"] == 1
+    assert patients[0]["chunk_count"] == 2
+    assert patients[0]["document_types"] == ["discharge"]
+
+    patient_index.delete_by_document_id("doc2")
+    total, _ = patient_index.get_patients()
+
+    assert total == 0
+
+
+def test_pagination(patient_index):
+    """Test paginated patient listing"""
+    for i in range(5):
+        patient_index.record_document(f"doc{i}", 1, {"patient_id": f"PAT00{i}"})
+
+    total, first_page = patient_index.get_patients(offset=0, limit=2)
+    _, last_page = patient_index.get_patients(offset=4, limit=2)
+
+    assert total == 5
+    assert len(first_page) == 2
+    assert len(last_page) == 1
+
+
+def test_index_persistence(temp_index_path):
+    """Test that the aggregate survives a reload"""
+    index1 = PatientIndex()
+    index1.record_document("doc1", 3, {"patient_id": "PAT001"})
+
+    index2 = PatientIndex()
+    total, patients = index2.get_patients()
+
+    assert total == 1
+    assert patients[0]["chunk_count"] == 3
+
+
+def test_bootstrap_from_faiss_metadata(temp_index_path):
+    """Test that a fresh aggregate is seeded from existing FAISS metadata"""
+    faiss_manager = faiss_manager_module.get_faiss_manager()
+    faiss_manager.id_to_chunk = {
+        0: {"chunk_id": "c0", "document_id": "doc1", "patient_id": "PAT001"},
+        1: {"chunk_id": "c1", "document_id": "doc1", "patient_id": "PAT001"},
+        2: {"chunk_id": "c2", "document_id": "doc2", "patient_id": "PAT002"},
+        3: {"chunk_id": "c3", "document_id": "doc3"},
+    }
+
+    index = PatientIndex()
+    total, patients = index.get_patients()
+
+    assert total == 2
+    by_id = {p["id"]: p for p in patients}
+    assert by_id["PAT001"]["chunk_count"] == 2
+    assert by_id["PAT002"]["document_count"] == 1
+
+
+def test_write_keeps_documents_saved_by_other_process(temp_index_path):
+    """Test that two processes recording documents do not overwrite each other"""
+    api = PatientIndex()
+    consumer = PatientIndex()
+
+    api.record_document("doc1", 1, {"patient_id": "PAT001"})
+    consumer.record_document("doc2", 1, {"patient_id": "PAT002"})
+
+    assert sorted(PatientIndex().documents) == ["doc1", "doc2"]
+
+
+def test_reads_see_documents_saved_by_other_process(temp_index_path):
+    """Test that listing patients picks up another process's writes"""
+    api = PatientIndex()
+    consumer = PatientIndex()
+
+    consumer.record_document("doc1", 3, {"patient_id": "PAT001"})
+
+    assert api.get_patients() == (0, [])  # Served from the loaded aggregate while it reloads
+    api.reloader.join(timeout=5)
+
+    total, patients = api.get_patients()
+    assert total == 1
+    assert patients[0]["chunk_count"] == 3
+    assert api.get_stats()["total_documents"] == 1
+
+
+def test_listing_does_not_wait_for_the_file_lock(temp_index_path):
+    """Test that listing patients is not blocked by another process's write"""
+    api = PatientIndex()
+    consumer = PatientIndex()
+    consumer.record_document("doc1", 3, {"patient_id": "PAT001"})
+
+    with consumer.writing():
+        lister = threading.Thread(target=api.get_patients)
+        lister.start()
+        lister.join(timeout=2)
+        assert not lister.is_alive()
+
+    api.reloader.join(timeout=5)
+    assert api.get_patients()[0] == 1
+
+
+def test_non_numeric_age_is_dropped(patient_index):
+    """Test that a malformed patient_age does not break the listing"""
+    patient_index.record_document("doc1", 1, {"patient_id": "PAT001", "patient_age": "42"})
+    patient_index.record_document("doc2", 1, {"patient_id": "PAT002", "patient_age": "unknown"})
+
+    _, patients = patient_index.get_patients()
+    ages = {p["id"]: p["age"] for p in patients}
+
+    assert ages == {"PAT001": 42, "PAT002": None}
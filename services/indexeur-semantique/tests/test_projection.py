@@ -0,0 +1,64 @@
+"""
+Unit tests for the PCA embedding projection
+"""
+
+import numpy as np
+import pytest
+from app.embeddings.projection import EmbeddingProjection
+
+
+@pytest.fixture
+def vectors():
+    """Normalized vectors with most variance in a few directions"""
+    rng = np.random.default_rng(0)
+    latent = rng.normal(size=(500, 8))
+    mixing = rng.normal(size=(8, 64))
+    data = latent @ mixing + 0.01 * rng.normal(size=(500, 64))
+    return (data / np.linalg.norm(data, axis=1, keepdims=True)).astype(np.float32)
+
+
+def test_fit_reduces_dimension(vectors):
+    projection = EmbeddingProjection.fit(vectors, 16)
+    projected = projection.apply(vectors)
+
+    assert projected.shape == (500, 16)
+    np.testing.assert_allclose(np.linalg.norm(projected, axis=1), 1.0, rtol=1e-5)
+    assert projection.explained_variance_ratio.sum() > 0.99
+
+
+def test_apply_single_vector(vectors):
+    projection = EmbeddingProjection.fit(vectors, 16)
+    np.testing.assert_allclose(projection.apply(vectors[3]), projection.apply(vectors)[3], atol=1e-6)
+
+
+def test_projection_preserves_neighbours(vectors):
+    projection = EmbeddingProjection.fit(vectors, 16)
+    projected = projection.apply(vectors)
+
+    full_top = np.argsort(-vectors @ vectors[0])[:10]
+    projected_top = np.argsort(-projected @ projected[0])[:10]
+
+    assert len(set(full_top) & set(projected_top)) >= 8
+
+
+def test_whitening_gives_unit_variance(vectors):
+    projection = EmbeddingProjection.fit(vectors, 8, whiten=True)
+    raw = (vectors - projection.mean) @ projection.components
+
+    np.testing.assert_allclose(raw.var(axis=0, ddof=1), 1.0, rtol=1e-3)
+
+
+def test_invalid_dimension(vectors):
+    with pytest.raises(ValueError):
+        EmbeddingProjection.fit(vectors, 64)
+
+
+def test_save_and_load(vectors, tmp_path):
+    projection = EmbeddingProjection.fit(vectors, 16, whiten=True)
+    projection.save(str(tmp_path))
+
+    loaded = EmbeddingProjection.load(str(tmp_path))
+
+    assert loaded.whiten
+    np.testing.assert_allclose(loaded.apply(vectors), projection.apply(vectors), rtol=1e-6)
+    assert EmbeddingProjection.load(str(tmp_path / "missing")) is None
@@ -0,0 +1,129 @@
+"""
+Unit tests for index files shared by the API and consumer processes
+
+Two manager instances on the same directory stand in for the two processes.
+"""
+
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.database import Base
+from app.models.document_chunk import DocumentChunk
+from app.services import bm25_manager as bm25_module
+from app.services import indexing as indexing_module
+from app.services.bm25_manager import BM25Manager
+from app.services.faiss_manager import FAISSManager
+from app.services.indexing import DocumentIndexer
+
+
+@pytest.fixture(autouse=True)
+def whitespace_tokenizer(monkeypatch):
+    monkeypatch.setattr(bm25_module, "tokenize_text", lambda text: text.lower().split())
+
+
+def test_bm25_write_keeps_documents_saved_by_other_process(tmp_path):
+    api = BM25Manager(index_dir=str(tmp_path))
+    consumer = BM25Manager(index_dir=str(tmp_path))
+
+    api.add_documents(["insulin dose adjusted"], [{"document_id": "api-doc"}])
+    consumer.add_documents(["blood pressure elevated"], [{"document_id": "queue-doc"}])
+
+    reloaded = BM25Manager(index_dir=str(tmp_path))
+    assert [m["document_id"] for m in reloaded.metadata] == ["api-doc", "queue-doc"]
+
+
+def test_bm25_search_sees_documents_saved_by_other_process(tmp_path):
+    api = BM25Manager(index_dir=str(tmp_path))
+    consumer = BM25Manager(index_dir=str(tmp_path))
+
+    consumer.add_documents(
+        ["blood pressure elevated", "insulin dose", "renal function stable"],
+        [{"document_id": "queue-doc"}, {"document_id": "other"}, {"document_id": "third"}]
+    )
+
+    assert api.search("pressure") == []  # Served from the loaded corpus while it reloads
+    api.reloader.join(timeout=5)
+
+    results = api.search("pressure")
+    assert [r["document_id"] for r in results] == ["queue-doc"]
+
+
+def test_bm25_search_does_not_wait_for_the_file_lock(tmp_path):
+    api = BM25Manager(index_dir=str(tmp_path))
+    consumer = BM25Manager(index_dir=str(tmp_path))
+    consumer.add_documents(
+        ["blood pressure elevated", "insulin dose", "renal function stable"],
+        [{"document_id": "queue-doc"}, {"document_id": "other"}, {"document_id": "third"}]
+    )
+
+    with consumer.writing():  # The other process holds the lock, e.g. across its commit
+        searcher = threading.Thread(target=api.search, args=("pressure",))
+        searcher.start()
+        searcher.join(timeout=2)
+        assert not searcher.is_alive()
+
+    api.reloader.join(timeout=5)
+    assert [r["document_id"] for r in api.search("pressure")] == ["queue-doc"]
+
+
+def test_faiss_search_sees_vectors_saved_by_other_process(tmp_path):
+    api = FAISSManager(index_dir=str(tmp_path), dimension=4)
+    consumer = FAISSManager(index_dir=str(tmp_path), dimension=4)
+
+    consumer.add_vectors(np.ones((2, 4), dtype=np.float32), [{"chunk_id": "a"}, {"chunk_id": "b"}])
+
+    api.search(np.ones(4, dtype=np.float32), top_k=5)
+    api.reloader.join(timeout=5)
+
+    results = api.search(np.ones(4, dtype=np.float32), top_k=5)
+    assert sorted(r["chunk_id"] for r in results) == ["a", "b"]
+    assert api.get_stats()["total_vectors"] == 2
+
+
+def test_indexer_appends_after_vectors_saved_by_other_process(tmp_path, monkeypatch):
+    api = FAISSManager(index_dir=str(tmp_path / "faiss"), dimension=4)
+    consumer = FAISSManager(index_dir=str(tmp_path / "faiss"), dimension=4)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    monkeypatch.setattr(indexing_module, "get_faiss_manager", lambda: api)
+    monkeypatch.setattr(indexing_module, "get_bm25_manager", lambda: SimpleNamespace(add_documents=lambda *args: None))
+    monkeypatch.setattr(indexing_module, "get_patient_index", lambda: SimpleNamespace(record_document=lambda *args: None))
+
+    indexer = DocumentIndexer(db)
+    document = indexer.track_document("doc-a", "paragraph", {})
+    indexer.write_batch(
+        [(document, {"index": i, "text": f"chunk {i}"}) for i in range(2)],
+        np.zeros((2, 4), dtype=np.float32)
+    )
+
+    consumer.add_vectors(np.ones((3, 4), dtype=np.float32), [{"chunk_id": f"q{i}"} for i in range(3)])
+    documents = indexer.finish()
+
+    assert documents["doc-a"]["faiss_ids"] == [3, 4]
+    assert sorted(row.faiss_index_id for row in db.query(DocumentChunk)) == [3, 4]
+    reloaded = FAISSManager(index_dir=str(tmp_path / "faiss"), dimension=4)
+    assert reloaded.index.ntotal == 5
+    assert [reloaded.id_to_chunk[i]["chunk_id"] for i in range(3)] == ["q0", "q1", "q2"]
+
+
+def test_faiss_searches_wait_for_vectors_being_added(tmp_path):
+    manager = FAISSManager(index_dir=str(tmp_path), dimension=4)
+    manager.add_vectors(np.ones((1, 4), dtype=np.float32), [{"chunk_id": "a"}])
+    searched = threading.Event()
+
+    with manager.index_lock:  # Held by add_vectors while FAISS appends
+        searcher = threading.Thread(target=lambda: manager.search(np.ones(4, dtype=np.float32)) and searched.set())
+        searcher.start()
+        searcher.join(timeout=0.2)
+        assert not searched.is_set()
+
+    searcher.join(timeout=5)
+    assert searched.is_set()
@@ -0,0 +1,98 @@
+"""
+Unit tests for the multi-process embedding worker pool
+"""
+
+import os
+import functools
+import pytest
+import numpy as np
+from multiprocessing import shared_memory
+from app.embeddings.worker_pool import EmbeddingWorkerPool, _split_cores, _write_texts, _read_texts
+
+
+class CharCountModel:
+    """Deterministic model: embeds a text as its normalized (length, 1, vowels) vector"""
+
+    def get_sentence_embedding_dimension(self):
+        return 3
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=False):
+        vectors = np.array(
+            [[len(t), 1.0, sum(c in "aeiou" for c in t)] for t in texts],
+            dtype=np.float32
+        )
+        if normalize_embeddings:
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors
+
+
+def make_model():
+    return CharCountModel()
+
+
+def test_split_cores_disjoint():
+    core_sets = _split_cores(2)
+    flat = [core for cores in core_sets for core in cores]
+
+    assert len(flat) == len(set(flat))
+    assert all(core_sets)
+
+
+def test_text_buffer_roundtrip():
+    texts = ["patient", "", "température élevée", "心电图"]
+    shm = shared_memory.SharedMemory(create=True, size=4096)
+    try:
+        _write_texts(shm.buf, texts)
+        assert _read_texts(shm.buf, len(texts)) == texts
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def test_pool_encodes_in_order():
+    texts = [f"note {i} " + "a" * (i % 7) for i in range(50)]
+    pool = EmbeddingWorkerPool(n_workers=2, slot_size=8, model_factory=make_model)
+    try:
+        embeddings = pool.encode(texts)
+        stats = pool.get_stats()
+    finally:
+        pool.close()
+
+    expected = CharCountModel().encode(texts, normalize_embeddings=True)
+    np.testing.assert_allclose(embeddings, expected, rtol=1e-6)
+    assert stats["dimension"] == 3
+    assert stats["texts_total"] == 50
+    assert pool.workers == []
+
+
+class CrashOnceModel(CharCountModel):
+    """Kills its process the first time it sees "crash", like an OOM kill"""
+
+    def __init__(self, marker):
+        self.marker = marker
+
+    def encode(self, texts, **kwargs):
+        if "crash" in texts and not os.path.exists(self.marker):
+            open(self.marker, "w").close()
+            os._exit(1)
+        return super().encode(texts, **kwargs)
+
+
+def test_dead_worker_is_respawned(tmp_path):
+    texts = [f"note {i}" for i in range(20)] + ["crash"]
+    pool = EmbeddingWorkerPool(
+        n_workers=2,
+        slot_size=8,
+        model_factory=functools.partial(CrashOnceModel, str(tmp_path / "crashed"))
+    )
+    try:
+        embeddings = pool.encode(texts)
+        again = pool.encode(texts[:4])
+        stats = pool.get_stats()
+    finally:
+        pool.close()
+
+    expected = CharCountModel().encode(texts, normalize_embeddings=True)
+    np.testing.assert_allclose(embeddings, expected, rtol=1e-6)
+    np.testing.assert_allclose(again, expected[:4], rtol=1e-6)
+    assert stats["respawns"] == 1
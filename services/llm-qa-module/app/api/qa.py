@@ -2,14 +2,17 @@
 API endpoints for Q&A operations
 """
 
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Request, status
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+import asyncio
+import json
 import time
 import uuid as uuid_lib
+from typing import Optional
 import structlog
 
-from ..database import get_db
+from ..database import get_db, SessionLocal
 from ..models.qa import QASession, QAQuery
 from ..schemas.qa import (
     QuestionRequest,
@@ -20,12 +23,95 @@ from ..schemas.qa import (
     SessionResponse,
     FeedbackRequest
 )
-from ..services import get_rag_pipeline
+from ..services import get_rag_pipeline, get_answer_cache, get_llm_router
 from ..config import settings
 
 logger = structlog.get_logger()
 router = APIRouter()
 
+# Streamed answers persisted after the response (kept referenced until done)
+_pending_saves = set()
+
+
+def save_query(
+    db: Session,
+    request: QuestionRequest,
+    result: dict,
+    total_time_ms: int,
+    query_id: Optional[str] = None
+) -> QAQuery:
+    """
+    Store an answered question and update its session
+    
+    Args:
+        db: Database session
+        request: Question request
+        result: RAGPipeline answer (with per-stage timings)
+        total_time_ms: End-to-end request time
+        query_id: ID to save under (generated if None)
+        
+    Returns:
+        Saved query
+    """
+    timings = result.get("timings", {})
+    
+    query = QAQuery(
+        id=query_id or str(uuid_lib.uuid4()),
+        session_id=str(request.session_id) if request.session_id else None,
+        question=request.question,
+        answer=result["answer"],
+        llm_model=result.get("model") or settings.OPENAI_MODEL,
+        retrieved_chunks=result.get("retrieved_chunks", []),
+        retrieval_count=result["chunks_retrieved"],
+        citations=result.get("sources", []),
+        retrieval_time_ms=timings.get("retrieval", 0),
+        ml_enrichment_time_ms=timings.get("ml_enrichment"),
+        context_build_time_ms=timings.get("context_build"),
+        time_to_first_token_ms=timings.get("time_to_first_token"),
+        llm_time_ms=timings.get("generation") or 0,
+        total_time_ms=total_time_ms,
+        tokens_used=result.get("tokens_used", 0),
+        prompt_tokens=result.get("prompt_tokens", 0),
+        completion_tokens=result.get("completion_tokens", 0),
+        context_tokens=result.get("context_tokens"),
+        context_tokens_saved=result.get("context_tokens_saved"),
+        answer_cached=result.get("cached", False),
+        has_citations=len(result.get("sources", [])) > 0
+    )
+    db.add(query)
+    
+    # Update session if provided
+    if request.session_id:
+        session = db.query(QASession).filter(
+            QASession.id == str(request.session_id)
+        ).first()
+        
+        if session:
+            session.total_queries += 1
+            session.total_tokens_used += result.get("tokens_used", 0)
+    
+    db.commit()
+    db.refresh(query)
+    return query
+
+
+def save_streamed_query(request: QuestionRequest, result: dict, total_time_ms: int, query_id: str):
+    """Store a streamed answer in its own session (runs in a worker thread)"""
+    db = SessionLocal()
+    try:
+        query = save_query(db, request, result, total_time_ms, query_id)
+        logger.info(
+            "Streamed question answered",
+            query_id=str(query.id),
+            tokens=result.get("tokens_used", 0),
+            time_ms=total_time_ms
+        )
+    except Exception as e:
+        db.rollback()
+        logger.error("Failed to save streamed answer", error=str(e))
+    finally:
+        db.close()
+
 
 @router.post("/ask", response_model=QuestionResponse)
 async def ask_question(
@@ -46,46 +132,20 @@ async def ask_question(
         rag = get_rag_pipeline()
         
         # Get answer
-        retrieval_start = time.time()
         result = await rag.answer_question(
             question=request.question,
             include_sources=request.include_sources,
-            filters=request.filters
+            filters=request.filters,
+            patient_features=request.patient_features
         )
-        retrieval_time_ms = int((time.time() - retrieval_start) * 1000)
         
-        llm_time_ms = int(retrieval_time_ms * 0.7)  # Estimate
+        timings = result.get("timings", {})
+        retrieval_time_ms = timings.get("retrieval", 0)
+        llm_time_ms = timings.get("generation") or 0
         total_time_ms = int((time.time() - start_time) * 1000)
         
         # Save to database
-        query = QAQuery(
-            session_id=request.session_id,
-            question=request.question,
-            answer=result["answer"],
-            llm_model=result.get("model", settings.OPENAI_MODEL),
-            retrieved_chunks=result.get("retrieved_chunks", []),
-            retrieval_count=result["chunks_retrieved"],
-            citations=result.get("sources", []),
-            retrieval_time_ms=retrieval_time_ms,
-            llm_time_ms=llm_time_ms,
-            total_time_ms=total_time_ms,
-            tokens_used=result.get("tokens_used", 0),
-            has_citations=len(result.get("sources", [])) > 0
-        )
-        db.add(query)
-        
-        # Update session if provided
-        if request.session_id:
-            session = db.query(QASession).filter(
-                QASession.id == request.session_id
-            ).first()
-            
-            if session:
-                session.total_queries += 1
-                session.total_tokens_used += result.get("tokens_used", 0)
-        
-        db.commit()
-        db.refresh(query)
+        query = save_query(db, request, result, total_time_ms)
         
         logger.info(
             "Question answered",
@@ -101,11 +161,18 @@ async def ask_question(
             sources=[Citation(**s) for s in result.get("sources", [])],
             chunks_retrieved=result["chunks_retrieved"],
             tokens_used=result.get("tokens_used", 0),
+            prompt_tokens=result.get("prompt_tokens", 0),
+            completion_tokens=result.get("completion_tokens", 0),
             model=result.get("model", ""),
             retrieval_time_ms=retrieval_time_ms,
+            ml_enrichment_time_ms=timings.get("ml_enrichment"),
+            context_build_time_ms=timings.get("context_build"),
+            time_to_first_token_ms=timings.get("time_to_first_token"),
             llm_time_ms=llm_time_ms,
             total_time_ms=total_time_ms,
             has_answer=result.get("has_answer", True),
+            cached=result.get("cached", False),
+            coalesced=result.get("coalesced", False),
             retrieved_chunks=[
                 RetrievedChunk(**c) for c in result.get("retrieved_chunks", [])
             ]
@@ -120,31 +187,72 @@ async def ask_question(
 
 
 @router.post("/ask/stream")
-async def ask_question_stream(request: QuestionRequest):
+async def ask_question_stream(request: QuestionRequest, http_request: Request):
     """
-    Ask a question and stream the answer in real-time
+    Ask a question and stream the answer in real-time (Server-Sent Events)
     
     - **question**: Your medical question
+    - **filters**: Metadata filters (patient_id, date, type)
+    
+    Events are `sources` (if include_sources, as soon as the context is assembled), `delta`
+    (answer text), then `done` with the full answer, citations, timings and
+    the query_id it is saved under, or `error`. Each event's data is JSON.
+    Generation is cancelled if the client disconnects.
     """
     
-    try:
-        rag = get_rag_pipeline()
-        
-        async def generate():
-            async for chunk in rag.answer_question_stream(request.question):
-                yield f"data: {chunk}\n\n"
-        
-        return StreamingResponse(
-            generate(),
-            media_type="text/event-stream"
-        )
-        
-    except Exception as e:
-        logger.error("Streaming failed", error=str(e))
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Streaming failed: {str(e)}"
+    start_time = time.time()
+    rag = get_rag_pipeline()
+    
+    async def generate():
+        events = rag.answer_question_stream(
+            question=request.question,
+            include_sources=request.include_sources,
+            filters=request.filters,
+            patient_features=request.patient_features
         )
+        try:
+            async for event in events:
+                if await http_request.is_disconnected():
+                    logger.info("Client disconnected, generation cancelled")
+                    return
+                
+                if event["type"] == "done":
+                    # Persist without holding up the end of the stream (no-context
+                    # answers too, as /ask does)
+                    query_id = str(uuid_lib.uuid4())
+                    result = {**event["content"], "query_id": query_id}
+                    task = asyncio.create_task(asyncio.to_thread(
+                        save_streamed_query,
+                        request,
+                        result,
+                        int((time.time() - start_time) * 1000),
+                        query_id
+                    ))
+                    _pending_saves.add(task)
+                    task.add_done_callback(_pending_saves.discard)
+                    event = {"type": "done", "content": result}
+                
+                yield f"event: {event['type']}\ndata: {json.dumps(event['content'], default=str)}\n\n"
+        finally:
+            await events.aclose()
+    
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Get answer cache statistics"""
+    return get_answer_cache().get_stats()
+
+
+@router.get("/llm/backends")
+async def get_llm_backends():
+    """Get LLM router backends with health and latency statistics"""
+    return get_llm_router().get_stats()
 
 
 @router.post("/sessions", response_model=SessionResponse)
@@ -186,7 +294,7 @@ async def create_session(
 async def get_session(session_id: uuid_lib.UUID, db: Session = Depends(get_db)):
     """Get session details"""
     
-    session = db.query(QASession).filter(QASession.id == session_id).first()
+    session = db.query(QASession).filter(QASession.id == str(session_id)).first()
     
     if not session:
         raise HTTPException(
@@ -212,7 +320,7 @@ async def submit_feedback(
     """Submit feedback on an answer"""
     
     try:
-        query = db.query(QAQuery).filter(QAQuery.id == request.query_id).first()
+        query = db.query(QAQuery).filter(QAQuery.id == str(request.query_id)).first()
         
         if not query:
             raise HTTPException(
@@ -243,7 +351,7 @@ async def submit_feedback(
 async def get_query(query_id: uuid_lib.UUID, db: Session = Depends(get_db)):
     """Get a specific query and its answer"""
     
-    query = db.query(QAQuery).filter(QAQuery.id == query_id).first()
+    query = db.query(QAQuery).filter(QAQuery.id == str(query_id)).first()
     
     if not query:
         raise HTTPException(
@@ -258,5 +366,15 @@ async def get_query(query_id: uuid_lib.UUID, db: Session = Depends(get_db)):
         "citations": query.citations,
         "model": query.llm_model,
         "tokens_used": query.tokens_used,
+        "prompt_tokens": query.prompt_tokens,
+        "completion_tokens": query.completion_tokens,
+        "timings_ms": {
+            "retrieval": query.retrieval_time_ms,
+            "ml_enrichment": query.ml_enrichment_time_ms,
+            "context_build": query.context_build_time_ms,
+            "time_to_first_token": query.time_to_first_token_ms,
+            "generation": query.llm_time_ms,
+            "total": query.total_time_ms
+        },
         "created_at": query.created_at.isoformat()
     }
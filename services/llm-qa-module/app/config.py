@@ -3,7 +3,7 @@ Configuration management for LLM QA Module
 """
 
 from pydantic_settings import BaseSettings
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
 import os
 
 
@@ -40,6 +40,24 @@ class Settings(BaseSettings):
     LLM_CONTEXT_LENGTH: int = 4096
     LLM_REQUEST_TIMEOUT: int = 60
     
+    # Concurrent LLM calls per worker (default, then per-provider overrides)
+    LLM_MAX_CONCURRENCY: int = 4
+    LLM_PROVIDER_CONCURRENCY: Dict[str, int] = {"ollama": 2, "openai": 16, "anthropic": 16, "local": 1}
+    
+    # LLM router: backends as JSON, e.g.
+    # [{"name": "gpu1", "provider": "ollama", "base_url": "http://gpu1:11434", "model": "mistral", "max_concurrency": 2},
+    #  {"name": "openai", "provider": "openai", "model": "gpt-4o-mini"}]
+    # Empty: the single LLM_PROVIDER backend
+    LLM_BACKENDS: List[Dict[str, Any]] = []
+    LLM_BACKEND_FAILURE_THRESHOLD: int = 3
+    LLM_BACKEND_COOLDOWN_SECONDS: float = 30.0
+    LLM_ROUTER_EWMA_ALPHA: float = 0.3
+    LLM_ROUTER_LATENCY_WINDOW: int = 200  # Latest latencies kept per backend for p95
+    LLM_HEDGING_ENABLED: bool = False
+    LLM_HEDGE_DELAY_MS: int = 8000  # Until a backend has LLM_HEDGE_MIN_SAMPLES latencies
+    LLM_HEDGE_MIN_DELAY_MS: int = 1000
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+    
     # OpenAI Configuration (Fallback or Primary)
     OPENAI_API_KEY: Optional[str] = None
     OPENAI_MODEL: str = "gpt-4-turbo-preview"
@@ -62,6 +80,12 @@ class Settings(BaseSettings):
     ENABLE_RERANKING: bool = True
     RERANKING_TOP_K: int = 3
     
+    # Context assembly (token budget for retrieved chunks in the prompt)
+    CONTEXT_TOKEN_BUDGET: int = 2500
+    CONTEXT_MAX_CHUNK_TOKENS: int = 400  # Longer chunks are trimmed to question-relevant sentences
+    CONTEXT_DEDUP_THRESHOLD: float = 0.8  # Word 3-shingle Jaccard similarity
+    LLM_TOKENIZER: Optional[str] = None  # Hugging Face tokenizer of the LLM (e.g. mistralai/Mistral-7B-Instruct-v0.2)
+    
     # Prompt Configuration
     SYSTEM_PROMPT: str = """You are a medical AI assistant helping healthcare professionals analyze clinical documents.
 Your role is to provide accurate, evidence-based answers based ONLY on the provided context.
@@ -92,6 +116,24 @@ Please provide a detailed answer based on the context above. Include citations [
     
     # ML Predictor Integration
     ML_PREDICTOR_SERVICE_URL: str = os.getenv("ML_PREDICTOR_SERVICE_URL", "http://localhost:8007")
+    ENABLE_ML_ENRICHMENT: bool = True
+    ML_PREDICTION_MODEL_TYPE: str = "readmission"
+    ML_PREDICTION_TIMEOUT: float = 2.0  # Seconds; enrichment is skipped past this
+    ML_PREDICTION_CACHE_SIZE: int = 512
+    ML_PREDICTION_CACHE_TTL_SECONDS: int = 900
+    
+    # Outbound HTTP (shared pooled client)
+    HTTP_POOL_MAX_CONNECTIONS: int = 100
+    HTTP_POOL_MAX_KEEPALIVE: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    HTTP_CONNECT_TIMEOUT: float = 2.0
+    HTTP_DEFAULT_TIMEOUT: float = 30.0
+    SEARCH_REQUEST_TIMEOUT: float = 30.0
+    HTTP_MAX_RETRIES: int = 2  # Idempotent calls only
+    HTTP_RETRY_BACKOFF_MS: int = 100
+    HTTP_RETRY_BACKOFF_MAX_MS: int = 2000
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_RESET_SECONDS: float = 30.0
     
     # CORS
     CORS_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:8000", "*"]
@@ -100,6 +142,15 @@ Please provide a detailed answer based on the context above. Include citations [
     WORKERS: int = 4
     CACHE_TTL_SECONDS: int = 3600
     
+    # Identical concurrent questions share one pipeline run (single-flight)
+    QA_COALESCE_REQUESTS: bool = True
+    
+    # Semantic answer cache (TTL is CACHE_TTL_SECONDS)
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_MAX_ENTRIES: int = 1024
+    ANSWER_CACHE_SIMILARITY: float = 0.95  # Cosine similarity between questions
+    ANSWER_CACHE_EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -2,7 +2,9 @@
 LLM wrapper supporting multiple providers (Ollama, OpenAI, Anthropic, Local)
 """
 
-from typing import Optional, Dict, Any
+import asyncio
+import time
+from typing import Optional, Dict, Any, AsyncIterator
 import structlog
 from langchain_community.llms import Ollama
 from langchain_openai import ChatOpenAI
@@ -11,6 +13,7 @@ from langchain.callbacks import get_openai_callback
 from langchain.schema import HumanMessage, SystemMessage
 
 from ..config import settings
+from .tokenizer import get_token_counter
 
 logger = structlog.get_logger()
 
@@ -18,9 +21,26 @@ logger = structlog.get_logger()
 class LLMWrapper:
     """Unified LLM interface supporting multiple providers"""
     
-    def __init__(self):
-        self.provider = settings.LLM_PROVIDER
+    def __init__(
+        self,
+        provider: Optional[str] = None,
+        model_name: Optional[str] = None,
+        base_url: Optional[str] = None,
+        max_concurrency: Optional[int] = None
+    ):
+        """
+        Args:
+            provider: LLM provider (default LLM_PROVIDER)
+            model_name: Model of the provider (default from settings)
+            base_url: Ollama server URL (default OLLAMA_BASE_URL)
+            max_concurrency: Concurrent calls (default per provider settings)
+        """
+        self.provider = provider or settings.LLM_PROVIDER
+        self.model_override = model_name
+        self.base_url = base_url or settings.OLLAMA_BASE_URL
+        self.max_concurrency = max_concurrency
         self.model = None
+        self.semaphores: Dict[str, asyncio.Semaphore] = {}
         self._initialize()
     
     def _initialize(self):
@@ -46,6 +66,7 @@ class LLMWrapper:
             if settings.ENABLE_LLM_FALLBACK and settings.OPENAI_API_KEY:
                 logger.warning("Attempting fallback to OpenAI")
                 self.provider = "openai"
+                self.model_override = None
                 self._initialize_openai()
             else:
                 raise
@@ -53,12 +74,12 @@ class LLMWrapper:
     def _initialize_ollama(self):
         """Initialize Ollama LLM"""
         logger.info("Initializing Ollama", 
-                   model=settings.OLLAMA_MODEL,
-                   base_url=settings.OLLAMA_BASE_URL)
+                   model=self._model_name(),
+                   base_url=self.base_url)
         
         self.model = Ollama(
-            base_url=settings.OLLAMA_BASE_URL,
-            model=settings.OLLAMA_MODEL,
+            base_url=self.base_url,
+            model=self._model_name(),
             temperature=settings.LLM_TEMPERATURE,
             num_predict=settings.LLM_MAX_TOKENS,
             timeout=settings.LLM_REQUEST_TIMEOUT,
@@ -77,10 +98,10 @@ class LLMWrapper:
         if not settings.OPENAI_API_KEY:
             raise ValueError("OPENAI_API_KEY not set")
         
-        logger.info("Initializing OpenAI", model=settings.OPENAI_MODEL)
+        logger.info("Initializing OpenAI", model=self._model_name())
         
         self.model = ChatOpenAI(
-            model=settings.OPENAI_MODEL,
+            model=self._model_name(),
             temperature=settings.LLM_TEMPERATURE,
             max_tokens=settings.LLM_MAX_TOKENS,
             api_key=settings.OPENAI_API_KEY
@@ -91,10 +112,10 @@ class LLMWrapper:
         if not settings.ANTHROPIC_API_KEY:
             raise ValueError("ANTHROPIC_API_KEY not set")
         
-        logger.info("Initializing Claude", model=settings.ANTHROPIC_MODEL)
+        logger.info("Initializing Claude", model=self._model_name())
         
         self.model = ChatAnthropic(
-            model=settings.ANTHROPIC_MODEL,
+            model=self._model_name(),
             temperature=settings.LLM_TEMPERATURE,
             max_tokens=settings.LLM_MAX_TOKENS,
             api_key=settings.ANTHROPIC_API_KEY
@@ -105,12 +126,12 @@ class LLMWrapper:
         from langchain.llms import HuggingFacePipeline
         from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
         
-        logger.info("Initializing local LLM", model=settings.LOCAL_MODEL_NAME)
+        logger.info("Initializing local LLM", model=self._model_name())
         
         # Load tokenizer and model
-        tokenizer = AutoTokenizer.from_pretrained(settings.LOCAL_MODEL_NAME)
+        tokenizer = AutoTokenizer.from_pretrained(self._model_name())
         model = AutoModelForCausalLM.from_pretrained(
-            settings.LOCAL_MODEL_NAME,
+            self._model_name(),
             device_map=settings.LOCAL_MODEL_DEVICE,
             token=settings.HF_TOKEN
         )
@@ -172,7 +193,7 @@ class LLMWrapper:
         return {
             "response": response,
             "tokens_used": 0,  # Ollama doesn't provide token count by default
-            "model": settings.OLLAMA_MODEL,
+            "model": self._model_name(),
             "provider": "ollama"
         }
     
@@ -199,7 +220,7 @@ class LLMWrapper:
                 "tokens_used": cb.total_tokens,
                 "prompt_tokens": cb.prompt_tokens,
                 "completion_tokens": cb.completion_tokens,
-                "model": settings.OPENAI_MODEL,
+                "model": self._model_name(),
                 "provider": "openai"
             }
     
@@ -222,7 +243,7 @@ class LLMWrapper:
         return {
             "response": response.content,
             "tokens_used": 0,  # Would need to parse from response
-            "model": settings.ANTHROPIC_MODEL,
+            "model": self._model_name(),
             "provider": "anthropic"
         }
     
@@ -243,7 +264,7 @@ class LLMWrapper:
         return {
             "response": response,
             "tokens_used": 0,  # Would need tokenizer to count
-            "model": settings.LOCAL_MODEL_NAME,
+            "model": self._model_name(),
             "provider": "local"
         }
     
@@ -282,6 +303,185 @@ class LLMWrapper:
             yield result["response"]
 
 
+    def _semaphore(self) -> asyncio.Semaphore:
+        """Concurrency limit of the current provider"""
+        if self.provider not in self.semaphores:
+            limit = self.max_concurrency or settings.LLM_PROVIDER_CONCURRENCY.get(
+                self.provider, settings.LLM_MAX_CONCURRENCY
+            )
+            self.semaphores[self.provider] = asyncio.Semaphore(limit)
+        return self.semaphores[self.provider]
+    
+    def _build_input(self, prompt: str, system_prompt: Optional[str] = None):
+        """Prompt string (completion models) or message list (chat models)"""
+        if self.provider in ["openai", "anthropic"]:
+            messages = []
+            if system_prompt:
+                messages.append(SystemMessage(content=system_prompt))
+            messages.append(HumanMessage(content=prompt))
+            return messages
+        
+        if system_prompt:
+            return f"{system_prompt}\n\n{prompt}"
+        return prompt
+    
+    def _model_name(self) -> str:
+        if self.model_override:
+            return self.model_override
+        return {
+            "ollama": settings.OLLAMA_MODEL,
+            "openai": settings.OPENAI_MODEL,
+            "anthropic": settings.ANTHROPIC_MODEL
+        }.get(self.provider, settings.LOCAL_MODEL_NAME)
+    
+    def _usage(
+        self,
+        prompt: str,
+        system_prompt: Optional[str],
+        response: str,
+        prompt_tokens: Optional[int] = None,
+        completion_tokens: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Token counts reported by the provider, or counted with the LLM tokenizer"""
+        source = "provider"
+        if prompt_tokens is None or completion_tokens is None:
+            count_tokens = get_token_counter()
+            source = "tokenizer"
+            if prompt_tokens is None:
+                prompt_tokens = count_tokens(f"{system_prompt}\n\n{prompt}" if system_prompt else prompt)
+            if completion_tokens is None:
+                completion_tokens = count_tokens(response)
+        
+        return {
+            "tokens_used": prompt_tokens + completion_tokens,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "token_count_source": source
+        }
+    
+    async def agenerate(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Generate response from LLM without blocking the event loop
+        
+        At most LLM_PROVIDER_CONCURRENCY calls run per provider; further
+        calls wait for a slot. Token counts come from the provider when it
+        reports them and from the LLM tokenizer otherwise.
+        
+        Args:
+            prompt: User prompt
+            system_prompt: Optional system prompt
+            
+        Returns:
+            Dict with response, token counts, generation_ms and ttft_ms
+            (time to first token, when the provider reports it)
+        """
+        llm_input = self._build_input(prompt, system_prompt)
+        prompt_tokens = completion_tokens = ttft_ms = None
+        
+        try:
+            async with self._semaphore():
+                start = time.perf_counter()
+                
+                if self.provider in ["openai", "anthropic"]:
+                    # Track token usage
+                    with get_openai_callback() as cb:
+                        message = await self.model.ainvoke(llm_input)
+                    
+                    text = message.content
+                    usage = getattr(message, "usage_metadata", None) or {}
+                    prompt_tokens = usage.get("input_tokens") or cb.prompt_tokens or None
+                    completion_tokens = usage.get("output_tokens") or cb.completion_tokens or None
+                else:
+                    result = await self.model.agenerate([llm_input])
+                    generation = result.generations[0][0]
+                    text = generation.text
+                    
+                    # Ollama reports evaluated tokens and durations (ns)
+                    info = generation.generation_info or {}
+                    prompt_tokens = info.get("prompt_eval_count")
+                    completion_tokens = info.get("eval_count")
+                    if "prompt_eval_duration" in info:
+                        ttft_ms = int((info.get("load_duration", 0) + info["prompt_eval_duration"]) / 1e6)
+                
+                generation_ms = int((time.perf_counter() - start) * 1000)
+            
+            return {
+                "response": text,
+                **self._usage(prompt, system_prompt, text, prompt_tokens, completion_tokens),
+                "generation_ms": generation_ms,
+                "ttft_ms": ttft_ms,
+                "model": self._model_name(),
+                "provider": self.provider
+            }
+            
+        except Exception as e:
+            logger.error("Generation failed", error=str(e), provider=self.provider)
+            raise
+    
+    async def astream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        stats: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream response without blocking the event loop
+        
+        The provider slot is held until the stream is exhausted or closed;
+        closing it early cancels generation. Models without native
+        streaming yield the whole answer at once.
+        
+        Args:
+            prompt: User prompt
+            system_prompt: Optional system prompt
+            stats: Optional dict filled with ttft_ms, generation_ms and token
+                counts once the stream is exhausted
+            
+        Yields:
+            Chunks of generated text
+        """
+        llm_input = self._build_input(prompt, system_prompt)
+        pieces = []
+        usage = {}
+        ttft_ms = None
+        
+        async with self._semaphore():
+            start = time.perf_counter()
+            stream = self.model.astream(llm_input)
+            try:
+                async for chunk in stream:
+                    if ttft_ms is None:
+                        ttft_ms = int((time.perf_counter() - start) * 1000)
+                    if not isinstance(chunk, str):
+                        usage = getattr(chunk, "usage_metadata", None) or usage
+                        chunk = chunk.content
+                    pieces.append(chunk)
+                    yield chunk
+            finally:
+                # Closing the provider stream drops its connection and stops generation
+                await stream.aclose()
+            generation_ms = int((time.perf_counter() - start) * 1000)
+        
+        if stats is not None:
+            stats.update(self._usage(
+                prompt,
+                system_prompt,
+                "".join(pieces),
+                usage.get("input_tokens"),
+                usage.get("output_tokens")
+            ))
+            stats.update({
+                "ttft_ms": ttft_ms,
+                "generation_ms": generation_ms,
+                "model": self._model_name(),
+                "provider": self.provider
+            })
+
+
 # Global LLM wrapper instance
 _llm_wrapper = None
 
@@ -0,0 +1,59 @@
+"""
+Token counting with the configured LLM's tokenizer
+"""
+
+from typing import Callable
+import structlog
+
+from ..config import settings
+
+logger = structlog.get_logger()
+
+
+def load_token_counter() -> Callable[[str], int]:
+    """
+    Token counter for the configured LLM
+
+    Uses tiktoken for OpenAI models, the Hugging Face tokenizer named by
+    LLM_TOKENIZER (or LOCAL_MODEL_NAME for local models) otherwise, then
+    the cl100k_base encoding, and finally a 4 characters per token estimate.
+    """
+    if settings.LLM_PROVIDER == "openai":
+        try:
+            import tiktoken
+            encoding = tiktoken.encoding_for_model(settings.OPENAI_MODEL)
+            return lambda text: len(encoding.encode(text, disallowed_special=()))
+        except Exception as e:
+            logger.warning("tiktoken model encoding unavailable", error=str(e))
+
+    tokenizer_name = settings.LLM_TOKENIZER
+    if not tokenizer_name and settings.LLM_PROVIDER in ["local", "huggingface"]:
+        tokenizer_name = settings.LOCAL_MODEL_NAME
+
+    if tokenizer_name:
+        try:
+            from transformers import AutoTokenizer
+            tokenizer = AutoTokenizer.from_pretrained(tokenizer_name, token=settings.HF_TOKEN)
+            return lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+        except Exception as e:
+            logger.warning("LLM tokenizer unavailable", tokenizer=tokenizer_name, error=str(e))
+
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception as e:
+        logger.warning("Falling back to estimated token counts", error=str(e))
+        return lambda text: max(1, len(text) // 4)
+
+
+# Global token counter
+_token_counter = None
+
+
+def get_token_counter() -> Callable[[str], int]:
+    """Get token counter singleton"""
+    global _token_counter
+    if _token_counter is None:
+        _token_counter = load_token_counter()
+    return _token_counter
@@ -5,6 +5,7 @@ AI-Powered Question Answering with RAG
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import make_asgi_app
 from contextlib import asynccontextmanager
 import structlog
 import sys
@@ -12,6 +13,7 @@ import os
 
 from .database import engine, Base
 from .api import qa
+from .services import get_http_client, close_http_client, get_question_encoder
 from .config import settings
 
 # Add shared module to path
@@ -36,10 +38,17 @@ async def lifespan(app: FastAPI):
     # Create database tables
     Base.metadata.create_all(bind=engine)
     
-    # Initialize LLM (warm up) - Optional for standalone mode
+    # Open the shared outbound HTTP pool (search, ML predictor)
+    get_http_client()
+    
+    # Load the answer cache question encoder
+    if settings.ANSWER_CACHE_ENABLED:
+        get_question_encoder()
+    
+    # Initialize LLM backends (warm up) - Optional for standalone mode
     try:
-        from .llm import get_llm
-        get_llm()
+        from .services import get_llm_router
+        get_llm_router()
         logger.info("LLM initialized successfully")
     except ImportError:
         logger.warning("LLM module not found - running in standalone mode without LLM")
@@ -64,6 +73,9 @@ async def lifespan(app: FastAPI):
     logger.info("LLM QA Module started successfully")
     yield
     
+    # Close pooled outbound connections
+    await close_http_client()
+    
     # Deregister from Eureka
     if eureka_registry:
         try:
@@ -94,6 +106,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Prometheus metrics (QA stage latency and token histograms)
+app.mount("/metrics", make_asgi_app())
+
 # Include routers
 app.include_router(
     qa.router,
@@ -60,9 +60,17 @@ class QAQuery(Base):
     
     # Performance metrics
     retrieval_time_ms = Column(Integer)
-    llm_time_ms = Column(Integer)
+    ml_enrichment_time_ms = Column(Integer)
+    context_build_time_ms = Column(Integer)
+    time_to_first_token_ms = Column(Integer)
+    llm_time_ms = Column(Integer)  # Generation time
     total_time_ms = Column(Integer)
     tokens_used = Column(Integer)
+    prompt_tokens = Column(Integer)
+    completion_tokens = Column(Integer)
+    context_tokens = Column(Integer)
+    context_tokens_saved = Column(Integer)
+    answer_cached = Column(Boolean, default=False)
     
     # Quality metrics
     confidence_score = Column(Float)
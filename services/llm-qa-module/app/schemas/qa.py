@@ -14,6 +14,10 @@ class QuestionRequest(BaseModel):
     include_sources: Optional[bool] = Field(True, description="Include source citations")
     stream: Optional[bool] = Field(False, description="Stream response")
     filters: Optional[Dict[str, Any]] = Field(None, description="Metadata filters (patient_id, date, type)")
+    patient_features: Optional[Dict[str, Any]] = Field(
+        None,
+        description="Clinical features of filters.patient_id for ML risk enrichment (ml-predictor PatientFeatures)"
+    )
 
 
 class Citation(BaseModel):
@@ -42,10 +46,17 @@ class QuestionResponse(BaseModel):
     chunks_retrieved: int
     tokens_used: int
     model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
     retrieval_time_ms: int
+    ml_enrichment_time_ms: Optional[int] = None
+    context_build_time_ms: Optional[int] = None
+    time_to_first_token_ms: Optional[int] = None
     llm_time_ms: int
     total_time_ms: int
     has_answer: bool
+    cached: bool = False
+    coalesced: bool = False
     retrieved_chunks: List[RetrievedChunk]
 
 
@@ -1,4 +1,25 @@
 """Services package"""
 from .rag_pipeline import RAGPipeline, get_rag_pipeline
+from .http_client import HTTPClient, CircuitOpenError, get_http_client, close_http_client
+from .answer_cache import AnswerCache, get_answer_cache, get_question_encoder
+from .context_builder import ContextBuilder, get_context_builder
+from .ml_enrichment import MLPredictionClient, get_prediction_client
+from .llm_router import LLMRouter, get_llm_router
 
-__all__ = ["RAGPipeline", "get_rag_pipeline"]
+__all__ = [
+    "RAGPipeline",
+    "get_rag_pipeline",
+    "HTTPClient",
+    "CircuitOpenError",
+    "get_http_client",
+    "close_http_client",
+    "AnswerCache",
+    "get_answer_cache",
+    "get_question_encoder",
+    "ContextBuilder",
+    "get_context_builder",
+    "MLPredictionClient",
+    "get_prediction_client",
+    "LLMRouter",
+    "get_llm_router"
+]
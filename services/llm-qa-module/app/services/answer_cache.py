@@ -0,0 +1,189 @@
+"""
+Semantic answer cache for the RAG pipeline
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List
+import numpy as np
+import structlog
+
+from ..config import settings
+
+logger = structlog.get_logger()
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase and collapse whitespace for exact matching"""
+    return re.sub(r"\s+", " ", question).strip().lower()
+
+
+def context_fingerprint(chunks: List[Dict[str, Any]]) -> str:
+    """
+    Hash of the retrieved context an answer was generated from
+
+    Covers chunk IDs and texts in prompt order, so a cached answer is only
+    reused while retrieval (including newly indexed documents and the ML
+    report) yields exactly the same context.
+    """
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(str(chunk.get("chunk_id")).encode())
+        digest.update(b"\0")
+        digest.update(chunk.get("chunk_text", "").encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class AnswerCache:
+    """
+    In-memory TTL + LRU cache of answers keyed by question similarity
+
+    Entries are grouped by scope (filters, options and context
+    fingerprint). Within a scope, a question hits when it normalizes to a
+    cached question or its embedding has cosine similarity of at least
+    similarity_threshold with a cached one.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, similarity_threshold: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.entries: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self.scopes: Dict[str, set] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def scope_key(filters: Optional[Dict[str, Any]], fingerprint: str, **options) -> str:
+        return json.dumps([filters or {}, options, fingerprint], sort_keys=True, default=str)
+
+    def _remove(self, key: tuple):
+        self.entries.pop(key, None)
+        scope = self.scopes.get(key[0])
+        if scope is not None:
+            scope.discard(key)
+            if not scope:
+                del self.scopes[key[0]]
+
+    def lookup(
+        self,
+        scope: str,
+        question: str,
+        embedding: Optional[np.ndarray] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Find a cached answer for question in scope
+
+        Args:
+            scope: Key from scope_key()
+            question: User question
+            embedding: Normalized question embedding (exact match only if None)
+
+        Returns:
+            Cached result, or None on miss
+        """
+        now = time.monotonic()
+        exact = (scope, normalize_question(question))
+        candidates = [exact] if exact in self.entries else []
+
+        if not candidates and embedding is not None:
+            best_similarity = self.similarity_threshold
+            for key in list(self.scopes.get(scope, ())):
+                cached = self.entries[key]["embedding"]
+                if cached is None:
+                    continue
+                similarity = float(np.dot(cached, embedding))
+                if similarity >= best_similarity:
+                    best_similarity = similarity
+                    candidates = [key]
+
+        for key in candidates:
+            entry = self.entries[key]
+            if entry["expires_at"] <= now:
+                self._remove(key)
+                continue
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry["result"]
+
+        self.misses += 1
+        return None
+
+    def store(
+        self,
+        scope: str,
+        question: str,
+        result: Dict[str, Any],
+        embedding: Optional[np.ndarray] = None
+    ):
+        """Cache result for question in scope, evicting least recently used entries"""
+        key = (scope, normalize_question(question))
+        self.entries[key] = {
+            "embedding": embedding,
+            "result": result,
+            "expires_at": time.monotonic() + self.ttl_seconds
+        }
+        self.entries.move_to_end(key)
+        self.scopes.setdefault(scope, set()).add(key)
+
+        while len(self.entries) > self.max_entries:
+            self._remove(next(iter(self.entries)))
+
+    def clear(self):
+        self.entries.clear()
+        self.scopes.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+
+# Global cache and question encoder
+_answer_cache = None
+_question_encoder = None
+_question_encoder_loaded = False
+
+
+def get_answer_cache() -> AnswerCache:
+    """Get answer cache singleton"""
+    global _answer_cache
+    if _answer_cache is None:
+        _answer_cache = AnswerCache(
+            max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.CACHE_TTL_SECONDS,
+            similarity_threshold=settings.ANSWER_CACHE_SIMILARITY
+        )
+    return _answer_cache
+
+
+def get_question_encoder():
+    """Sentence-transformers model for question embeddings, or None if unavailable"""
+    global _question_encoder, _question_encoder_loaded
+    if not _question_encoder_loaded:
+        _question_encoder_loaded = True
+        try:
+            from sentence_transformers import SentenceTransformer
+            _question_encoder = SentenceTransformer(settings.ANSWER_CACHE_EMBEDDING_MODEL)
+            logger.info("Answer cache encoder loaded", model=settings.ANSWER_CACHE_EMBEDDING_MODEL)
+        except Exception as e:
+            logger.warning("Answer cache encoder unavailable, exact matching only", error=str(e))
+    return _question_encoder
+
+
+async def embed_question(question: str) -> Optional[np.ndarray]:
+    """Normalized question embedding, computed off the event loop"""
+    encoder = get_question_encoder()
+    if encoder is None:
+        return None
+    return await asyncio.to_thread(encoder.encode, question, normalize_embeddings=True)
@@ -0,0 +1,190 @@
+"""
+Token-budgeted context assembly for the RAG prompt
+"""
+
+import re
+from typing import List, Dict, Any, Callable, Optional, Set
+import structlog
+
+from ..config import settings
+from ..llm.tokenizer import get_token_counter
+
+logger = structlog.get_logger()
+
+WORD_PATTERN = re.compile(r"\w+")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+|\n+")
+
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "did", "do", "does", "for", "from", "has", "have",
+    "how", "in", "is", "it", "of", "on", "or", "the", "this", "to", "was", "were", "what", "when",
+    "which", "who", "why", "with", "patient", "le", "la", "les", "de", "des", "du", "et", "est",
+    "quel", "quelle", "quels", "quelles", "pour", "dans", "sur", "un", "une"
+}
+
+
+def content_words(text: str) -> Set[str]:
+    """Lowercased words without stop words"""
+    return {w for w in WORD_PATTERN.findall(text.lower()) if w not in STOP_WORDS and len(w) > 1}
+
+
+def shingles(text: str, size: int = 3) -> Set[tuple]:
+    """Word n-grams used for near-duplicate detection"""
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def jaccard(a: Set, b: Set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class ContextBuilder:
+    """
+    Assemble retrieved chunks into a prompt context under a token budget
+
+    Chunks are taken in retrieval order. Near-duplicates (word 3-shingle
+    Jaccard similarity above the threshold) of an earlier chunk are
+    dropped, long chunks are trimmed to the sentences sharing words with
+    the question, and chunks are packed greedily until the budget is spent.
+    """
+
+    def __init__(
+        self,
+        token_budget: int,
+        max_chunk_tokens: int,
+        dedup_threshold: float,
+        count_tokens: Optional[Callable[[str], int]] = None
+    ):
+        self.token_budget = token_budget
+        self.max_chunk_tokens = max_chunk_tokens
+        self.dedup_threshold = dedup_threshold
+        self.count_tokens = count_tokens or get_token_counter()
+
+    @staticmethod
+    def source_header(index: int, chunk: Dict[str, Any]) -> str:
+        return f"[Source {index}] (Relevance: {chunk.get('similarity', 0):.2f})\n"
+
+    def trim_to_question(self, text: str, question_words: Set[str]) -> str:
+        """
+        Keep the sentences of text most relevant to the question
+
+        Sentences are ranked by the number of question words they contain
+        and kept, in their original order, while they fit max_chunk_tokens.
+
+        Args:
+            text: Chunk text
+            question_words: Content words of the question
+
+        Returns:
+            Trimmed text (unchanged if it already fits)
+        """
+        if self.count_tokens(text) <= self.max_chunk_tokens:
+            return text
+
+        sentences = [s.strip() for s in SENTENCE_PATTERN.split(text) if s and s.strip()]
+        ranked = sorted(
+            range(len(sentences)),
+            key=lambda i: (-len(content_words(sentences[i]) & question_words), i)
+        )
+
+        kept = set()
+        used = 0
+        for i in ranked:
+            tokens = self.count_tokens(sentences[i])
+            if used + tokens > self.max_chunk_tokens:
+                continue
+            kept.add(i)
+            used += tokens
+
+        if not kept:
+            return text
+        return " ".join(sentences[i] for i in sorted(kept))
+
+    def build(self, question: str, chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Build the prompt context
+
+        Args:
+            question: User question
+            chunks: Retrieved chunks in relevance order (ML report first)
+
+        Returns:
+            Dict with the context string, the chunks it cites (Source N is
+            chunks[N-1]) and token accounting
+        """
+        question_words = content_words(question)
+        selected = []
+        seen_shingles = []
+        tokens_before = 0
+        tokens_used = 0
+        duplicates = 0
+        over_budget = 0
+
+        for position, chunk in enumerate(chunks):
+            text = chunk.get("chunk_text", "").strip()
+            tokens_before += self.count_tokens(self.source_header(position + 1, chunk) + text)
+
+            chunk_shingles = shingles(text)
+            if any(jaccard(chunk_shingles, seen) >= self.dedup_threshold for seen in seen_shingles):
+                duplicates += 1
+                continue
+
+            # The ML report is short and always kept verbatim
+            if chunk.get("metadata", {}).get("type") != "ml_report":
+                text = self.trim_to_question(text, question_words)
+
+            header = self.source_header(len(selected) + 1, chunk)
+            cost = self.count_tokens(header + text)
+            if tokens_used + cost > self.token_budget:
+                over_budget += 1
+                continue
+
+            seen_shingles.append(chunk_shingles)
+            selected.append({**chunk, "chunk_text": text})
+            tokens_used += cost
+
+        context = "".join(
+            f"{self.source_header(i + 1, chunk)}{chunk['chunk_text']}\n\n"
+            for i, chunk in enumerate(selected)
+        )
+
+        stats = {
+            "context": context,
+            "chunks": selected,
+            "context_tokens": tokens_used,
+            "tokens_before": tokens_before,
+            "tokens_saved": max(0, tokens_before - tokens_used),
+            "duplicates_dropped": duplicates,
+            "over_budget_dropped": over_budget
+        }
+
+        logger.info(
+            "Context built",
+            chunks_in=len(chunks),
+            chunks_out=len(selected),
+            context_tokens=tokens_used,
+            tokens_saved=stats["tokens_saved"],
+            duplicates_dropped=duplicates,
+            over_budget_dropped=over_budget
+        )
+
+        return stats
+
+
+# Global context builder instance
+_context_builder = None
+
+
+def get_context_builder() -> ContextBuilder:
+    """Get context builder singleton"""
+    global _context_builder
+    if _context_builder is None:
+        _context_builder = ContextBuilder(
+            token_budget=settings.CONTEXT_TOKEN_BUDGET,
+            max_chunk_tokens=settings.CONTEXT_MAX_CHUNK_TOKENS,
+            dedup_threshold=settings.CONTEXT_DEDUP_THRESHOLD
+        )
+    return _context_builder
@@ -0,0 +1,231 @@
+"""
+Shared outbound HTTP client with connection pooling, retries and circuit breaking
+"""
+
+import asyncio
+import random
+import time
+from typing import Optional, Dict, Any, Tuple
+import httpx
+import structlog
+
+from ..config import settings
+
+logger = structlog.get_logger()
+
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is short-circuited because its service is failing"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one downstream service
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    fail fast for reset_timeout seconds. Then a single probe call is let
+    through (half-open): success closes the circuit, failure reopens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go through"""
+        state = self.state
+        if state == "open" or (state == "half_open" and self.probe_in_flight):
+            raise CircuitOpenError(f"Circuit open for {self.name}")
+        if state == "half_open":
+            self.probe_in_flight = True
+
+    def release_probe(self):
+        """Give up the half-open probe without an outcome (cancelled call)"""
+        self.probe_in_flight = False
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info("Circuit closed", service=self.name)
+        self.failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.probe_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning("Circuit opened", service=self.name, failures=self.failures)
+            self.opened_at = time.monotonic()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"state": self.state, "consecutive_failures": self.failures}
+
+
+class HTTPClient:
+    """
+    Long-lived async HTTP client shared by all outbound calls
+
+    One connection pool (HTTP keep-alive) is reused across requests and a
+    circuit breaker is kept per downstream host. Idempotent calls are
+    retried on transport errors and 429/502/503/504 with exponential
+    backoff and full jitter.
+    """
+
+    def __init__(self):
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.HTTP_DEFAULT_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_POOL_MAX_KEEPALIVE,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS
+            )
+        )
+        self.breakers: Dict[Tuple[str, Optional[int]], CircuitBreaker] = {}
+
+    def breaker_for(self, url: str) -> CircuitBreaker:
+        """Circuit breaker of the host serving url"""
+        parsed = httpx.URL(url)
+        key = (parsed.host, parsed.port)
+        if key not in self.breakers:
+            self.breakers[key] = CircuitBreaker(
+                name=f"{parsed.host}:{parsed.port}" if parsed.port else parsed.host,
+                failure_threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+                reset_timeout=settings.CIRCUIT_RESET_SECONDS
+            )
+        return self.breakers[key]
+
+    @staticmethod
+    def backoff_delay(attempt: int) -> float:
+        """Full-jitter exponential backoff in seconds"""
+        cap = min(
+            settings.HTTP_RETRY_BACKOFF_MAX_MS,
+            settings.HTTP_RETRY_BACKOFF_MS * (2 ** attempt)
+        )
+        return random.uniform(0, cap) / 1000
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        timeout: Optional[float] = None,
+        idempotent: bool = False,
+        total_timeout: Optional[float] = None,
+        **kwargs
+    ) -> httpx.Response:
+        """
+        Send a request through the shared pool
+
+        Args:
+            method: HTTP method
+            url: Absolute URL
+            timeout: Per-call timeout in seconds (default HTTP_DEFAULT_TIMEOUT)
+            idempotent: Retry on transient failures (safe to repeat)
+            total_timeout: Budget in seconds for all attempts and backoff;
+                attempts are shortened to fit and no retry starts past it
+            **kwargs: Passed to httpx (json, params, headers, ...)
+
+        Returns:
+            Response with a non-error status
+
+        Raises:
+            CircuitOpenError: The target host's circuit is open
+            httpx.HTTPError: Transport error or error status after retries
+        """
+        breaker = self.breaker_for(url)
+        retries = settings.HTTP_MAX_RETRIES if idempotent else 0
+        deadline = time.monotonic() + total_timeout if total_timeout is not None else None
+
+        def exhausted(delay: float) -> bool:
+            return attempt >= retries or (deadline is not None and time.monotonic() + delay >= deadline)
+
+        attempt = 0
+        while True:
+            breaker.before_call()
+            attempt_timeout = timeout
+            if deadline is not None:
+                remaining = max(deadline - time.monotonic(), 0.001)
+                attempt_timeout = min(attempt_timeout or settings.HTTP_DEFAULT_TIMEOUT, remaining)
+            if attempt_timeout is not None:
+                kwargs["timeout"] = httpx.Timeout(attempt_timeout, connect=min(attempt_timeout, settings.HTTP_CONNECT_TIMEOUT))
+
+            delay = self.backoff_delay(attempt)
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                breaker.record_failure()
+                if exhausted(delay):
+                    raise
+                logger.warning("Request failed, retrying", url=url, attempt=attempt + 1, error=str(e))
+            except BaseException:
+                # Cancelled (caller timeout, client disconnect): let the next call probe
+                breaker.release_probe()
+                raise
+            else:
+                if response.status_code < 500 and response.status_code != 429:
+                    breaker.record_success()
+                    response.raise_for_status()
+                    return response
+
+                breaker.record_failure()
+                if exhausted(delay) or response.status_code not in RETRYABLE_STATUS_CODES:
+                    response.raise_for_status()
+                logger.warning("Request failed, retrying", url=url, attempt=attempt + 1,
+                               status_code=response.status_code)
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def post_json(
+        self,
+        url: str,
+        payload: Dict[str, Any],
+        timeout: Optional[float] = None,
+        idempotent: bool = False,
+        total_timeout: Optional[float] = None
+    ) -> Any:
+        """POST a JSON payload and decode the JSON response"""
+        response = await self.request(
+            "POST", url, timeout=timeout, idempotent=idempotent, total_timeout=total_timeout, json=payload
+        )
+        return response.json()
+
+    async def close(self):
+        await self.client.aclose()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {breaker.name: breaker.get_stats() for breaker in self.breakers.values()}
+
+
+# Global HTTP client instance
+_http_client = None
+
+
+def get_http_client() -> HTTPClient:
+    """Get shared HTTP client singleton"""
+    global _http_client
+    if _http_client is None:
+        _http_client = HTTPClient()
+    return _http_client
+
+
+async def close_http_client():
+    """Close the shared HTTP client and its pooled connections"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.close()
+        _http_client = None
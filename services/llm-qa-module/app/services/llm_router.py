@@ -0,0 +1,272 @@
+"""
+Latency-aware router over several LLM backends with hedged requests
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Optional, Dict, Any, List, AsyncIterator
+import numpy as np
+import structlog
+
+from ..config import settings
+from ..llm import LLMWrapper, get_llm
+from .http_client import CircuitBreaker, CircuitOpenError
+
+logger = structlog.get_logger()
+
+
+class LLMBackend:
+    """One LLM backend with its health and latency statistics"""
+
+    def __init__(self, name: str, llm: LLMWrapper):
+        self.name = name
+        self.llm = llm
+        self.breaker = CircuitBreaker(
+            name=f"llm:{name}",
+            failure_threshold=settings.LLM_BACKEND_FAILURE_THRESHOLD,
+            reset_timeout=settings.LLM_BACKEND_COOLDOWN_SECONDS
+        )
+        self.in_flight = 0
+        self.ewma_ms: Optional[float] = None
+        self.latencies = deque(maxlen=settings.LLM_ROUTER_LATENCY_WINDOW)
+
+    @property
+    def available(self) -> bool:
+        state = self.breaker.state
+        return state == "closed" or (state == "half_open" and not self.breaker.probe_in_flight)
+
+    def score(self) -> float:
+        """Expected latency of one more request (lower is better)"""
+        # Backends without samples are tried first so every backend gets measured
+        if self.ewma_ms is None:
+            return float(self.in_flight)
+        return self.ewma_ms * (1 + self.in_flight)
+
+    def p95_ms(self) -> Optional[float]:
+        if len(self.latencies) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return float(np.percentile(self.latencies, 95))
+
+    def record_latency(self, latency_ms: float):
+        alpha = settings.LLM_ROUTER_EWMA_ALPHA
+        self.ewma_ms = latency_ms if self.ewma_ms is None else alpha * latency_ms + (1 - alpha) * self.ewma_ms
+        self.latencies.append(latency_ms)
+
+    async def agenerate(self, prompt: str, system_prompt: Optional[str]) -> Dict[str, Any]:
+        """Generate on this backend, updating health and latency"""
+        self.breaker.before_call()
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            response = await self.llm.agenerate(prompt, system_prompt)
+        except asyncio.CancelledError:
+            # Lost a hedge race: neither a failure nor a latency sample
+            self.breaker.release_probe()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        finally:
+            self.in_flight -= 1
+
+        self.breaker.record_success()
+        self.record_latency((time.perf_counter() - start) * 1000)
+        return {**response, "backend": self.name}
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "provider": self.llm.provider,
+            "model": self.llm._model_name(),
+            "in_flight": self.in_flight,
+            "ewma_ms": round(self.ewma_ms, 1) if self.ewma_ms is not None else None,
+            "p95_ms": self.p95_ms(),
+            **self.breaker.get_stats()
+        }
+
+
+class LLMRouter:
+    """
+    Route LLM calls to the fastest healthy backend
+
+    Backends are ranked by EWMA latency scaled by their in-flight requests.
+    A backend failing LLM_BACKEND_FAILURE_THRESHOLD times in a row is taken
+    out of rotation for LLM_BACKEND_COOLDOWN_SECONDS. When hedging is
+    enabled, a request still running after the backend's p95 latency is
+    sent to the next best backend as well; the first answer wins and the
+    other request is cancelled.
+    """
+
+    def __init__(self, backends: List[LLMBackend]):
+        if not backends:
+            raise ValueError("LLM router needs at least one backend")
+        self.backends = backends
+        self.hedged_requests = 0
+
+    def ranked(self, exclude: Optional[List[LLMBackend]] = None) -> List[LLMBackend]:
+        """Available backends, best first"""
+        exclude = exclude or []
+        candidates = [b for b in self.backends if b.available and b not in exclude]
+        return sorted(candidates, key=lambda b: b.score())
+
+    def hedge_delay(self, backend: LLMBackend) -> float:
+        """Seconds to wait on backend before hedging"""
+        p95 = backend.p95_ms()
+        delay_ms = p95 if p95 is not None else settings.LLM_HEDGE_DELAY_MS
+        return max(delay_ms, settings.LLM_HEDGE_MIN_DELAY_MS) / 1000
+
+    async def agenerate(self, prompt: str, system_prompt: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Generate on the best backend, hedging and failing over as needed
+
+        Args:
+            prompt: User prompt
+            system_prompt: Optional system prompt
+
+        Returns:
+            LLMWrapper.agenerate response plus the serving backend name and
+            whether the request was hedged
+        """
+        tried: List[LLMBackend] = []
+        pending: Dict[asyncio.Task, LLMBackend] = {}
+        hedged = False
+        hedge_checked = False
+        last_error: Optional[Exception] = None
+
+        def launch() -> bool:
+            candidates = self.ranked(exclude=tried)
+            if not candidates:
+                return False
+            backend = candidates[0]
+            tried.append(backend)
+            pending[asyncio.ensure_future(backend.agenerate(prompt, system_prompt))] = backend
+            return True
+
+        if not launch():
+            raise CircuitOpenError("No healthy LLM backend")
+
+        try:
+            while pending:
+                timeout = None
+                if settings.LLM_HEDGING_ENABLED and not hedge_checked and len(pending) == 1:
+                    timeout = self.hedge_delay(next(iter(pending.values())))
+
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # Primary is slower than its p95: race a second backend
+                    hedge_checked = True
+                    if launch():
+                        hedged = True
+                        self.hedged_requests += 1
+                        logger.info("LLM request hedged", backends=[b.name for b in pending.values()])
+                    continue
+
+                for task in done:
+                    backend = pending.pop(task)
+                    try:
+                        return {**task.result(), "hedged": hedged}
+                    except CircuitOpenError as e:
+                        last_error = e
+                    except Exception as e:
+                        last_error = e
+                        logger.warning("LLM backend failed", backend=backend.name, error=str(e))
+
+                # Fail over while other backends remain
+                if not pending:
+                    launch()
+
+            raise last_error or CircuitOpenError("No healthy LLM backend")
+
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def astream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        stats: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream from the best backend, failing over until the first chunk
+
+        Streams are not hedged. See LLMWrapper.astream for arguments.
+        """
+        tried: List[LLMBackend] = []
+        while True:
+            candidates = self.ranked(exclude=tried)
+            if not candidates:
+                raise CircuitOpenError("No healthy LLM backend")
+            backend = candidates[0]
+            tried.append(backend)
+
+            backend.breaker.before_call()
+            backend.in_flight += 1
+            start = time.perf_counter()
+            started = False
+            try:
+                async for chunk in backend.llm.astream(prompt, system_prompt, stats=stats):
+                    started = True
+                    yield chunk
+            except Exception as e:
+                backend.breaker.record_failure()
+                logger.warning("LLM backend stream failed", backend=backend.name, error=str(e))
+                if started:
+                    raise
+                continue
+            finally:
+                backend.in_flight -= 1
+                backend.breaker.release_probe()
+
+            backend.breaker.record_success()
+            backend.record_latency((time.perf_counter() - start) * 1000)
+            if stats is not None:
+                stats["backend"] = backend.name
+            return
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "hedging_enabled": settings.LLM_HEDGING_ENABLED,
+            "hedged_requests": self.hedged_requests,
+            "backends": {b.name: b.get_stats() for b in self.backends}
+        }
+
+
+def build_backends() -> List[LLMBackend]:
+    """
+    Backends from LLM_BACKENDS, or the default LLM when none are configured
+
+    Backends that fail to initialize are skipped.
+    """
+    if not settings.LLM_BACKENDS:
+        return [LLMBackend(settings.LLM_PROVIDER, get_llm())]
+
+    backends = []
+    for config in settings.LLM_BACKENDS:
+        name = config.get("name") or f"{config['provider']}:{config.get('base_url') or config.get('model')}"
+        try:
+            llm = LLMWrapper(
+                provider=config["provider"],
+                model_name=config.get("model"),
+                base_url=config.get("base_url"),
+                max_concurrency=config.get("max_concurrency")
+            )
+            backends.append(LLMBackend(name, llm))
+        except Exception as e:
+            logger.error("LLM backend unavailable", backend=name, error=str(e))
+
+    return backends
+
+
+# Global LLM router instance
+_llm_router = None
+
+
+def get_llm_router() -> LLMRouter:
+    """Get LLM router singleton"""
+    global _llm_router
+    if _llm_router is None:
+        _llm_router = LLMRouter(build_backends())
+        logger.info("LLM router initialized", backends=[b.name for b in _llm_router.backends])
+    return _llm_router
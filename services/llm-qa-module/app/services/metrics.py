@@ -0,0 +1,64 @@
+"""
+Prometheus histograms of QA latency and token usage
+"""
+
+from typing import Dict, Optional
+from prometheus_client import Histogram, Counter
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+QA_STAGE_SECONDS = Histogram(
+    "qa_stage_duration_seconds",
+    "Duration of each QA pipeline stage",
+    ["stage"],
+    buckets=STAGE_BUCKETS
+)
+
+QA_TOKENS = Histogram(
+    "qa_tokens",
+    "Tokens per QA request",
+    ["kind"],
+    buckets=TOKEN_BUCKETS
+)
+
+QA_REQUESTS = Counter(
+    "qa_requests_total",
+    "QA requests by outcome",
+    ["outcome"]
+)
+
+QA_COALESCED = Counter(
+    "qa_coalesced_requests_total",
+    "QA requests served by an identical in-flight request"
+)
+
+STAGES = ("retrieval", "ml_enrichment", "context_build", "time_to_first_token", "generation", "total")
+TOKEN_KINDS = ("prompt", "completion", "context", "context_saved")
+
+
+def observe_query(timings_ms: Dict[str, Optional[int]], tokens: Dict[str, Optional[int]], outcome: str):
+    """
+    Record one QA request
+
+    Args:
+        timings_ms: Milliseconds per stage (missing or None stages are skipped)
+        tokens: Token counts per kind (missing or None kinds are skipped)
+        outcome: answered, cached, no_context or error
+    """
+    for stage in STAGES:
+        value = timings_ms.get(stage)
+        if value is not None:
+            QA_STAGE_SECONDS.labels(stage=stage).observe(value / 1000)
+
+    for kind in TOKEN_KINDS:
+        value = tokens.get(kind)
+        if value is not None:
+            QA_TOKENS.labels(kind=kind).observe(value)
+
+    QA_REQUESTS.labels(outcome=outcome).inc()
+
+
+def record_coalesced():
+    """Count a request that joined an identical in-flight request"""
+    QA_COALESCED.inc()
@@ -0,0 +1,115 @@
+"""
+ML predictor client for risk enrichment of QA context
+"""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+import httpx
+import structlog
+
+from ..config import settings
+from .http_client import get_http_client
+
+logger = structlog.get_logger()
+
+
+def feature_version(features: Dict[str, Any]) -> str:
+    """Content hash identifying one version of a patient's features"""
+    payload = json.dumps(features, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+class MLPredictionClient:
+    """
+    Fetch risk predictions from the ml-predictor service
+
+    Predictions are cached per (patient, model type, feature version) with
+    a TTL and LRU eviction, so repeated questions about a patient reuse the
+    prediction until the patient's features change. Calls are bounded by
+    ML_PREDICTION_TIMEOUT; a slow or failing predictor yields no prediction
+    instead of delaying the answer.
+    """
+
+    def __init__(self):
+        self.predict_url = f"{settings.ML_PREDICTOR_SERVICE_URL}/api/predict"
+        self.cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+
+    def _cached(self, key: tuple) -> Optional[Dict[str, Any]]:
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        if entry["expires_at"] <= time.monotonic():
+            del self.cache[key]
+            return None
+        self.cache.move_to_end(key)
+        return entry["prediction"]
+
+    def _store(self, key: tuple, prediction: Dict[str, Any]):
+        self.cache[key] = {
+            "prediction": prediction,
+            "expires_at": time.monotonic() + settings.ML_PREDICTION_CACHE_TTL_SECONDS
+        }
+        self.cache.move_to_end(key)
+        while len(self.cache) > settings.ML_PREDICTION_CACHE_SIZE:
+            self.cache.popitem(last=False)
+
+    async def get_prediction(self, patient_id: str, features: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Risk prediction for a patient
+
+        Args:
+            patient_id: Patient identifier
+            features: Patient clinical features (ml-predictor PatientFeatures
+                fields other than patient_id)
+
+        Returns:
+            ml-predictor PredictionResponse as a dict, or None if the
+            predictor failed or timed out
+        """
+        key = (patient_id, settings.ML_PREDICTION_MODEL_TYPE, feature_version(features))
+        prediction = self._cached(key)
+        if prediction is not None:
+            return prediction
+
+        payload = {
+            "patient_features": {**features, "patient_id": patient_id},
+            "model_type": settings.ML_PREDICTION_MODEL_TYPE,
+            "explain": True
+        }
+
+        try:
+            # Predictions are pure functions of the features, so retries are
+            # safe; they must fit in the same overall budget
+            prediction = await get_http_client().post_json(
+                self.predict_url,
+                payload,
+                idempotent=True,
+                total_timeout=settings.ML_PREDICTION_TIMEOUT
+            )
+        except httpx.TimeoutException:
+            logger.warning("ML prediction timed out", patient_id=patient_id, timeout=settings.ML_PREDICTION_TIMEOUT)
+            return None
+        except Exception as e:
+            logger.warning("Failed to fetch ML prediction", patient_id=patient_id, error=str(e))
+            return None
+
+        self._store(key, prediction)
+        return prediction
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"cached_predictions": len(self.cache)}
+
+
+# Global prediction client instance
+_prediction_client = None
+
+
+def get_prediction_client() -> MLPredictionClient:
+    """Get ML prediction client singleton"""
+    global _prediction_client
+    if _prediction_client is None:
+        _prediction_client = MLPredictionClient()
+    return _prediction_client
@@ -2,22 +2,37 @@
 RAG (Retrieval Augmented Generation) pipeline
 """
 
-import httpx
-from typing import List, Dict, Any
+import asyncio
+import json
+import time
+from typing import List, Dict, Any, Optional
+import numpy as np
 import structlog
 
 from ..config import settings
-from ..llm import get_llm
+from .http_client import get_http_client
+from .llm_router import get_llm_router
+from .answer_cache import get_answer_cache, embed_question, context_fingerprint, normalize_question
+from .context_builder import get_context_builder
+from .metrics import observe_query, record_coalesced
+from .ml_enrichment import get_prediction_client, feature_version
 
 logger = structlog.get_logger()
 
 
+def elapsed_ms(start: float) -> int:
+    """Milliseconds since a time.perf_counter() reading"""
+    return int((time.perf_counter() - start) * 1000)
+
+
 class RAGPipeline:
     """RAG pipeline for question answering"""
     
     def __init__(self):
-        self.llm = get_llm()
+        self.llm = get_llm_router()
         self.search_url = f"{settings.SEARCH_SERVICE_URL}/api/v1/search/search"
+        # Identical questions being answered right now, by coalescing key
+        self.in_flight: Dict[str, asyncio.Task] = {}
     
     async def retrieve_context(self, query: str, filters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
         """
@@ -42,41 +57,24 @@ class RAGPipeline:
             if filters:
                 payload["filters"] = filters
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.search_url,
-                    json=payload,
-                    timeout=30.0
-                )
-                
-                response.raise_for_status()
-                data = response.json()
-                
-                chunks = data.get("results", [])
-
-
-                
-                logger.info("Context retrieved", chunks_found=len(chunks))
-                
-                return chunks
+            # Search is read-only, so transient failures are retried
+            data = await get_http_client().post_json(
+                self.search_url,
+                payload,
+                timeout=settings.SEARCH_REQUEST_TIMEOUT,
+                idempotent=True
+            )
+            
+            chunks = data.get("results", [])
+            
+            logger.info("Context retrieved", chunks_found=len(chunks))
+            
+            return chunks
                 
         except Exception as e:
             logger.error("Context retrieval failed", error=str(e))
             raise
 
-    # ... (format_context and build_prompt unchanged)
-
-    # Re-adding missing methods
-    def format_context(self, chunks: List[Dict[str, Any]]) -> str:
-        """
-        Format retrieved chunks into context string
-        """
-        context = ""
-        for i, chunk in enumerate(chunks):
-            context += f"[Source {i+1}] (Relevance: {chunk.get('similarity', 0):.2f})\n"
-            context += f"{chunk.get('chunk_text', '').strip()}\n\n"
-        return context
-
     def build_prompt(self, question: str, context: str) -> str:
         """
         Build prompt for LLM
@@ -91,121 +89,294 @@ Context:
 Question: {question}
 Answer:"""
 
+    async def _gather_context(
+        self,
+        question: str,
+        filters: Optional[Dict[str, Any]],
+        timings: Dict[str, Optional[int]],
+        patient_features: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Retrieve chunks, embed the question for the cache and fetch the ML
+        prediction concurrently, then add the prediction as a context chunk
+        
+        Returns:
+            (chunks, question embedding or None)
+        """
+        async def timed(stage: str, coro):
+            stage_start = time.perf_counter()
+            try:
+                return await coro
+            finally:
+                timings[stage] = elapsed_ms(stage_start)
+        
+        patient_id = (filters or {}).get("patient_id")
+        enrichment = self._get_prediction(patient_id, patient_features)
+        if patient_id and patient_features:
+            enrichment = timed("ml_enrichment", enrichment)
+        
+        # 1. Retrieval, question embedding and ML prediction run side by side
+        chunks, question_embedding, prediction = await asyncio.gather(
+            timed("retrieval", self.retrieve_context(question, filters)),
+            self._embed_for_cache(question),
+            enrichment
+        )
+        
+        # 2. ML Prediction Integration (EARLY INJECTION)
+        if prediction:
+            # Add as a priority chunk
+            chunks.insert(0, self._ml_report_chunk(patient_id, prediction))
+        
+        return chunks, question_embedding
+    
+    def _ml_report_chunk(self, patient_id: str, prediction: Dict[str, Any]) -> Dict[str, Any]:
+        """Format an ML prediction as a context chunk"""
+        risk_level = prediction.get("risk_category", "unknown").upper()
+        score = prediction.get("prediction", 0)
+        factors = prediction.get("top_risk_factors", [])
+        
+        factor_text = ", ".join([f"{f['feature']} (contrib: {f['contribution']:.2f})" for f in factors[:3]])
+        
+        ml_context = (
+            f"[ML PREDICTION REPORT]\n"
+            f"Patient: {patient_id}\n"
+            f"Readmission Risk: {risk_level} ({score:.1%})\n"
+            f"Top Risk Factors: {factor_text}\n"
+            f"Model Confidence: {prediction.get('confidence', 0):.1%}\n"
+        )
+        logger.info("ML Prediction fetched", patient_id=patient_id, risk=risk_level)
+        
+        return {
+            "chunk_id": "cccccccc-cccc-cccc-cccc-cccccccccc01",
+            "document_id": "cccccccc-cccc-cccc-cccc-cccccccccccc",
+            "chunk_text": ml_context,
+            "similarity": 1.0,
+            "metadata": {"type": "ml_report"}
+        }
+    
+    def _build_result(
+        self,
+        llm_response: Dict[str, Any],
+        built: Dict[str, Any],
+        chunks: List[Dict[str, Any]],
+        include_sources: bool
+    ) -> Dict[str, Any]:
+        """Answer payload from the LLM response and the context it was given"""
+        # 9. Extract citations
+        citations = self._extract_citations(
+            llm_response["response"],
+            built["chunks"]
+        ) if include_sources else []
+        
+        return {
+            "answer": llm_response["response"],
+            "sources": citations,
+            "chunks_retrieved": len(chunks),
+            "tokens_used": llm_response.get("tokens_used", 0),
+            "prompt_tokens": llm_response.get("prompt_tokens", 0),
+            "completion_tokens": llm_response.get("completion_tokens", 0),
+            "token_count_source": llm_response.get("token_count_source"),
+            "model": llm_response.get("model"),
+            "llm_backend": llm_response.get("backend"),
+            "has_answer": True,
+            "cached": False,
+            "context_tokens": built["context_tokens"],
+            "context_tokens_saved": built["tokens_saved"],
+            "retrieved_chunks": [
+                {
+                    "chunk_id": c.get("chunk_id"),
+                    "document_id": c.get("document_id"),
+                    "similarity": c.get("similarity"),
+                    "text": c.get("chunk_text", "")[:200] + "..."  # Preview
+                }
+                for c in chunks
+            ]
+        }
+    
+    @staticmethod
+    def _source_previews(context_chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Sources event payload; Source N is context_chunks[N-1] as cited in the prompt"""
+        return [
+            {
+                "source_id": f"Source {i + 1}",
+                "chunk_id": c.get("chunk_id"),
+                "document_id": c.get("document_id"),
+                "similarity": c.get("similarity"),
+                "text": c.get("chunk_text", "")[:200] + "..."  # Preview
+            }
+            for i, c in enumerate(context_chunks)
+        ]
+    
+    def _no_context_result(self) -> Dict[str, Any]:
+        return {
+            "answer": "I don't have enough information in the available documents to answer this question.",
+            "sources": [],
+            "chunks_retrieved": 0,
+            "has_answer": False
+        }
+    
+    def _cached_result(self, cached: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            **cached,
+            "tokens_used": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "cached": True
+        }
+    
+    def _observe_answer(self, result: Dict[str, Any], built: Dict[str, Any], timings: Dict[str, Optional[int]]):
+        observe_query(timings, {
+            "prompt": result["prompt_tokens"],
+            "completion": result["completion_tokens"],
+            "context": built["context_tokens"],
+            "context_saved": built["tokens_saved"]
+        }, "answered")
+    
+    def _coalescing_key(
+        self,
+        question: str,
+        include_sources: bool,
+        filters: Optional[Dict[str, Any]],
+        patient_features: Optional[Dict[str, Any]]
+    ) -> str:
+        return json.dumps([
+            normalize_question(question),
+            filters or {},
+            include_sources,
+            feature_version(patient_features) if patient_features else None
+        ], sort_keys=True, default=str)
+    
     async def answer_question(
         self,
         question: str,
         include_sources: bool = True,
-        filters: Dict[str, Any] = None
+        filters: Dict[str, Any] = None,
+        patient_features: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """
         Answer question using RAG pipeline
         
+        Concurrent calls with the same normalized question, filters and
+        options share one computation (single-flight): the first caller
+        runs the pipeline and the others await its result. A caller that
+        is cancelled does not cancel the shared computation.
+        
         Args:
             question: User question
             include_sources: Whether to include source citations
             filters: Optional metadata filters
+            patient_features: Optional clinical features of filters["patient_id"]
+                for ML risk enrichment
             
         Returns:
-            Dict with answer, sources, and metadata
+            Dict with answer, sources, metadata, per-stage timings (ms) and
+            token counts
         """
+        if not settings.QA_COALESCE_REQUESTS:
+            return await self._answer_question(question, include_sources, filters, patient_features)
+        
+        key = self._coalescing_key(question, include_sources, filters, patient_features)
+        task = self.in_flight.get(key)
+        coalesced = task is not None
+        
+        if coalesced:
+            record_coalesced()
+            logger.info("Question coalesced with in-flight request")
+        else:
+            task = asyncio.ensure_future(
+                self._answer_question(question, include_sources, filters, patient_features)
+            )
+            self.in_flight[key] = task
+            task.add_done_callback(lambda done: self.in_flight.pop(key, None))
+        
+        result = await asyncio.shield(task)
+        if coalesced:
+            # Tokens were spent (and are accounted) by the first caller
+            return {**result, "tokens_used": 0, "prompt_tokens": 0, "completion_tokens": 0, "coalesced": True}
+        return {**result, "coalesced": False}
+    
+    async def _answer_question(
+        self,
+        question: str,
+        include_sources: bool,
+        filters: Optional[Dict[str, Any]],
+        patient_features: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Run the RAG pipeline for one question"""
+        request_start = time.perf_counter()
+        timings = {}
+        
         try:
-            # 1. Retrieve relevant chunks
-            chunks = await self.retrieve_context(question, filters)
-
-            # 2. ML Prediction Integration (EARLY INJECTION)
-            if filters and "patient_id" in filters:
-                try:
-                    patient_id = filters["patient_id"]
-                    prediction = await self._get_prediction(patient_id)
-                    if prediction:
-                        risk_level = prediction.get("risk_category", "unknown").upper()
-                        score = prediction.get("prediction", 0)
-                        factors = prediction.get("top_risk_factors", [])
-                        
-                        factor_text = ", ".join([f"{f['feature']} (contrib: {f['contribution']:.2f})" for f in factors[:3]])
-                        
-                        ml_context = (
-                            f"[ML PREDICTION REPORT]\n"
-                            f"Patient: {patient_id}\n"
-                            f"Readmission Risk: {risk_level} ({score:.1%})\n"
-                            f"Top Risk Factors: {factor_text}\n"
-                            f"Model Confidence: {prediction.get('confidence', 0):.1%}\n"
-                        )
-                        logger.info("ML Prediction fetched", patient_id=patient_id, risk=risk_level)
-                        
-                        # Add as a priority chunk
-                        chunks.insert(0, {
-                            "chunk_id": "cccccccc-cccc-cccc-cccc-cccccccccc01",
-                            "document_id": "cccccccc-cccc-cccc-cccc-cccccccccccc",
-                            "chunk_text": ml_context,
-                            "similarity": 1.0,
-                            "metadata": {"type": "ml_report"}
-                        })
-                        
-                except Exception as e:
-                    print(f"CRITICAL ML ERROR: {e}")
-                    logger.warning("Failed to fetch ML prediction", error=str(e))
+            chunks, question_embedding = await self._gather_context(question, filters, timings, patient_features)
             
             if not chunks:
-                return {
-                    "answer": "I don't have enough information in the available documents to answer this question.",
-                    "sources": [],
-                    "chunks_retrieved": 0,
-                    "has_answer": False
-                }
-            
-            # 2. Format context
-            context = self.format_context(chunks)
+                timings["total"] = elapsed_ms(request_start)
+                observe_query(timings, {}, "no_context")
+                return {**self._no_context_result(), "timings": timings}
             
+            # Reuse the answer of a similar question over the same context
+            cache = get_answer_cache() if settings.ANSWER_CACHE_ENABLED else None
+            if cache is not None:
+                scope = cache.scope_key(filters, context_fingerprint(chunks), include_sources=include_sources)
+                cached = cache.lookup(scope, question, question_embedding)
+                if cached is not None:
+                    timings["total"] = elapsed_ms(request_start)
+                    observe_query(timings, {}, "cached")
+                    logger.info("Answer cache hit", chunks=len(chunks))
+                    return {**self._cached_result(cached), "timings": timings}
             
-            # 7. Format context (now includes ML report)
-            context = self.format_context(chunks)
-            prompt = self.build_prompt(question, context)
+            # 7. Build the context (now includes ML report) under the token budget
+            stage_start = time.perf_counter()
+            built = get_context_builder().build(question, chunks)
+            prompt = self.build_prompt(question, built["context"])
+            timings["context_build"] = elapsed_ms(stage_start)
             
             # 8. Generate answer
-            llm_response = self.llm.generate(
+            llm_response = await self.llm.agenerate(
                 prompt=prompt,
                 system_prompt=settings.SYSTEM_PROMPT
             )
+            timings["time_to_first_token"] = llm_response.get("ttft_ms")
+            timings["generation"] = llm_response.get("generation_ms")
             
-            # 9. Extract citations
-            citations = self._extract_citations(
-                llm_response["response"],
-                chunks
-            ) if include_sources else []
+            result = self._build_result(llm_response, built, chunks, include_sources)
             
-            return {
-                "answer": llm_response["response"],
-                "sources": citations,
-                "chunks_retrieved": len(chunks),
-                "tokens_used": llm_response.get("tokens_used", 0),
-                "model": llm_response.get("model"),
-                "has_answer": True,
-                "retrieved_chunks": [
-                    {
-                        "chunk_id": c.get("chunk_id"),
-                        "document_id": c.get("document_id"),
-                        "similarity": c.get("similarity"),
-                        "text": c.get("chunk_text", "")[:200] + "..."  # Preview
-                    }
-                    for c in chunks
-                ]
-            }
+            if cache is not None:
+                cache.store(scope, question, result, question_embedding)
+            
+            timings["total"] = elapsed_ms(request_start)
+            self._observe_answer(result, built, timings)
+            
+            return {**result, "timings": timings}
             
         except Exception as e:
-            logger.error("Question answering failed", error=str(e))
+            timings["total"] = elapsed_ms(request_start)
+            observe_query(timings, {}, "error")
+            logger.error("Question answering failed", error=str(e), timings=timings)
             raise
     
-    async def _get_prediction(self, patient_id: str) -> Dict[str, Any]:
+    async def _embed_for_cache(self, question: str) -> Optional[np.ndarray]:
+        """Question embedding for the answer cache (None if disabled or unavailable)"""
+        if not settings.ANSWER_CACHE_ENABLED:
+            return None
+        try:
+            return await embed_question(question)
+        except Exception as e:
+            logger.warning("Question embedding failed", error=str(e))
+            return None
+    
+    async def _get_prediction(
+        self,
+        patient_id: Optional[str],
+        patient_features: Optional[Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
         """
-        Get prediction from ML service
+        Get prediction from ML service (None without a patient and features)
         """
-        # Real patient features fetching needs to be implemented here.
-        # Previously relied on mock data which has been removed.
-        return None
-
-
-
+        if not patient_id or not patient_features or not settings.ENABLE_ML_ENRICHMENT:
+            return None
+        return await get_prediction_client().get_prediction(patient_id, patient_features)
+    
     # ... (rest of methods)
     
     def _extract_citations(
@@ -249,35 +420,92 @@ Answer:"""
         
         return citations
     
-    async def answer_question_stream(self, question: str):
+    async def answer_question_stream(
+        self,
+        question: str,
+        include_sources: bool = True,
+        filters: Dict[str, Any] = None,
+        patient_features: Optional[Dict[str, Any]] = None
+    ):
         """
         Stream answer for real-time display
         
+        Sources (when include_sources is set) are emitted as soon as the
+        context is assembled, then text deltas as the LLM produces them,
+        then the complete answer. Closing
+        the generator (client disconnect) closes the provider stream, which
+        stops generation.
+        
         Args:
             question: User question
+            include_sources: Whether to include source citations
+            filters: Optional metadata filters
+            patient_features: Optional clinical features for ML risk enrichment
             
         Yields:
-            Chunks of generated answer
+            Events {"type": "sources" | "delta" | "done" | "error", "content": ...}
         """
-        # 1. Retrieve context
-        chunks = await self.retrieve_context(question)
-        
-        if not chunks:
-            yield {
-                "type": "error",
-                "content": "No relevant information found"
-            }
-            return
-        
-        # 2. Build prompt
-        context = self.format_context(chunks)
-        prompt = self.build_prompt(question, context)
-        
-        # 3. Stream response
-        yield {"type": "sources", "content": chunks}
+        request_start = time.perf_counter()
+        timings = {}
         
-        for chunk in self.llm.generate_stream(prompt, settings.SYSTEM_PROMPT):
-            yield {"type": "text", "content": chunk}
+        try:
+            chunks, question_embedding = await self._gather_context(question, filters, timings, patient_features)
+            
+            if not chunks:
+                timings["total"] = elapsed_ms(request_start)
+                observe_query(timings, {}, "no_context")
+                result = self._no_context_result()
+                yield {"type": "delta", "content": result["answer"]}
+                yield {"type": "done", "content": {**result, "timings": timings}}
+                return
+            
+            cache = get_answer_cache() if settings.ANSWER_CACHE_ENABLED else None
+            if cache is not None:
+                scope = cache.scope_key(filters, context_fingerprint(chunks), include_sources=include_sources)
+                cached = cache.lookup(scope, question, question_embedding)
+                if cached is not None:
+                    timings["total"] = elapsed_ms(request_start)
+                    observe_query(timings, {}, "cached")
+                    if include_sources:
+                        # Same chunks as the cached answer's, so the same numbered sources
+                        built = get_context_builder().build(question, chunks)
+                        yield {"type": "sources", "content": self._source_previews(built["chunks"])}
+                    yield {"type": "delta", "content": cached["answer"]}
+                    yield {"type": "done", "content": {**self._cached_result(cached), "timings": timings}}
+                    return
+            
+            stage_start = time.perf_counter()
+            built = get_context_builder().build(question, chunks)
+            prompt = self.build_prompt(question, built["context"])
+            timings["context_build"] = elapsed_ms(stage_start)
+            
+            if include_sources:
+                yield {"type": "sources", "content": self._source_previews(built["chunks"])}
+            
+            stats = {}
+            pieces = []
+            async for delta in self.llm.astream(prompt, settings.SYSTEM_PROMPT, stats=stats):
+                pieces.append(delta)
+                yield {"type": "delta", "content": delta}
+            
+            timings["time_to_first_token"] = stats.get("ttft_ms")
+            timings["generation"] = stats.get("generation_ms")
+            
+            result = self._build_result({**stats, "response": "".join(pieces)}, built, chunks, include_sources)
+            
+            if cache is not None:
+                cache.store(scope, question, result, question_embedding)
+            
+            timings["total"] = elapsed_ms(request_start)
+            self._observe_answer(result, built, timings)
+            
+            yield {"type": "done", "content": {**result, "timings": timings}}
+            
+        except Exception as e:
+            timings["total"] = elapsed_ms(request_start)
+            observe_query(timings, {}, "error")
+            logger.error("Streaming answer failed", error=str(e), timings=timings)
+            yield {"type": "error", "content": str(e)}
 
 
 # Global RAG pipeline instance
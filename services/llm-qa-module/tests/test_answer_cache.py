@@ -0,0 +1,90 @@
+"""
+Tests for the semantic answer cache
+"""
+
+import numpy as np
+
+from app.services.answer_cache import AnswerCache, context_fingerprint
+
+CHUNKS = [{"chunk_id": "c1", "chunk_text": "Metformin 500mg twice daily."}]
+
+
+def unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def make_cache(**kwargs):
+    options = {"max_entries": 10, "ttl_seconds": 60, "similarity_threshold": 0.95, **kwargs}
+    return AnswerCache(**options)
+
+
+def scope(filters=None, chunks=CHUNKS, **options):
+    return AnswerCache.scope_key(filters, context_fingerprint(chunks), include_sources=True, **options)
+
+
+def test_normalized_question_hits():
+    cache = make_cache()
+    cache.store(scope({"patient_id": "p1"}), "What is the dose?", {"answer": "500mg"})
+
+    assert cache.lookup(scope({"patient_id": "p1"}), "  what is the DOSE? ") == {"answer": "500mg"}
+    assert cache.get_stats()["hits"] == 1
+
+
+def test_other_filters_or_options_miss():
+    cache = make_cache()
+    cache.store(scope({"patient_id": "p1"}), "What is the dose?", {"answer": "500mg"})
+
+    assert cache.lookup(scope({"patient_id": "p2"}), "What is the dose?") is None
+    assert cache.lookup(scope({"patient_id": "p1"}, include_ml=False), "What is the dose?") is None
+
+
+def test_changed_context_misses():
+    cache = make_cache()
+    cache.store(scope(), "What is the dose?", {"answer": "500mg"})
+    updated = [{"chunk_id": "c1", "chunk_text": "Metformin 1000mg twice daily."}]
+
+    assert context_fingerprint(updated) != context_fingerprint(CHUNKS)
+    assert cache.lookup(scope(chunks=updated), "What is the dose?") is None
+
+
+def test_similar_question_embedding_hits():
+    cache = make_cache()
+    cache.store(scope(), "What is the dose?", {"answer": "500mg"}, unit(1, 0, 0))
+
+    assert cache.lookup(scope(), "Which dose is prescribed?", unit(1, 0.1, 0)) == {"answer": "500mg"}
+
+
+def test_dissimilar_question_embedding_misses():
+    cache = make_cache()
+    cache.store(scope(), "What is the dose?", {"answer": "500mg"}, unit(1, 0, 0))
+
+    assert cache.lookup(scope(), "Any allergies?", unit(1, 1, 0)) is None
+    assert cache.lookup(scope(), "Any allergies?") is None  # No embedding: exact match only
+    assert cache.get_stats()["misses"] == 2
+
+
+def test_similarity_is_limited_to_the_scope():
+    cache = make_cache()
+    cache.store(scope({"patient_id": "p1"}), "What is the dose?", {"answer": "500mg"}, unit(1, 0, 0))
+
+    assert cache.lookup(scope({"patient_id": "p2"}), "What is the dose?", unit(1, 0, 0)) is None
+
+
+def test_expired_entries_miss():
+    cache = make_cache(ttl_seconds=0)
+    cache.store(scope(), "What is the dose?", {"answer": "500mg"})
+
+    assert cache.lookup(scope(), "What is the dose?") is None
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = make_cache(max_entries=2)
+    cache.store(scope(), "first", {"answer": 1})
+    cache.store(scope(), "second", {"answer": 2})
+    cache.lookup(scope(), "first")
+    cache.store(scope(), "third", {"answer": 3})
+
+    assert cache.lookup(scope(), "second") is None
+    assert cache.lookup(scope(), "first") == {"answer": 1}
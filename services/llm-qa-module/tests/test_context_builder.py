@@ -0,0 +1,70 @@
+"""
+Tests for token-budgeted context assembly
+"""
+
+from app.services.context_builder import ContextBuilder
+
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+
+def make_builder(token_budget=1000, max_chunk_tokens=1000, dedup_threshold=0.8):
+    return ContextBuilder(token_budget, max_chunk_tokens, dedup_threshold, count_tokens=count_words)
+
+
+def chunk(chunk_id, text, **metadata):
+    return {"chunk_id": chunk_id, "chunk_text": text, "similarity": 0.9, "metadata": metadata}
+
+
+def test_near_duplicates_are_dropped():
+    text = "Blood pressure was measured twice and remained elevated at the follow up visit"
+    built = make_builder().build("blood pressure", [
+        chunk("a", text),
+        chunk("b", text + " today"),
+        chunk("c", "Metformin was started for type two diabetes")
+    ])
+
+    assert [c["chunk_id"] for c in built["chunks"]] == ["a", "c"]
+    assert built["duplicates_dropped"] == 1
+
+
+def test_chunks_are_packed_under_the_budget():
+    chunks = [chunk(str(i), " ".join(f"word{i}x{j}" for j in range(20))) for i in range(3)]
+    builder = make_builder(token_budget=60)
+
+    built = builder.build("question", chunks)
+
+    assert [c["chunk_id"] for c in built["chunks"]] == ["0", "1"]
+    assert built["over_budget_dropped"] == 1
+    assert built["context_tokens"] <= 60
+    assert built["tokens_saved"] == built["tokens_before"] - built["context_tokens"]
+    assert "[Source 1]" in built["context"] and "[Source 2]" in built["context"]
+    assert "[Source 3]" not in built["context"]
+
+
+def test_sources_are_renumbered_after_drops():
+    text = "Heart rate was regular and no murmur was heard on auscultation today"
+    built = make_builder().build("heart", [chunk("a", text), chunk("b", text), chunk("c", "Renal function stable")])
+
+    assert built["context"].index("[Source 2]") > built["context"].index("Heart rate")
+    assert "Renal function stable" in built["context"].split("[Source 2]")[1]
+
+
+def test_long_chunks_keep_sentences_about_the_question():
+    text = (
+        "The patient walked to the clinic. "
+        "Insulin dose was increased to twenty units. "
+        "Weather was sunny. "
+        "Insulin was well tolerated."
+    )
+    built = make_builder(max_chunk_tokens=12).build("What insulin dose?", [chunk("a", text)])
+
+    assert built["chunks"][0]["chunk_text"] == "Insulin dose was increased to twenty units. Insulin was well tolerated."
+
+
+def test_ml_report_is_kept_verbatim():
+    report = "ML risk assessment: readmission risk high (0.82). Top factors: age, prior admissions, HbA1c."
+    built = make_builder(max_chunk_tokens=3).build("risk", [chunk("ml", report, type="ml_report")])
+
+    assert built["chunks"][0]["chunk_text"] == report
@@ -0,0 +1,160 @@
+"""
+Tests for the shared HTTP client's circuit breaker
+"""
+
+import asyncio
+import httpx
+import pytest
+
+from app.config import settings
+from app.services.http_client import CircuitBreaker, CircuitOpenError, HTTPClient
+
+URL = "http://predictor:8000/api/predict"
+
+
+def make_client(monkeypatch, handler) -> HTTPClient:
+    monkeypatch.setattr(settings, "CIRCUIT_FAILURE_THRESHOLD", 2)
+    monkeypatch.setattr(settings, "CIRCUIT_RESET_SECONDS", 30)
+    monkeypatch.setattr(settings, "HTTP_MAX_RETRIES", 0)
+    client = HTTPClient()
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+def expire_cooldown(breaker: CircuitBreaker):
+    breaker.opened_at -= breaker.reset_timeout
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("svc", failure_threshold=2, reset_timeout=30)
+
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker("svc", failure_threshold=2, reset_timeout=30)
+
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert breaker.state == "closed"
+
+
+def test_half_open_lets_a_single_probe_through():
+    breaker = CircuitBreaker("svc", failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    expire_cooldown(breaker)
+
+    assert breaker.state == "half_open"
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_failed_probe_reopens_circuit():
+    breaker = CircuitBreaker("svc", failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    expire_cooldown(breaker)
+
+    breaker.before_call()
+    breaker.record_failure()
+
+    assert breaker.state == "open"
+    assert not breaker.probe_in_flight
+
+
+def test_client_opens_circuit_and_recovers(monkeypatch):
+    healthy = False
+
+    def handler(request):
+        return httpx.Response(200, json={"ok": True}) if healthy else httpx.Response(503)
+
+    client = make_client(monkeypatch, handler)
+
+    async def run():
+        nonlocal healthy
+        for _ in range(2):
+            with pytest.raises(httpx.HTTPStatusError):
+                await client.post_json(URL, {})
+        with pytest.raises(CircuitOpenError):
+            await client.post_json(URL, {})
+
+        breaker = client.breaker_for(URL)
+        expire_cooldown(breaker)
+        healthy = True
+        assert await client.post_json(URL, {}) == {"ok": True}
+        assert breaker.state == "closed"
+
+    asyncio.run(run())
+
+
+def test_cancelled_probe_releases_half_open_circuit(monkeypatch):
+    slow = True
+
+    async def handler(request):
+        if slow:
+            await asyncio.sleep(10)
+        return httpx.Response(200, json={"ok": True})
+
+    client = make_client(monkeypatch, handler)
+    breaker = client.breaker_for(URL)
+    breaker.record_failure()
+    breaker.record_failure()
+    expire_cooldown(breaker)
+
+    async def run():
+        nonlocal slow
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(client.post_json(URL, {}), timeout=0.05)
+
+        assert breaker.state == "half_open"
+        assert not breaker.probe_in_flight
+
+        slow = False
+        assert await client.post_json(URL, {}) == {"ok": True}
+        assert breaker.state == "closed"
+
+    asyncio.run(run())
+
+
+def test_retries_fit_in_total_timeout(monkeypatch):
+    calls = 0
+
+    def handler(request):
+        nonlocal calls
+        calls += 1
+        return httpx.Response(503) if calls == 1 else httpx.Response(200, json={"ok": True})
+
+    client = make_client(monkeypatch, handler)
+    monkeypatch.setattr(settings, "HTTP_MAX_RETRIES", 2)
+    monkeypatch.setattr(settings, "HTTP_RETRY_BACKOFF_MS", 1)
+
+    result = asyncio.run(client.post_json(URL, {}, idempotent=True, total_timeout=1.0))
+
+    assert result == {"ok": True}
+    assert calls == 2
+
+
+def test_no_retry_starts_past_total_timeout(monkeypatch):
+    calls = 0
+
+    def handler(request):
+        nonlocal calls
+        calls += 1
+        return httpx.Response(503)
+
+    client = make_client(monkeypatch, handler)
+    monkeypatch.setattr(settings, "CIRCUIT_FAILURE_THRESHOLD", 10)
+    monkeypatch.setattr(settings, "HTTP_MAX_RETRIES", 5)
+    monkeypatch.setattr(client, "backoff_delay", lambda attempt: 0.5)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(client.post_json(URL, {}, idempotent=True, total_timeout=0.2))
+
+    assert calls == 1
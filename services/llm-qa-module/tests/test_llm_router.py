@@ -0,0 +1,137 @@
+"""
+Tests for latency-aware LLM routing, hedging and failover
+"""
+
+import asyncio
+import pytest
+
+from app.config import settings
+from app.services.llm_router import LLMBackend, LLMRouter
+
+
+class FakeLLM:
+    provider = "fake"
+
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.cancelled = 0
+
+    def _model_name(self):
+        return "fake-model"
+
+    async def agenerate(self, prompt, system_prompt=None):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise RuntimeError("backend down")
+        return {"response": "ok", "tokens_used": 1}
+
+
+@pytest.fixture(autouse=True)
+def router_settings(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_ROUTER_EWMA_ALPHA", 0.5)
+    monkeypatch.setattr(settings, "LLM_HEDGING_ENABLED", False)
+    monkeypatch.setattr(settings, "LLM_HEDGE_DELAY_MS", 20)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_DELAY_MS", 0)
+    monkeypatch.setattr(settings, "LLM_BACKEND_FAILURE_THRESHOLD", 3)
+
+
+def test_ewma_tracks_recent_latency():
+    backend = LLMBackend("a", FakeLLM())
+
+    backend.record_latency(500)
+    backend.record_latency(100)
+
+    assert backend.ewma_ms == 300
+
+
+def test_ranking_prefers_unmeasured_then_fastest_backend():
+    slow, fast, new = LLMBackend("slow", FakeLLM()), LLMBackend("fast", FakeLLM()), LLMBackend("new", FakeLLM())
+    slow.record_latency(900)
+    fast.record_latency(100)
+    router = LLMRouter([slow, fast, new])
+
+    assert [b.name for b in router.ranked()] == ["new", "fast", "slow"]
+
+
+def test_ranking_accounts_for_in_flight_requests():
+    slow, busy = LLMBackend("slow", FakeLLM()), LLMBackend("busy", FakeLLM())
+    slow.record_latency(300)
+    busy.record_latency(100)
+    busy.in_flight = 4  # Expected 100 ms * 5
+
+    assert [b.name for b in LLMRouter([slow, busy]).ranked()] == ["slow", "busy"]
+
+
+def test_hedge_fires_and_cancels_the_slower_request(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGING_ENABLED", True)
+    primary, secondary = FakeLLM(delay=5), FakeLLM(delay=0)
+    stuck, quick = LLMBackend("stuck", primary), LLMBackend("quick", secondary)
+    stuck.record_latency(10)  # Ranked first
+    quick.record_latency(50)
+    router = LLMRouter([stuck, quick])
+
+    async def run():
+        result = await router.agenerate("question")
+        await asyncio.sleep(0)  # Let the cancelled loser unwind
+        return result
+
+    result = asyncio.run(run())
+
+    assert result["backend"] == "quick"
+    assert result["hedged"] is True
+    assert router.hedged_requests == 1
+    assert primary.cancelled == 1
+    assert stuck.in_flight == 0
+    assert stuck.breaker.failures == 0  # Losing a race is not a failure
+
+
+def test_no_hedge_when_primary_answers_in_time(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGING_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_HEDGE_DELAY_MS", 1000)
+    first, second = FakeLLM(), FakeLLM()
+    router = LLMRouter([LLMBackend("first", first), LLMBackend("second", second)])
+
+    result = asyncio.run(router.agenerate("question"))
+
+    assert result["backend"] == "first"
+    assert result["hedged"] is False
+    assert second.calls == 0
+
+
+def test_failover_when_primary_errors():
+    broken, healthy = LLMBackend("broken", FakeLLM(fail=True)), LLMBackend("healthy", FakeLLM())
+    broken.record_latency(10)
+    healthy.record_latency(50)
+    router = LLMRouter([broken, healthy])
+
+    result = asyncio.run(router.agenerate("question"))
+
+    assert result["backend"] == "healthy"
+    assert broken.breaker.failures == 1
+
+
+def test_failing_backend_leaves_rotation_after_threshold():
+    broken, healthy = LLMBackend("broken", FakeLLM(fail=True)), LLMBackend("healthy", FakeLLM())
+    broken.record_latency(10)
+    healthy.record_latency(50)
+    router = LLMRouter([broken, healthy])
+
+    for _ in range(settings.LLM_BACKEND_FAILURE_THRESHOLD):
+        asyncio.run(router.agenerate("question"))
+
+    assert not broken.available
+    assert [b.name for b in router.ranked()] == ["healthy"]
+
+
+def test_error_raised_when_every_backend_fails():
+    router = LLMRouter([LLMBackend("a", FakeLLM(fail=True)), LLMBackend("b", FakeLLM(fail=True))])
+
+    with pytest.raises(RuntimeError, match="backend down"):
+        asyncio.run(router.agenerate("question"))
@@ -0,0 +1,99 @@
+"""
+Tests for coalescing identical in-flight questions
+"""
+
+import asyncio
+import pytest
+
+from app.config import settings
+from app.services import rag_pipeline as rag_module
+from app.services.rag_pipeline import RAGPipeline
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    monkeypatch.setattr(rag_module, "get_llm_router", lambda: None)
+    monkeypatch.setattr(settings, "QA_COALESCE_REQUESTS", True)
+    pipeline = RAGPipeline()
+    pipeline.calls = []
+    pipeline.gate = None
+
+    async def answer(question, include_sources, filters, patient_features):
+        pipeline.calls.append(question)
+        await pipeline.gate.wait()
+        return {"answer": f"answer to {question}", "tokens_used": 10, "prompt_tokens": 8, "completion_tokens": 2}
+
+    monkeypatch.setattr(pipeline, "_answer_question", answer)
+    return pipeline
+
+
+def test_identical_questions_share_one_computation(pipeline):
+    async def run():
+        pipeline.gate = asyncio.Event()
+        first = asyncio.ensure_future(pipeline.answer_question("What is the dose?", filters={"patient_id": "p1"}))
+        second = asyncio.ensure_future(pipeline.answer_question("  what is the DOSE? ", filters={"patient_id": "p1"}))
+        await asyncio.sleep(0)
+        pipeline.gate.set()
+        return await first, await second
+
+    first, second = asyncio.run(run())
+
+    assert len(pipeline.calls) == 1
+    assert first["coalesced"] is False and first["tokens_used"] == 10
+    assert second["coalesced"] is True and second["tokens_used"] == 0
+    assert second["answer"] == first["answer"]
+    assert pipeline.in_flight == {}
+
+
+def test_different_filters_are_not_coalesced(pipeline):
+    async def run():
+        pipeline.gate = asyncio.Event()
+        tasks = [
+            asyncio.ensure_future(pipeline.answer_question("What is the dose?", filters={"patient_id": pid}))
+            for pid in ("p1", "p2")
+        ]
+        await asyncio.sleep(0)
+        pipeline.gate.set()
+        return await asyncio.gather(*tasks)
+
+    results = asyncio.run(run())
+
+    assert len(pipeline.calls) == 2
+    assert [r["coalesced"] for r in results] == [False, False]
+
+
+def test_cancelled_caller_does_not_cancel_shared_computation(pipeline):
+    async def run():
+        pipeline.gate = asyncio.Event()
+        leader = asyncio.ensure_future(pipeline.answer_question("What is the dose?"))
+        follower = asyncio.ensure_future(pipeline.answer_question("What is the dose?"))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        await asyncio.sleep(0)
+        pipeline.gate.set()
+
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    result = asyncio.run(run())
+
+    assert len(pipeline.calls) == 1
+    assert result["answer"] == "answer to What is the dose?"
+    assert result["coalesced"] is True
+
+
+def test_coalescing_can_be_disabled(pipeline, monkeypatch):
+    monkeypatch.setattr(settings, "QA_COALESCE_REQUESTS", False)
+
+    async def run():
+        pipeline.gate = asyncio.Event()
+        tasks = [asyncio.ensure_future(pipeline.answer_question("What is the dose?")) for _ in range(2)]
+        await asyncio.sleep(0)
+        pipeline.gate.set()
+        return await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+
+    assert len(pipeline.calls) == 2